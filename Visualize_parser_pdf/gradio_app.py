@@ -28,8 +28,11 @@ async def parse_pdf(doc_path, output_dir, end_page_id, formula_enable=True, tabl
         unique_output_dir = os.path.join(output_dir, file_name)
         os.makedirs(unique_output_dir, exist_ok=True)
         
-        # 调用用户的local_parser进行PDF解析
-        md_path, layout_pdf_path = parse_pdf_to_markdown(doc_path, unique_output_dir)
+        # 调用用户的local_parser进行PDF解析（end_page_id 为0-based，只解析前 end_page_id+1 页）
+        md_path, layout_pdf_path = parse_pdf_to_markdown(
+            doc_path, unique_output_dir, end_page=end_page_id + 1,
+            formula_enable=formula_enable, table_enable=table_enable,
+        )
         
         return unique_output_dir, file_name, layout_pdf_path
     except Exception as e:
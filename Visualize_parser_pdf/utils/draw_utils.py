@@ -151,6 +151,67 @@ def draw_bbox_with_number(page_blocks, page, c, fill_config=False):
         
     return c
 
+def _annotate_page(page, blocks):
+    """在单页上叠加布局框（原地修改 page）。"""
+    # 过滤出有 bbox 的有效块，并排除 LIST 类型以避免重叠
+    # 排除 ABANDON 类型
+    # 排除 LIST 类型 (通常包含其他文本块，导致视觉重叠和重复计数)
+    valid_blocks = [
+        b for b in blocks
+        if 'bbox' in b
+        and b.get('type') not in [BlockType.LIST, BlockType.ABANDON]
+    ]
+    if not valid_blocks:
+        return page
+
+    cropbox = page.cropbox
+    page_width = float(cropbox[2]) - float(cropbox[0])
+    page_height = float(cropbox[3]) - float(cropbox[1])
+
+    packet = io.BytesIO()
+    c = canvas.Canvas(packet, pagesize=(page_width, page_height))
+
+    c = draw_bbox_with_number(valid_blocks, page, c, fill_config=False)
+
+    c.save()
+    packet.seek(0)
+    overlay_pdf = PdfReader(packet)
+
+    if len(overlay_pdf.pages) > 0:
+        page.merge_page(overlay_pdf.pages[0])
+    return page
+
+
+class LayoutDrawer:
+    """
+    逐页绘制布局边界框，供解析流水线在推理后续页面的同时完成已定稿页面的绘制。
+    页码需递增提交；keep_all_pages=True 时未提交的页面原样写出，否则只输出已提交的页面。
+    """
+
+    def __init__(self, pdf_path, keep_all_pages=True):
+        self.reader = PdfReader(pdf_path)
+        self.writer = PdfWriter()
+        self.keep_all_pages = keep_all_pages
+        self._next_index = 0  # 下一个待写出的页下标（0-based）
+
+    def add_page(self, page_num, blocks):
+        """绘制第 page_num 页（1-based）的布局框。"""
+        while self.keep_all_pages and self._next_index < page_num - 1:
+            self.writer.add_page(self.reader.pages[self._next_index])
+            self._next_index += 1
+        page = self.reader.pages[page_num - 1]
+        self.writer.add_page(_annotate_page(page, blocks))
+        self._next_index = page_num
+
+    def save(self, output_path):
+        while self.keep_all_pages and self._next_index < len(self.reader.pages):
+            self.writer.add_page(self.reader.pages[self._next_index])
+            self._next_index += 1
+        with open(output_path, "wb") as f:
+            self.writer.write(f)
+        return output_path
+
+
 def draw_layout_bbox(page_blocks_list, pdf_path, output_path):
     """
     在PDF上绘制布局边界框。
@@ -163,54 +224,15 @@ def draw_layout_bbox(page_blocks_list, pdf_path, output_path):
         output_path: 保存标注后PDF的路径
     """
     try:
-        reader = PdfReader(pdf_path)
-        writer = PdfWriter()
+        drawer = LayoutDrawer(pdf_path)
         
         # 按页码排序以确保对齐
         sorted_page_blocks = sorted(page_blocks_list, key=lambda x: x['page_num'])
         
-        # 映射页码到块列表以便访问
-        blocks_map = {item['page_num'] - 1: item['blocks'] for item in sorted_page_blocks} # page_num 是 1-based
-        
-        for i, page in enumerate(reader.pages):
-            # 获取当前页的块
-            blocks = blocks_map.get(i, [])
-            
-            # 过滤出有 bbox 的有效块，并排除 LIST 类型以避免重叠
-            # 排除 ABANDON 类型
-            # 排除 LIST 类型 (通常包含其他文本块，导致视觉重叠和重复计数)
-            valid_blocks = [
-                b for b in blocks 
-                if 'bbox' in b 
-                and b.get('type') not in [BlockType.LIST, BlockType.ABANDON]
-            ]
-            
-            if not valid_blocks:
-                writer.add_page(page)
-                continue
-            
-            cropbox = page.cropbox
-            page_width = float(cropbox[2]) - float(cropbox[0])
-            page_height = float(cropbox[3]) - float(cropbox[1])
-            
-            packet = io.BytesIO()
-            c = canvas.Canvas(packet, pagesize=(page_width, page_height))
+        for item in sorted_page_blocks:
+            drawer.add_page(item['page_num'], item['blocks'])
             
-            c = draw_bbox_with_number(valid_blocks, page, c, fill_config=False)
-            
-            c.save()
-            packet.seek(0)
-            overlay_pdf = PdfReader(packet)
-            
-            if len(overlay_pdf.pages) > 0:
-                page.merge_page(overlay_pdf.pages[0])
-            
-            writer.add_page(page)
-            
-        with open(output_path, "wb") as f:
-            writer.write(f)
-            
-        return output_path
+        return drawer.save(output_path)
         
     except Exception as e:
         logger.error(f"绘制布局bbox失败: {e}")
@@ -3,144 +3,219 @@ Streamlit 入口：上传法规文件(PDF/PPTX)、构建/更新索引、聊天
 运行：
     streamlit run app.py
 """
+import asyncio
 import logging
+import time
 from pathlib import Path
 from typing import List, Set
 
 import streamlit as st
-from llama_index.core import Document
 
 import config
+import ingest
 import rag_engine
 import utils
+from engines.ingest.job_queue import DONE, FAILED, QUEUED, RUNNING
+from engines.retrieval.filters import RetrievalFilters
 
 st.set_page_config(page_title="AutoSafety-RAG", page_icon="🚗", layout="wide")
 logger = logging.getLogger("autosafety")
 
 
-def init_state() -> None:
-    """初始化会话状态，Chroma 为真值来源。"""
-    logger.info("初始化会话状态")
-    # 已索引文件集合（来自 Chroma）
+def refresh_index_state() -> None:
+    """从 Chroma 重新读取已索引文件、内容哈希与节点数。"""
     indexed_files: Set[str] = rag_engine.get_exist_file_names()
     st.session_state["indexed_files"] = indexed_files
-    # 待入库的增量文档（本次上传未入库）
-    st.session_state["pending_docs"]: List[Document] = st.session_state.get("pending_docs", [])
+    # 已索引文件内容哈希 {file_hash: file_name}，用于按内容去重
+    st.session_state["indexed_hashes"] = rag_engine.get_exist_file_hashes()
     # 查询就绪标记与已存文档数
     st.session_state["stored_count"] = rag_engine.get_collection_count()
     st.session_state["index_ready"] = len(indexed_files) > 0 or st.session_state["stored_count"] > 0
+
+
+def init_state() -> None:
+    """初始化会话状态，Chroma 为真值来源。"""
+    logger.info("初始化会话状态")
+    refresh_index_state()
+    # 本会话已提交入库的内容哈希，避免脚本重跑时重复提交
+    st.session_state["submitted_hashes"]: Set[str] = st.session_state.get("submitted_hashes", set())
+    # 已感知的后台任务结束数；变化时刷新索引状态
+    st.session_state["ingest_seen"] = ingest.get_ingest_worker().finished_count
+    # 预加载持久化 BM25 索引（进程内只加载一次），首个查询无需等待
+    rag_engine.get_bm25_store()
     logger.info(
         "持久化文档数: %s, indexed_files=%s, index_ready=%s",
         st.session_state["stored_count"],
-        len(indexed_files),
+        len(st.session_state["indexed_files"]),
         st.session_state["index_ready"],
     )
 
 
 def sidebar_upload() -> None:
-    """侧边栏上传并解析文件。"""
-    # 使用最新持久化数量，确保按钮后也实时刷新
-    stored_count = rag_engine.get_collection_count()
-    st.session_state["stored_count"] = stored_count
-    indexed_files = st.session_state["indexed_files"]
-    pending_docs = st.session_state["pending_docs"]
+    """侧边栏上传文件并提交到后台入库队列（解析与建索引不阻塞界面）。"""
+    indexed_hashes = st.session_state["indexed_hashes"]
+    submitted_hashes = st.session_state["submitted_hashes"]
+    worker = ingest.get_ingest_worker()
 
     uploaded = st.sidebar.file_uploader(
         "上传法规文件（PDF/PPTX）",
         type=["pdf", "pptx"],
         accept_multiple_files=True,
     )
-
-    # 若用户清空选择，则同步清空 pending
+    st.sidebar.markdown(f"**当前库文档数：{st.session_state['stored_count']}**")
+    with st.sidebar.expander(f"已索引文件（{len(st.session_state['indexed_files'])}）", expanded=False):
+        for doc in rag_engine.get_doc_registry().documents():
+            st.caption(
+                f"{doc.file_name}：{doc.page_count} 页 / {doc.chunk_count} 块，"
+                f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(doc.ingested_at))}"
+            )
     if not uploaded:
-        st.session_state["pending_docs"] = []
-        pending_count = 0
-        st.sidebar.markdown(f"**当前库文档数：{stored_count}**")
-        st.sidebar.markdown(f"**待构建索引文档数：{pending_count}**")
         return
 
-    # 只保留当前仍在上传列表中的 pending 文档（避免已取消的文件残留）
-    current_names = {uf.name for uf in uploaded}
-    print("current_names:", current_names)
-    pending_docs = [doc for doc in pending_docs if doc.metadata.get("file_name") in current_names]
-    print("pending_docs:", pending_docs)
-    st.session_state["pending_docs"] = pending_docs
-
-    st.sidebar.write("解析中...")
-    new_pages = 0
     for uf in uploaded:
-        if uf.name in indexed_files:
-            st.sidebar.info(f"📄 {uf.name} 已存在于库中，自动跳过")
-            logger.info("跳过已索引文件: %s", uf.name)
+        # 按内容哈希去重：改名副本同样会被识别
+        file_hash = utils.content_hash(uf.getbuffer())
+        if file_hash in submitted_hashes:
+            continue
+        if file_hash in indexed_hashes:
+            st.sidebar.info(f"📄 {uf.name} 与库中 {indexed_hashes[file_hash]} 内容相同，自动跳过")
+            logger.info("跳过已索引文件: %s (同内容: %s)", uf.name, indexed_hashes[file_hash])
+            submitted_hashes.add(file_hash)
             continue
-        # 检查是否已在待处理列表（通过 metadata 的 file_name 比较）
-        already_pending = any(doc.metadata.get("file_name") == uf.name for doc in pending_docs)
-        if already_pending:
-            st.sidebar.info(f"📄 {uf.name} 已在待构建队列，跳过")
-            logger.info("跳过已在待构建队列文件: %s", uf.name)
+        active = worker.queue.find_active(file_hash)
+        if active is not None:
+            st.sidebar.info(f"📄 {uf.name} 已在入库队列（任务 #{active.id}），跳过")
+            submitted_hashes.add(file_hash)
             continue
 
+        # 同名修订版的增量计划在后台任务中生成，这里只落地文件
         saved_path = utils.save_uploaded_file(uf, config.UPLOAD_DIR)
-        docs = utils.file_to_documents(saved_path)
-        pending_docs.extend(docs)
-        new_pages += len(docs)
-        logger.info("解析完成: %s, 新增页数=%s", uf.name, len(docs))
+        job_id = worker.submit(uf.name, str(saved_path), file_hash)
+        submitted_hashes.add(file_hash)
+        st.sidebar.success(f"📄 {uf.name} 已提交入库（任务 #{job_id}）")
 
-    pending_count = len(pending_docs)
-    st.sidebar.markdown(f"**当前库文档数：{stored_count}**")
-    st.sidebar.markdown(f"**待构建索引文档数：{pending_count}**")
-    st.sidebar.success(f"新增页数：{new_pages}，待索引总计：{pending_count}")
 
+@st.fragment(run_every=2)
+def ingest_status() -> None:
+    """后台入库任务状态，定时刷新；有任务结束时整页重跑以刷新索引状态。"""
+    worker = ingest.get_ingest_worker()
+    if worker.finished_count != st.session_state["ingest_seen"]:
+        st.rerun()
+    counts = worker.queue.counts()
+    st.markdown(
+        f"**入库任务**：排队 {counts.get(QUEUED, 0)}，处理中 {counts.get(RUNNING, 0)}，"
+        f"完成 {counts.get(DONE, 0)}，失败 {counts.get(FAILED, 0)}"
+    )
+    icons = {QUEUED: "⏳", RUNNING: "⚙️", DONE: "✅", FAILED: "❌"}
+    for job in worker.queue.recent(limit=8):
+        label = f"{icons.get(job.status, '')} #{job.id} {job.file_name}：{job.message}"
+        if job.status in (QUEUED, RUNNING):
+            st.progress(min(max(job.progress, 0.0), 1.0), text=label)
+        elif job.status == DONE:
+            st.caption(f"{label}（{job.doc_count} 页）")
+        else:
+            st.caption(label)
 
-def build_index_action() -> None:
-    """构建或刷新向量索引。"""
-    pending_docs = st.session_state["pending_docs"]
-    indexed_files = st.session_state["indexed_files"]
 
-    if not pending_docs:
-        if indexed_files:
-            st.info("当前所有上传文档均已索引，无需更新。")
-        else:
-            st.warning("请先上传新文档。")
-        return
+def sidebar_filters() -> RetrievalFilters:
+    """侧边栏检索范围：法规系列 -> 版本 -> 文件逐级收窄，只选一个文件时可再限定页码范围。"""
+    catalog = rag_engine.get_regulation_catalog()
+    with st.sidebar.expander("检索范围", expanded=False):
+        if not catalog:
+            st.caption("暂无已索引文件")
+            return RetrievalFilters()
+        families = st.multiselect("法规系列", sorted({item["family"] for item in catalog}))
+        scoped = [item for item in catalog if not families or item["family"] in families]
+        versions = st.multiselect("版本", sorted({item["version"] for item in scoped if item["version"]}))
+        scoped = [item for item in scoped if not versions or item["version"] in versions]
+        file_names = st.multiselect("文件", [item["file_name"] for item in scoped])
+        page_start = page_end = None
+        if len(file_names) == 1:
+            page_count = max(next(item["page_count"] for item in scoped if item["file_name"] == file_names[0]), 1)
+            col_start, col_end = st.columns(2)
+            start = int(col_start.number_input("起始页", min_value=1, value=1, step=1))
+            end = int(col_end.number_input("结束页", min_value=1, value=page_count, step=1))
+            page_start = start if start > 1 else None
+            page_end = end if end < page_count else None
+        filters = RetrievalFilters(
+            file_names=tuple(file_names),
+            families=tuple(families),
+            versions=tuple(versions),
+            page_start=page_start,
+            page_end=page_end,
+        )
+        if not filters.is_empty():
+            st.caption(f"当前范围：{filters.describe()}")
+    return filters
 
-    logger.info("开始构建增量索引，待索引页数=%s", len(pending_docs))
-    rag_engine.build_or_refresh_index(pending_docs)
-    # 成功后合并文件名记录
-    new_files = {doc.metadata.get("file_name") for doc in pending_docs if doc.metadata.get("file_name")}
-    indexed_files.update(new_files)
-    st.session_state["pending_docs"] = []
-    st.session_state["stored_count"] = rag_engine.get_collection_count()
-    st.session_state["index_ready"] = True
-    st.success("✅ 增量索引构建完成！")
-    logger.info("索引更新完成，当前库文档数=%s，新增文件数=%s", st.session_state["stored_count"], len(new_files))
+
+def render_sources(sources: List[dict]) -> None:
+    """展示引用溯源列表。"""
+    if sources:
+        st.markdown("### 引用溯源")
+        for idx, src in enumerate(sources, start=1):
+            st.write(f"{idx}. {src['file']} - 第 {src['page']} 页 (score: {src['score']})")
+        logger.info("返回溯源节点数: %s", len(sources))
+    else:
+        st.info("未返回引用节点。")
+        logger.info("未返回引用节点")
 
 
-def chat_area() -> None:
-    """聊天区域：提交问题并展示答案与引用。"""
+def chat_area(filters: RetrievalFilters) -> None:
+    """聊天区域：在侧边栏选定的检索范围内提交问题并展示答案与引用。"""
     st.header("法规问答")
     query = st.text_area("输入你的问题", height=120, placeholder="例如：前排安全气囊展开条件？")
+    streaming = st.checkbox("流式输出", value=config.model_config.stream_response)
     if st.button("发送") and query:
         if not st.session_state["index_ready"]:
-            st.warning("请先构建/更新索引。")
+            st.warning("索引为空，请先上传文件并等待入库完成。")
+            return
+        if rag_engine.resolve_filter_files(filters) == set():
+            st.warning("没有符合检索范围的已索引文件，请调整侧边栏中的检索范围。")
+            return
+        logger.info("收到查询: %s（范围：%s）", query, filters.describe() or "全部")
+        started_at = time.perf_counter()
+        cached, query_embedding = rag_engine.lookup_cached_answer(query, filters)
+        if cached is not None:
+            st.markdown("### 回答")
+            st.caption(f"命中答案缓存（相似问题：{cached.query}，相似度 {cached.similarity:.3f}）")
+            st.write(cached.answer)
+            render_sources(cached.sources)
             return
-        logger.info("收到查询: %s", query)
-        # 查询时无需 pending 文档；BM25 若需要可传空列表
-        engine = rag_engine.as_query_engine([])
-        with st.spinner("检索与生成中..."):
-            response = engine.query(query)
-        st.markdown("### 回答")
-        st.write(response.response)
 
+        # 异步查询：BM25 与向量检索并发，复用答案缓存查找时算好的查询向量
+        if not streaming:
+            with st.spinner("检索与生成中..."):
+                response, timings = asyncio.run(
+                    rag_engine.aquery(query, query_embedding=query_embedding, filters=filters)
+                )
+            st.caption(timings.report())
+            st.markdown("### 回答")
+            st.write(response.response)
+            sources = rag_engine.extract_sources(response)
+            render_sources(sources)
+            rag_engine.cache_answer(
+                query, response.response, sources, time.perf_counter() - started_at, query_embedding, filters
+            )
+            return
+
+        # 流式：检索完成即返回，先展示引用，再边生成边输出回答
+        with st.spinner("检索中..."):
+            response, timings = asyncio.run(
+                rag_engine.aquery(query, streaming=True, query_embedding=query_embedding, filters=filters)
+            )
+        logger.info("检索完成，耗时 %.2fs", time.perf_counter() - started_at)
+        st.caption(timings.report())
+        st.markdown("### 回答")
+        answer_area = st.container()
         sources = rag_engine.extract_sources(response)
-        if sources:
-            st.markdown("### 引用溯源")
-            for idx, src in enumerate(sources, start=1):
-                st.write(f"{idx}. {src['file']} - 第 {src['page']} 页 (score: {src['score']})")
-            logger.info("返回溯源节点数: %s", len(sources))
-        else:
-            st.info("未返回引用节点。")
-            logger.info("未返回引用节点")
+        render_sources(sources)
+        with answer_area:
+            answer = st.write_stream(rag_engine.iter_response_tokens(response, started_at))
+        if isinstance(answer, str):
+            rag_engine.cache_answer(
+                query, answer, sources, time.perf_counter() - started_at, query_embedding, filters
+            )
 
 
 def main() -> None:
@@ -152,14 +227,27 @@ def main() -> None:
     st.caption("本地混合检索：BM25 + 向量 (Chroma) + Ollama(qwen3:8b)")
     st.sidebar.header("文件上传与索引")
     sidebar_upload()
-    if st.sidebar.button("构建/更新索引"):
-        build_index_action()
+    with st.sidebar:
+        ingest_status()
+    filters = sidebar_filters()
+    cache_stats = rag_engine.get_answer_cache().stats()
+    st.sidebar.caption(
+        f"答案缓存：命中率 {cache_stats['hit_rate']:.0%}"
+        f"（{cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}），"
+        f"累计节省 {cache_stats['saved_seconds']:.1f}s"
+    )
+    embed_stats = rag_engine.get_query_embedding_cache().stats()
+    st.sidebar.caption(
+        f"查询向量缓存：命中率 {embed_stats['hit_rate']:.0%}"
+        f"（{embed_stats['hits']}/{embed_stats['hits'] + embed_stats['misses']}，磁盘 {embed_stats['disk_hits']}），"
+        f"单次向量化 {embed_stats['avg_embed_seconds'] * 1000:.0f}ms，累计节省 {embed_stats['saved_seconds']:.1f}s"
+    )
 
     with st.expander("环境提示", expanded=False):
         st.write(
             "嵌入模型默认使用 GPU，A4000 显存 16GB，需为 Ollama 预留显存。如显存不足，可在 config.py 中将 embedding_device 改为 cpu。"
         )
-    chat_area()
+    chat_area(filters)
 
 
 if __name__ == "__main__":
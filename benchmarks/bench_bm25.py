@@ -0,0 +1,132 @@
+"""
+BM25 基准：持久化倒排索引 vs 每次从 Chroma 全量节点重建 BM25Retriever。
+
+汇总同时给出启动加载耗时、单条查询延迟与增量写入一批节点的落盘耗时（追加日志，与语料规模无关）。
+
+运行（项目根目录）：
+    python benchmarks/bench_bm25.py                  # 使用 data/vector_store 中的真实节点
+    python benchmarks/bench_bm25.py --synthetic 20000  # 离线合成语料
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.append(str(project_root))
+
+from llama_index.core.schema import BaseNode, QueryBundle, TextNode
+from llama_index.retrievers.bm25 import BM25Retriever
+
+from engines.retrieval.bm25_store import BM25Store, PersistentBM25Retriever
+
+QUERIES = [
+    "前排安全气囊展开条件",
+    "儿童约束系统静态评价规程",
+    "正面100%重叠刚性壁障碰撞试验速度",
+    "假人的摆放位置要求",
+    "电动汽车刮底试验 电池包基本信息报备",
+    "侧面碰撞 评分 扣分项",
+]
+
+_VOCAB = [
+    "安全气囊", "展开", "条件", "试验", "车辆", "假人", "座椅", "儿童", "约束系统", "碰撞",
+    "速度", "壁障", "正面", "侧面", "评价", "规程", "电池包", "刮底", "充电", "整备质量",
+    "测量", "摆放", "位置", "扣分", "评分", "头部", "胸部", "伤害值", "N.1.3", "5.2.1",
+]
+
+
+def synthetic_nodes(count: int, seed: int = 42) -> List[BaseNode]:
+    rng = random.Random(seed)
+    nodes = []
+    for idx in range(count):
+        words = [rng.choice(_VOCAB) for _ in range(rng.randint(60, 300))]
+        nodes.append(
+            TextNode(
+                id_=f"synthetic-{idx}",
+                text="，".join(words),
+                metadata={"file_name": f"synthetic_{idx // 50}.pdf", "page_number": idx % 50 + 1},
+            )
+        )
+    return nodes
+
+
+def chroma_nodes() -> List[BaseNode]:
+    import rag_engine
+
+    return list(rag_engine.iter_stored_nodes())
+
+
+def _time_queries(retriever, rounds: int) -> List[float]:
+    latencies = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            start = time.perf_counter()
+            retriever.retrieve(QueryBundle(query))
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _fmt(latencies: List[float]) -> str:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) > 1 else ordered[0]
+    return f"mean={statistics.mean(ordered):.2f}ms p95={p95:.2f}ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BM25 持久化索引基准")
+    parser.add_argument("--synthetic", type=int, default=0, help="合成节点数；0 表示读取 Chroma")
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--append-batch", type=int, default=50, help="增量写入测试的批大小")
+    args = parser.parse_args()
+
+    nodes = synthetic_nodes(args.synthetic) if args.synthetic else chroma_nodes()
+    if not nodes:
+        print("Chroma 中没有节点，请先构建索引或使用 --synthetic。")
+        return
+    print(f"节点数: {len(nodes)}")
+
+    # 基线：旧流程每次查询都要从全部节点重建 BM25Retriever
+    start = time.perf_counter()
+    baseline = BM25Retriever.from_defaults(nodes=nodes, similarity_top_k=args.top_k, language="zh")
+    rebuild_s = time.perf_counter() - start
+    baseline_lat = _time_queries(baseline, args.rounds)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        builder = BM25Store(Path(tmp_dir))
+        builder.add_nodes(nodes, persist=False)
+        builder.save()
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = BM25Store(Path(tmp_dir)).load()
+        load_s = time.perf_counter() - start
+        persistent_lat = _time_queries(PersistentBM25Retriever(store, similarity_top_k=args.top_k), args.rounds)
+
+        # 增量写入：改写同 id 的一批节点（只追加日志，不重写快照）
+        batch = nodes[: args.append_batch]
+        start = time.perf_counter()
+        store.add_nodes(batch)
+        append_s = time.perf_counter() - start
+
+    print(f"[rebuild] BM25Retriever.from_defaults: 构建 {rebuild_s:.3f}s, 查询 {_fmt(baseline_lat)}")
+    print(
+        f"[persist] BM25Store: 首次建索引 {build_s:.3f}s, 启动加载 {load_s:.3f}s, 查询 {_fmt(persistent_lat)}, "
+        f"增量写入 {len(batch)} 个节点 {append_s * 1000:.1f}ms"
+    )
+    print(
+        f"每次查询总耗时(准备+检索): 重建 {rebuild_s * 1000 + statistics.mean(baseline_lat):.1f}ms -> "
+        f"持久化 {statistics.mean(persistent_lat):.1f}ms（加载仅在启动时发生一次）；"
+        f"纯检索延迟: 重建后 {statistics.mean(baseline_lat):.2f}ms, 持久化 {statistics.mean(persistent_lat):.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+嵌入补齐浪费报告：固定 embed_batch_size 分批 vs 按 token 长度分桶的动态分批（DynamicBatchingEmbedding）。
+
+waste = 1 - 实际 token 数 / 补齐后 token 数。默认只用嵌入模型的分词器统计，不做前向；
+加 --run 时再分别实际向量化一遍并比较耗时。
+
+运行（项目根目录）：
+    python benchmarks/bench_embed_padding.py                        # 统计 Chroma 中全部切片
+    python benchmarks/bench_embed_padding.py --max-batch-tokens 8192 --run --limit 2000
+    python benchmarks/bench_embed_padding.py --synthetic 10000       # 无索引时使用合成切片（按字符计长度）
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.append(str(project_root))
+
+from llama_index.core.schema import MetadataMode
+
+import config
+from engines.embedding.batching import DynamicBatchingEmbedding, padding_report, token_counter
+
+
+def corpus_texts(limit: int) -> List[str]:
+    import rag_engine
+
+    nodes = sorted(rag_engine.iter_stored_nodes(), key=lambda node: node.node_id)
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+    return texts[:limit] if limit else texts
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="嵌入补齐浪费报告")
+    arg_parser.add_argument("--batch-size", type=int, default=config.model_config.embedding_batch_size)
+    arg_parser.add_argument("--max-batch-tokens", type=int, default=config.model_config.embedding_max_batch_tokens)
+    arg_parser.add_argument("--max-batch-items", type=int, default=config.model_config.embedding_max_batch_items)
+    arg_parser.add_argument("--limit", type=int, default=0, help="最多统计的切片数，0 表示全部")
+    arg_parser.add_argument("--synthetic", type=int, default=0, help="合成切片数；0 表示读取 Chroma")
+    arg_parser.add_argument("--run", action="store_true", help="实际向量化并比较耗时")
+    args = arg_parser.parse_args()
+
+    if args.synthetic:
+        from bench_index_write import TinyEmbedding, synthetic_chunks
+
+        texts = [node.get_content() for node in synthetic_chunks(args.synthetic)]
+        model = TinyEmbedding(embed_batch_size=args.batch_size)
+    else:
+        import rag_engine
+
+        texts = corpus_texts(args.limit)
+        model = rag_engine.get_embedding_model()
+        if isinstance(model, DynamicBatchingEmbedding):
+            model = model.inner
+    if not texts:
+        print("Chroma 中没有切片，请先构建索引或使用 --synthetic。")
+        return
+
+    counter = token_counter(model) or (lambda items: [len(text) for text in items])
+    lengths = counter(texts)
+    report = padding_report(lengths, args.batch_size, args.max_batch_tokens, args.max_batch_items)
+    print(f"切片数: {report['texts']}，实际 token {report['real_tokens']}，最长 {max(lengths)}，平均 {report['real_tokens'] / len(lengths):.0f}")
+    print(
+        f"[fixed]   {args.batch_size} 条一批: {report['fixed_batches']} 批, 补齐后 {report['fixed_padded_tokens']} token, "
+        f"浪费 {report['fixed_waste']:.1%}"
+    )
+    print(
+        f"[dynamic] ≤{args.max_batch_tokens} token/≤{args.max_batch_items} 条: {report['dynamic_batches']} 批, "
+        f"补齐后 {report['dynamic_padded_tokens']} token, 浪费 {report['dynamic_waste']:.1%}"
+    )
+
+    if args.run:
+        model.embed_batch_size = args.batch_size
+        start = time.perf_counter()
+        fixed = model.get_text_embedding_batch(texts)
+        fixed_s = time.perf_counter() - start
+        wrapped = DynamicBatchingEmbedding(
+            model, max_batch_tokens=args.max_batch_tokens, max_batch_items=args.max_batch_items
+        )
+        start = time.perf_counter()
+        dynamic = wrapped.get_text_embedding_batch(texts)
+        dynamic_s = time.perf_counter() - start
+        drift = max(max(abs(a - b) for a, b in zip(x, y)) for x, y in zip(fixed, dynamic))
+        print(f"向量化耗时: fixed {fixed_s:.2f}s, dynamic {dynamic_s:.2f}s（{fixed_s / dynamic_s:.2f}x），向量最大偏差 {drift:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+嵌入后端基准：fp32 HuggingFaceEmbedding vs int8 PyTorch / ONNX Runtime，在固定的一批真实切片上比较精度与吞吐。
+
+精度以 "hf" 后端为参照：
+- cos：同一切片两种后端向量的余弦相似度（均值 / 最小值）；
+- recall@k：以每个切片为查询，在样本内的 top-k 近邻与参照后端 top-k 的重合比例（检索排序是否保持）。
+
+运行（项目根目录）：
+    python benchmarks/bench_embedding_backends.py                         # 从 Chroma 固定抽取 256 个切片
+    python benchmarks/bench_embedding_backends.py --backends hf onnx --sample 512 --seed 7
+    python benchmarks/bench_embedding_backends.py --synthetic 256          # 无索引时使用合成文本
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.append(str(project_root))
+
+import numpy as np
+from llama_index.core.schema import MetadataMode
+
+import config
+from engines.embedding.backends import EMBEDDING_BACKENDS, create_embedding_model
+
+
+def sample_chunks(sample: int, seed: int) -> List[str]:
+    """从 Chroma 中按节点 id 排序后固定抽样，保证多次运行使用同一批切片。"""
+    import rag_engine
+
+    nodes = sorted(rag_engine.iter_stored_nodes(), key=lambda node: node.node_id)
+    rng = random.Random(seed)
+    picked = rng.sample(nodes, min(sample, len(nodes)))
+    return [node.get_content(metadata_mode=MetadataMode.EMBED) for node in picked]
+
+
+def synthetic_chunks(sample: int, seed: int) -> List[str]:
+    from bench_bm25 import synthetic_nodes
+
+    return [node.get_content() for node in synthetic_nodes(sample, seed)]
+
+
+def embed_all(backend: str, texts: List[str], device: str, batch_size: int) -> Dict:
+    cfg = config.model_config
+    start = time.perf_counter()
+    model = create_embedding_model(
+        backend,
+        model_name=cfg.embedding_model_name,
+        device=device,
+        embed_batch_size=batch_size,
+        onnx_dir=cfg.embedding_onnx_dir,
+        onnx_quantized=cfg.embedding_onnx_quantized,
+        max_length=cfg.embedding_max_length,
+        num_threads=cfg.embedding_num_threads,
+    )
+    load_s = time.perf_counter() - start
+    model.get_text_embedding_batch(texts[:batch_size])  # 预热
+    start = time.perf_counter()
+    vectors = np.asarray(model.get_text_embedding_batch(texts), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return {"vectors": vectors, "load_s": load_s, "chunks_per_s": len(texts) / elapsed, "elapsed": elapsed}
+
+
+def neighbours(vectors: np.ndarray, k: int) -> np.ndarray:
+    sims = vectors @ vectors.T
+    np.fill_diagonal(sims, -np.inf)
+    return np.argsort(-sims, axis=1)[:, :k]
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="嵌入后端精度/吞吐基准")
+    arg_parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    arg_parser.add_argument("--sample", type=int, default=256)
+    arg_parser.add_argument("--seed", type=int, default=42)
+    arg_parser.add_argument("--synthetic", type=int, default=0, help="合成切片数；0 表示从 Chroma 抽样")
+    arg_parser.add_argument("--batch-size", type=int, default=config.model_config.embedding_batch_size)
+    arg_parser.add_argument("--device", default="cpu", help="hf 后端设备（对比 CPU 部署时保持 cpu）")
+    arg_parser.add_argument("--top-k", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    texts = synthetic_chunks(args.synthetic, args.seed) if args.synthetic else sample_chunks(args.sample, args.seed)
+    if len(texts) <= args.top_k:
+        print("切片数不足，请先构建索引或使用 --synthetic。")
+        return
+    print(f"切片数: {len(texts)}，平均长度 {sum(map(len, texts)) / len(texts):.0f} 字符")
+
+    backends = ["hf"] + [b for b in args.backends if b != "hf"]
+    results = {backend: embed_all(backend, texts, args.device, args.batch_size) for backend in backends}
+    reference = results["hf"]
+    ref_nn = neighbours(reference["vectors"], args.top_k)
+
+    for backend in backends:
+        result = results[backend]
+        cos = np.sum(result["vectors"] * reference["vectors"], axis=1)
+        nn = neighbours(result["vectors"], args.top_k)
+        recall = np.mean([len(set(a) & set(b)) / args.top_k for a, b in zip(nn, ref_nn)])
+        print(
+            f"[{backend:>10}] 加载 {result['load_s']:.1f}s | {result['chunks_per_s']:.2f} chunks/s"
+            f"（{reference['elapsed'] / result['elapsed']:.2f}x） | cos mean={cos.mean():.4f} min={cos.min():.4f}"
+            f" | recall@{args.top_k}={recall:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
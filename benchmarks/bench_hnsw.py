@@ -0,0 +1,154 @@
+"""
+HNSW 参数基准：不同 M / ef_construction / ef_search 下的 recall@k、单条查询延迟（p50/p95）与建索引耗时。
+
+向量取自当前 Chroma 集合（或 --synthetic 生成的聚簇合成向量），随机留出 --queries 条作为查询，
+其余写入临时集合；真值为 numpy 暴力检索的精确 top-k。同一 (M, ef_construction) 只建一次索引，
+ef_search 在线修改后重新打开客户端使其生效（Chroma 1.x；旧版本退回逐个重建）。结果用于按语料规模选择 config.py 中的 hnsw_*。
+
+运行（项目根目录）：
+    python benchmarks/bench_hnsw.py                                  # 当前集合全部向量
+    python benchmarks/bench_hnsw.py --m 16 32 48 --construction-ef 100 200 --search-ef 20 50 100 200
+    python benchmarks/bench_hnsw.py --synthetic 50000 --dim 1024 --k 10 --target-recall 0.98
+"""
+import argparse
+import itertools
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.append(str(project_root))
+
+import chromadb
+import numpy as np
+from chromadb.api.shared_system_client import SharedSystemClient
+
+import config
+from engines.ingest.collection import HnswParams, set_search_ef
+
+
+def stored_vectors(limit: int) -> np.ndarray:
+    """分页读取当前集合中的全部向量。"""
+    client = chromadb.PersistentClient(path=str(config.CHROMA_PATH))
+    collection = client.get_or_create_collection(config.model_config.chroma_collection)
+    total = collection.count() if not limit else min(limit, collection.count())
+    chunks, offset = [], 0
+    while offset < total:
+        res = collection.get(include=["embeddings"], limit=min(1000, total - offset), offset=offset)
+        if not res["ids"]:
+            break
+        chunks.append(np.asarray(res["embeddings"], dtype=np.float32))
+        offset += len(res["ids"])
+    return np.concatenate(chunks) if chunks else np.zeros((0, 0), dtype=np.float32)
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int = 200, seed: int = 42) -> np.ndarray:
+    """聚簇分布的归一化向量（同一法规的切片彼此相近），比均匀随机向量更接近真实语料。"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """按 Chroma 的距离定义暴力计算精确 top-k 下标。"""
+    if space == "l2":
+        scores = -((queries ** 2).sum(1, keepdims=True) - 2 * queries @ corpus.T + (corpus ** 2).sum(1))
+    elif space == "cosine":
+        unit = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ unit.T
+    else:
+        scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, 1), axis=1), 1)
+
+
+def reopen(path: str, name: str):
+    """丢弃进程内缓存的客户端，重新从磁盘加载集合（修改后的 ef_search 此时才生效）。"""
+    SharedSystemClient.clear_system_cache()
+    collection = chromadb.PersistentClient(path=path).get_collection(name)
+    collection.query(query_embeddings=[collection.peek(1)["embeddings"][0]], n_results=1, include=[])  # 预热：加载索引
+    return collection
+
+
+def build(client, name: str, corpus: np.ndarray, params: HnswParams, batch_size: int = 1000) -> Tuple[object, float]:
+    collection = client.create_collection(name, metadata=params.to_metadata())
+    batch_size = min(batch_size, client.get_max_batch_size())
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), batch_size):
+        chunk = corpus[offset:offset + batch_size]
+        collection.add(ids=[str(offset + i) for i in range(len(chunk))], embeddings=chunk)
+    collection.count()  # 等待写入完成
+    return collection, time.perf_counter() - start
+
+
+def evaluate(collection, queries: np.ndarray, truth: np.ndarray, k: int) -> Tuple[float, float, float]:
+    """逐条查询（与应用内一致），返回 recall@k、p50、p95 延迟（毫秒）。"""
+    latencies: List[float] = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        res = collection.query(query_embeddings=[query], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(int(i) for i in res["ids"][0]) & set(expected.tolist()))
+    return hits / truth.size, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+def main() -> None:
+    cfg = config.model_config
+    arg_parser = argparse.ArgumentParser(description="HNSW 参数 recall@k / 延迟基准")
+    arg_parser.add_argument("--synthetic", type=int, default=0, help="合成向量数；0 表示读取当前集合")
+    arg_parser.add_argument("--dim", type=int, default=1024, help="合成向量维度（bge-m3 为 1024）")
+    arg_parser.add_argument("--limit", type=int, default=0, help="最多读取的已存向量数，0 表示全部")
+    arg_parser.add_argument("--queries", type=int, default=200, help="留出作查询的向量数")
+    arg_parser.add_argument("--k", type=int, default=5, help="recall@k 的 k（默认与混合检索 top-k 相当）")
+    arg_parser.add_argument("--space", default=cfg.hnsw_space, choices=["l2", "cosine", "ip"])
+    arg_parser.add_argument("--m", type=int, nargs="+", default=[16, 32])
+    arg_parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    arg_parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100, 200])
+    arg_parser.add_argument("--target-recall", type=float, default=0.95, help="推荐参数时要求的最低 recall@k")
+    args = arg_parser.parse_args()
+
+    vectors = synthetic_vectors(args.synthetic, args.dim) if args.synthetic else stored_vectors(args.limit)
+    if len(vectors) <= args.queries + args.k:
+        print("向量数不足，请先构建索引或使用 --synthetic。")
+        return
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(vectors))
+    queries, corpus = vectors[order[: args.queries]], vectors[order[args.queries:]]
+    truth = exact_top_k(corpus, queries, args.k, args.space)
+    print(f"语料 {len(corpus)} 条 × {corpus.shape[1]} 维，查询 {len(queries)} 条，space={args.space}, k={args.k}")
+    print(f"{'M':>4} {'ef_c':>6} {'ef_s':>6} {'build_s':>8} {'recall@k':>9} {'p50_ms':>8} {'p95_ms':>8}")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for idx, (m, construction_ef) in enumerate(itertools.product(args.m, args.construction_ef)):
+            path, name = str(Path(tmp_dir) / f"run_{idx}"), f"bench_hnsw_{idx}"
+            collection, build_s = None, 0.0
+            for search_ef in args.search_ef:
+                params = HnswParams(space=args.space, m=m, construction_ef=construction_ef, search_ef=search_ef)
+                if collection is not None and set_search_ef(collection, search_ef):
+                    collection = reopen(path, name)
+                else:
+                    client = chromadb.PersistentClient(path=path)
+                    if collection is not None:
+                        client.delete_collection(name)
+                    collection, build_s = build(client, name, corpus, params)
+                recall, p50, p95 = evaluate(collection, queries, truth, args.k)
+                rows.append((params, build_s, recall, p50, p95))
+                print(f"{m:>4} {construction_ef:>6} {search_ef:>6} {build_s:>8.2f} {recall:>9.3f} {p50:>8.2f} {p95:>8.2f}")
+        SharedSystemClient.clear_system_cache()
+
+    qualified = [row for row in rows if row[2] >= args.target_recall]
+    if qualified:
+        best = min(qualified, key=lambda row: (row[4], row[1]))
+        print(f"recall@{args.k} ≥ {args.target_recall} 时 p95 最低: {best[0].describe()}（p95 {best[4]:.2f}ms）")
+    else:
+        print(f"没有参数组合达到 recall@{args.k} ≥ {args.target_recall}，请增大 --m / --construction-ef / --search-ef")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+索引写入吞吐基准（离线，CPU）：VectorStoreIndex 默认写入路径 vs BulkIndexWriter。
+
+用一个小型本地嵌入模型代替 bge-m3：字符哈希嵌入 + 卷积 + 掩码平均池化，批内补齐到最长文本，
+计算量随补齐后的长度线性增长——与 Transformer 嵌入模型「短切片被长切片拖累」的代价结构一致。
+各路径写入各自的临时 Chroma 集合，模型权重与节点完全相同：
+- baseline：VectorStoreIndex，按 embed_batch_size 条固定分批；
+- bulk(fixed)：BulkIndexWriter，内层仍按 embed_batch_size 条固定分批，只体现向量化与写入的重叠；
+- bulk(dynamic)：与 rag_engine.index_nodes 相同，模型外包 DynamicBatchingEmbedding（按 token 数分桶），
+  上限取 config 中的 embedding_max_batch_tokens / embedding_max_batch_items。
+
+运行（项目根目录）：
+    python benchmarks/bench_index_write.py                  # 10k 合成切片
+    python benchmarks/bench_index_write.py --chunks 2000 --embed-batch 16 --batch-chars 64000
+    python benchmarks/bench_index_write.py --max-batch-tokens 32768 --max-batch-items 128
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, List
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.append(str(project_root))
+
+import chromadb
+import torch
+from llama_index.core import StorageContext, VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import TextNode
+from llama_index.vector_stores.chroma import ChromaVectorStore
+
+import config
+from engines.embedding.batching import DynamicBatchingEmbedding
+from engines.ingest.writer import BulkIndexWriter, upsert_chroma
+
+VOCAB = 8192
+MAX_LENGTH = 512
+
+_WORDS = [
+    "安全气囊", "展开", "条件", "试验", "车辆", "假人", "座椅", "儿童", "约束系统", "碰撞", "速度", "壁障",
+    "正面", "侧面", "评价", "规程", "电池包", "刮底", "充电", "整备质量", "测量", "摆放", "位置", "扣分",
+]
+
+
+class TinyEmbedding(BaseEmbedding):
+    """离线小模型：字符哈希 -> Embedding -> Conv1d -> 掩码平均池化 -> Linear。"""
+
+    _net: Any = PrivateAttr()
+    _tokenizer: Any = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(model_name="tiny-conv", **kwargs)
+        # 每个字符一个 token（截断到 MAX_LENGTH），供 DynamicBatchingEmbedding 统计长度
+        self._tokenizer = lambda texts, **_: {"input_ids": [range(min(len(text), MAX_LENGTH) or 1) for text in texts]}
+        torch.manual_seed(0)
+        self._net = torch.nn.ModuleDict(
+            {
+                "embed": torch.nn.Embedding(VOCAB, 128, padding_idx=0),
+                "conv": torch.nn.Conv1d(128, 256, 5, padding=2),
+                "proj": torch.nn.Linear(256, 256),
+            }
+        ).eval()
+
+    @torch.inference_mode()
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        lengths = [min(len(text), MAX_LENGTH) or 1 for text in texts]
+        ids = torch.zeros(len(texts), max(lengths), dtype=torch.long)
+        for row, text in enumerate(texts):
+            ids[row, : lengths[row]] = torch.tensor([ord(ch) % (VOCAB - 1) + 1 for ch in text[:MAX_LENGTH]] or [1])
+        mask = (ids > 0).unsqueeze(-1).float()
+        hidden = torch.relu(self._net["conv"](self._net["embed"](ids).transpose(1, 2))).transpose(1, 2)
+        pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1)
+        return torch.nn.functional.normalize(self._net["proj"](pooled), dim=-1).tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+
+def synthetic_chunks(count: int, seed: int = 42) -> List[TextNode]:
+    """长度混合的切片：多数为短条款，少数为长表格/长条款。"""
+    rng = random.Random(seed)
+    nodes = []
+    for idx in range(count):
+        words = rng.randint(200, 400) if rng.random() < 0.15 else rng.randint(5, 60)
+        nodes.append(
+            TextNode(
+                id_=f"bench-{idx}",
+                text="，".join(rng.choice(_WORDS) for _ in range(words)),
+                metadata={"file_name": f"bench_{idx // 100}.pdf", "page_number": idx % 100 + 1},
+            )
+        )
+    return nodes
+
+
+def collection(tmp_dir: str, name: str):
+    return chromadb.PersistentClient(path=str(Path(tmp_dir) / name)).get_or_create_collection(name)
+
+
+def bulk_write(tmp_dir: str, name: str, embed_model: BaseEmbedding, args: argparse.Namespace) -> float:
+    """BulkIndexWriter 写入一个临时集合，打印并返回总耗时。"""
+    nodes = synthetic_chunks(args.chunks)
+    target = collection(tmp_dir, name)
+    writer = BulkIndexWriter(
+        embed_fn=embed_model.get_text_embedding_batch,
+        write_fn=lambda chunk: upsert_chroma(target, chunk, args.upsert_batch),
+        max_batch_items=args.batch_items,
+        max_batch_chars=args.batch_chars,
+        write_batch=args.upsert_batch,
+    )
+    stats = writer.write(nodes)
+    assert target.count() == args.chunks
+    print(f"           {stats.report()}")
+    return stats.wall
+
+
+def main() -> None:
+    cfg = config.model_config
+    arg_parser = argparse.ArgumentParser(description="索引写入吞吐基准")
+    arg_parser.add_argument("--chunks", type=int, default=10_000)
+    arg_parser.add_argument("--embed-batch", type=int, default=cfg.embedding_batch_size, help="固定分批时模型单次前向条数")
+    arg_parser.add_argument("--max-batch-tokens", type=int, default=cfg.embedding_max_batch_tokens, help="动态分批每批补齐后的 token 上限")
+    arg_parser.add_argument("--max-batch-items", type=int, default=cfg.embedding_max_batch_items, help="动态分批每批最多条数")
+    arg_parser.add_argument("--batch-items", type=int, default=cfg.index_embed_batch_items)
+    arg_parser.add_argument("--batch-chars", type=int, default=cfg.index_embed_batch_chars)
+    arg_parser.add_argument("--upsert-batch", type=int, default=cfg.index_upsert_batch)
+    arg_parser.add_argument("--threads", type=int, default=4)
+    args = arg_parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    embed_model = TinyEmbedding(embed_batch_size=args.embed_batch)
+    # 包装器会改写内层的 embed_batch_size，使用单独的实例（同一随机种子，权重相同）
+    dynamic_model = DynamicBatchingEmbedding(
+        TinyEmbedding(embed_batch_size=args.embed_batch),
+        max_batch_tokens=args.max_batch_tokens,
+        max_batch_items=args.max_batch_items,
+        baseline_batch_size=args.embed_batch,
+    )
+    print(f"切片数: {args.chunks}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nodes = synthetic_chunks(args.chunks)
+        store = ChromaVectorStore(chroma_collection=collection(tmp_dir, "baseline"))
+        start = time.perf_counter()
+        VectorStoreIndex(nodes, storage_context=StorageContext.from_defaults(vector_store=store), embed_model=embed_model)
+        baseline = time.perf_counter() - start
+        print(f"[baseline] VectorStoreIndex: {baseline:.2f}s, {args.chunks / baseline:.1f} chunks/s")
+
+        bulk = bulk_write(tmp_dir, "bulk_fixed", embed_model, args)
+        print(f"[bulk]     fixed   (embed_batch={args.embed_batch}): {bulk:.2f}s, "
+              f"{args.chunks / bulk:.1f} chunks/s（{baseline / bulk:.2f}x，仅重叠）")
+
+        bulk = bulk_write(tmp_dir, "bulk_dynamic", dynamic_model, args)
+        padding = dynamic_model.padding_stats()
+        print(f"[bulk]     dynamic (max_batch_tokens={args.max_batch_tokens}): {bulk:.2f}s, "
+              f"{args.chunks / bulk:.1f} chunks/s（{baseline / bulk:.2f}x，与 index_nodes 相同）")
+        print(f"           补齐浪费: 动态 {padding['waste']:.1%}, 固定 {args.embed_batch} 条 {padding['baseline_waste']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+VLM 批量推理吞吐基准（CPU，无需下载 MinerU 权重）。
+
+用一个小型替身模型模拟 MinerU 两阶段提取的代价结构：版面检测与每个内容块都需要自回归解码，
+单步解码的固定开销在批内共享——这正是 batch_two_step_extract 相比逐页 two_step_extract 的收益来源。
+基准直接调用 MinerUParser.extract_blocks_batched，因此解析器批处理逻辑的回退会体现为 pages/s 下降。
+
+运行（项目根目录）：
+    python benchmarks/bench_vlm_batch.py --pages 16 --batch-sizes 1 2 4 8
+    python benchmarks/bench_vlm_batch.py --min-speedup 1.5   # 低于阈值时以非零码退出，可接入 CI
+    python benchmarks/bench_vlm_batch.py --not-extract table equation   # 模拟关闭表格/公式识别
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.append(str(project_root))
+
+import torch
+from PIL import Image, ImageDraw
+
+from engines.ocr_by_vlm.local_parser import MinerUParser
+
+IMAGE_SIZE = 112
+BLOCKS_PER_PAGE = 6
+BLOCK_TYPES = ["title", "text", "table", "text", "equation", "table"]
+DECODE_STEPS = 24
+
+
+class StandInClient:
+    """与 MinerUClient 接口一致的替身：编码器 + GRU 自回归解码，批内共享每步开销。"""
+
+    def __init__(self, hidden: int = 256, seed: int = 0):
+        torch.manual_seed(seed)
+        self.encoder = torch.nn.Sequential(
+            torch.nn.Conv2d(3, 16, 5, stride=4),
+            torch.nn.ReLU(),
+            torch.nn.Conv2d(16, 32, 3, stride=2),
+            torch.nn.AdaptiveAvgPool2d(1),
+            torch.nn.Flatten(),
+            torch.nn.Linear(32, hidden),
+        ).eval()
+        self.decoder = torch.nn.GRUCell(hidden, hidden).eval()
+        self.head = torch.nn.Linear(hidden, 4).eval()
+
+    @staticmethod
+    def _to_tensor(images: List[Image.Image]) -> torch.Tensor:
+        arrays = [
+            torch.frombuffer(bytearray(img.convert("RGB").resize((IMAGE_SIZE, IMAGE_SIZE)).tobytes()), dtype=torch.uint8)
+            for img in images
+        ]
+        return torch.stack(arrays).view(len(images), IMAGE_SIZE, IMAGE_SIZE, 3).permute(0, 3, 1, 2).float() / 255
+
+    @torch.inference_mode()
+    def _generate(self, images: List[Image.Image]) -> torch.Tensor:
+        state = self.encoder(self._to_tensor(images))
+        token = state
+        for _ in range(DECODE_STEPS):
+            state = self.decoder(token, state)
+            token = state
+        return torch.sigmoid(self.head(state))
+
+    def _layout(self, images: List[Image.Image]) -> List[List[Dict]]:
+        boxes = self._generate(images).tolist()
+        layouts = []
+        for x0, y0, x1, y1 in boxes:
+            layout = []
+            for i in range(BLOCKS_PER_PAGE):
+                top = i / BLOCKS_PER_PAGE
+                layout.append({"type": BLOCK_TYPES[i % len(BLOCK_TYPES)], "bbox": [min(x0, x1) * 0.5, top, 0.5 + max(x0, x1) * 0.5, top + 0.1], "angle": 0})
+            layouts.append(layout)
+        return layouts
+
+    def _content(self, images: List[Image.Image], layouts: List[List[Dict]], not_extract_list: Optional[List[str]] = None) -> None:
+        crops, targets = [], []
+        for image, layout in zip(images, layouts):
+            width, height = image.size
+            for block in layout:
+                if not_extract_list and block["type"] in not_extract_list:
+                    block["content"] = None
+                    continue
+                x0, y0, x1, y1 = block["bbox"]
+                crops.append(image.crop((int(x0 * width), int(y0 * height), int(x1 * width), int(y1 * height))))
+                targets.append(block)
+        if not crops:
+            return
+        for block, out in zip(targets, self._generate(crops).tolist()):
+            block["content"] = " ".join(f"{v:.3f}" for v in out)
+
+    def two_step_extract(self, image: Image.Image, not_extract_list: Optional[List[str]] = None) -> List[Dict]:
+        layouts = self._layout([image])
+        self._content([image], layouts, not_extract_list)
+        return layouts[0]
+
+    def batch_two_step_extract(self, images: List[Image.Image], not_extract_list: Optional[List[str]] = None) -> List[List[Dict]]:
+        layouts = self._layout(images)
+        self._content(images, layouts, not_extract_list)
+        return layouts
+
+
+def synthetic_pages(count: int, seed: int = 42) -> List[Image.Image]:
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(count):
+        page = Image.new("RGB", (850, 1100), "white")
+        draw = ImageDraw.Draw(page)
+        for _ in range(20):
+            x, y = rng.randint(50, 700), rng.randint(50, 1000)
+            draw.rectangle((x, y, x + rng.randint(50, 100), y + rng.randint(10, 40)), fill="black")
+        pages.append(page)
+    return pages
+
+
+def pages_per_second(parser: MinerUParser, pages: List[Image.Image], batch_size: int, rounds: int,
+                     not_extract_list: Optional[List[str]] = None) -> float:
+    parser.batch_size = batch_size
+    parser.extract_blocks_batched(pages[:batch_size], not_extract_list)  # 预热
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parser.extract_blocks_batched(pages, not_extract_list)
+    return len(pages) * rounds / (time.perf_counter() - start)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="MinerUParser 批量推理吞吐基准")
+    arg_parser.add_argument("--pages", type=int, default=16)
+    arg_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    arg_parser.add_argument("--rounds", type=int, default=3)
+    arg_parser.add_argument("--threads", type=int, default=4)
+    arg_parser.add_argument("--min-speedup", type=float, default=0.0, help="最大批相对批大小1的最低加速比")
+    arg_parser.add_argument("--not-extract", nargs="*", default=[], help="跳过内容识别的块类型，如 table equation")
+    args = arg_parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    parser = MinerUParser(use_cache=False)
+    parser.client = StandInClient()
+    pages = synthetic_pages(args.pages)
+
+    results = {}
+    for batch_size in args.batch_sizes:
+        results[batch_size] = pages_per_second(parser, pages, batch_size, args.rounds, args.not_extract)
+        print(f"batch_size={batch_size:>2}: {results[batch_size]:.2f} pages/s")
+
+    baseline = results.get(1)
+    if baseline:
+        best = max(args.batch_sizes)
+        speedup = results[best] / baseline
+        print(f"batch_size={best} 相对逐页加速比: {speedup:.2f}x")
+        if speedup < args.min_speedup:
+            print(f"吞吐回退：加速比 {speedup:.2f}x 低于阈值 {args.min_speedup:.2f}x")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+批量入库：遍历目录下的 PDF/PPTX，解析后成批向量化并 upsert 到 Chroma + BM25，无需逐个在侧边栏上传。
+
+- 按内容哈希跳过已在 Chroma 中的文件（改名副本同样跳过），同名不同内容按修订版增量处理：
+  新节点写入后才更新保留节点、删除失效节点，同名的多个版本依次处理；
+- 解析在线程池中并行（PDF 的 VLM 解析并发数受 model_config.ingest_vlm_slots 限制），与向量化/写入重叠；
+- 切分后的节点攒满 --write-batch 个再交给 rag_engine.index_nodes：按长度排序成批向量化，同时分批 upsert；
+- 断点文件记录每个文件的状态，中断后重跑会清理写了一半的文件并从断点继续；
+- 结束时输出吞吐汇总（pages/s、chunks/s、embed tokens/s）。
+
+导入期间请停止 Streamlit 应用：Chroma 的持久化客户端不支持多进程同时写入，运行中的应用也看不到其他进程
+新写入的向量。若应用未停止，BM25 索引不会丢失写入（写入在文件锁内进行，写前先合并磁盘上的最新索引），
+应用在下一次提问时合并本脚本的写入并递增索引代数、清空查询引擎与答案缓存；但仍需在导入完成后重启应用，
+向量检索才会包含新文件，且导入期间不要在应用中上传文件。
+
+运行（项目根目录）：
+    python bulk_ingest.py                       # 默认导入 data/docs/
+    python bulk_ingest.py D:/regulations --workers 4 --embed-batch 64
+    python bulk_ingest.py --dry-run             # 只列出待导入文件
+    python bulk_ingest.py --restart             # 忽略已有断点
+"""
+import argparse
+import logging
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import MetadataMode
+
+import config
+import ingest
+import rag_engine
+import utils
+from engines.embedding.batching import DynamicBatchingEmbedding, token_counter
+from engines.ingest.checkpoint import IngestCheckpoint
+
+logger = logging.getLogger("autosafety")
+
+SUPPORTED_SUFFIXES = {".pdf", ".pptx"}
+DEFAULT_CHECKPOINT = config.DATA_DIR / "bulk_ingest_checkpoint.json"
+
+
+@dataclass
+class BulkStats:
+    """吞吐统计：各阶段耗时与处理量。"""
+
+    files: int = 0
+    skipped: int = 0
+    failed: int = 0
+    pages: int = 0
+    chunks: int = 0
+    tokens: int = 0
+    parse_seconds: float = 0.0
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    def summary(self) -> str:
+        wall = max(time.perf_counter() - self.started_at, 1e-9)
+        return (
+            f"文件: 导入 {self.files}, 跳过 {self.skipped}, 失败 {self.failed} | "
+            f"页 {self.pages} ({self.pages / wall:.2f} pages/s), "
+            f"块 {self.chunks} ({self.chunks / wall:.2f} chunks/s), "
+            f"嵌入 token {self.tokens} ({self.tokens / max(self.embed_seconds, 1e-9):.0f} tokens/s) | "
+            f"总耗时 {wall:.1f}s (解析累计 {self.parse_seconds:.1f}s, 向量化 {self.embed_seconds:.1f}s, 写入 {self.write_seconds:.1f}s)"
+        )
+
+
+def discover_files(directory: Path) -> List[Path]:
+    """递归列出目录下支持的文件，按路径排序保证断点续跑顺序稳定。"""
+    return sorted(p for p in directory.rglob("*") if p.is_file() and p.suffix.lower() in SUPPORTED_SUFFIXES)
+
+
+def build_embedding_model(embed_batch: int) -> BaseEmbedding:
+    """
+    为本次导入构造嵌入模型：复用共享模型已加载的权重，只替换单次前向的条数上限，
+    不改动 rag_engine.get_embedding_model() 返回的共享实例。
+    """
+    shared = rag_engine.get_embedding_model()
+    if isinstance(shared, DynamicBatchingEmbedding):
+        return DynamicBatchingEmbedding(
+            shared.inner,
+            max_batch_tokens=shared.max_batch_tokens,
+            max_batch_items=embed_batch,
+            baseline_batch_size=shared.baseline_batch_size,
+        )
+    return shared.model_copy(update={"embed_batch_size": embed_batch})
+
+
+def count_tokens(texts: Sequence[str], model: BaseEmbedding) -> int:
+    """用嵌入模型自身的分词器统计 token 数；取不到分词器时按字符数近似。"""
+    if isinstance(model, DynamicBatchingEmbedding):
+        return sum(model.count_tokens(list(texts)))
+    counter = token_counter(model)
+    if counter is None:
+        return sum(len(text) for text in texts)
+    return sum(counter(list(texts)))
+
+
+def _parse(path: Path, indexed_names: set) -> Tuple[list, dict, float]:
+    started = time.perf_counter()
+    docs, revision = ingest.prepare_documents(path, indexed_names=indexed_names)
+    return docs, revision, time.perf_counter() - started
+
+
+class BulkIngestor:
+    """解析线程池 + 主线程成批向量化与写入。"""
+
+    def __init__(
+        self,
+        checkpoint: IngestCheckpoint,
+        workers: int,
+        write_batch: int,
+        upsert_batch: int,
+        embed_batch_chars: Optional[int] = None,
+        embed_model: Optional[BaseEmbedding] = None,
+    ):
+        self.checkpoint = checkpoint
+        self.workers = max(1, workers)
+        self.write_batch = write_batch
+        self.upsert_batch = upsert_batch
+        self.embed_batch_chars = embed_batch_chars
+        self.embed_model = embed_model
+        self.stats = BulkStats()
+        self._buffer = []  # 待向量化的节点
+        # (file_hash, file_name, pages, chunks, 修订计划)
+        self._buffer_files: List[Tuple[str, str, int, int, Optional[Dict[str, Any]]]] = []
+
+    def plan(self, files: List[Path]) -> List[Tuple[Path, str]]:
+        """计算内容哈希，跳过已入库/已完成/重复的文件；先清理上次中断时写了一半的文件。"""
+        existing = rag_engine.get_exist_file_hashes()
+        for file_hash, file_name in list(self.checkpoint.in_progress.items()):
+            removed = rag_engine.delete_file_nodes(file_hash)
+            existing.pop(file_hash, None)
+            logger.info("清理中断的入库: %s, 删除节点=%s", file_name, removed)
+        todo, seen = [], set()
+        for path in files:
+            file_hash = utils.content_hash(path)
+            if file_hash in existing or file_hash in self.checkpoint.done or file_hash in seen:
+                self.stats.skipped += 1
+                continue
+            seen.add(file_hash)
+            todo.append((path, file_hash))
+        return todo
+
+    def run(self, todo: List[Tuple[Path, str]]) -> BulkStats:
+        indexed_names = rag_engine.get_exist_file_names()
+        pending: Deque[Tuple[Path, str]] = deque(todo)
+        deferred: List[Tuple[Path, str]] = []
+        in_flight: Dict[Future, Tuple[Path, str]] = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk-parse") as pool:
+
+            def fill() -> None:
+                # 最多预取 2*workers 个文件，避免解析结果在内存中堆积
+                while len(in_flight) < 2 * self.workers and pending:
+                    item = pending.popleft()
+                    if item[0].name in self._active_names(in_flight):
+                        # 同名文件（同一法规的不同版本）需在前一个写入后再按最新索引生成修订计划
+                        deferred.append(item)
+                        continue
+                    in_flight[pool.submit(_parse, item[0], indexed_names)] = item
+
+            fill()
+            while in_flight or deferred:
+                if not in_flight:
+                    self.flush()
+                    indexed_names |= {path.name for path, _ in deferred}
+                    pending.extendleft(reversed(deferred))
+                    deferred.clear()
+                    fill()
+                    continue
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path, file_hash = in_flight.pop(future)
+                    self._collect(future, path, file_hash)
+                fill()
+        self.flush()
+        return self.stats
+
+    def _active_names(self, in_flight: Dict[Future, Tuple[Path, str]]) -> Set[str]:
+        """正在解析或已解析待写入的文件名。"""
+        return {path.name for path, _ in in_flight.values()} | {entry[1] for entry in self._buffer_files}
+
+    def _collect(self, future: Future, path: Path, file_hash: str) -> None:
+        try:
+            docs, revision, seconds = future.result()
+        except Exception as exc:
+            logger.exception("解析失败: %s", path)
+            self.checkpoint.mark_failed(file_hash, path.name, str(exc))
+            self.stats.failed += 1
+            return
+        self.stats.parse_seconds += seconds
+        try:
+            nodes = rag_engine.split_documents(docs, show_progress=False) if docs else []
+        except Exception as exc:
+            logger.exception("切分失败: %s", path)
+            self.checkpoint.mark_failed(file_hash, path.name, str(exc))
+            self.stats.failed += 1
+            return
+        # 新节点写入后才更新保留节点、删除失效节点（见 flush），写入完成前都视为中断状态
+        self.checkpoint.mark_in_progress(file_hash, path.name)
+        self._buffer.extend(nodes)
+        self._buffer_files.append((file_hash, path.name, len(docs), len(nodes), revision))
+        logger.info("已解析: %s, 页数=%s, 块数=%s", path.name, len(docs), len(nodes))
+        if len(self._buffer) >= self.write_batch:
+            self.flush()
+
+    def flush(self) -> None:
+        """向量化并写入缓冲区中的全部节点，随后把对应文件记为完成。"""
+        if not self._buffer_files:
+            return
+        nodes = self._buffer
+        if nodes:
+            # 向量化与 Chroma upsert 重叠执行，两阶段忙碌时间分别累计
+            stage_stats = rag_engine.index_nodes(
+                nodes,
+                upsert_batch=self.upsert_batch,
+                embed_batch_chars=self.embed_batch_chars,
+                embed_model=self.embed_model,
+            ).summary()
+            self.stats.embed_seconds += stage_stats.get("embed", {}).get("busy_s", 0.0)
+            self.stats.write_seconds += stage_stats.get("write", {}).get("busy_s", 0.0)
+            texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+            self.stats.tokens += count_tokens(texts, self.embed_model or rag_engine.get_embedding_model())
+        for file_hash, file_name, pages, chunks, revision in self._buffer_files:
+            if revision is not None:
+                try:
+                    rag_engine.apply_file_revision(file_hash, revision)
+                except Exception as exc:
+                    logger.exception("修订版更新失败，回滚: %s", file_name)
+                    rag_engine.rollback_file_revision(file_hash, revision)
+                    self.checkpoint.mark_failed(file_hash, file_name, str(exc))
+                    self.stats.failed += 1
+                    continue
+            self.checkpoint.mark_done(file_hash, file_name, pages, chunks)
+            self.stats.files += 1
+            self.stats.pages += pages
+            self.stats.chunks += chunks
+        self.checkpoint.save()
+        logger.info("已写入 %s 个块（%s 个文件）| %s", len(nodes), len(self._buffer_files), self.stats.summary())
+        self._buffer = []
+        self._buffer_files = []
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量导入目录下的法规文件到 Chroma + BM25")
+    parser.add_argument("directory", nargs="?", type=Path, default=config.UPLOAD_DIR)
+    parser.add_argument("--workers", type=int, default=config.model_config.ingest_max_workers, help="解析线程数")
+    parser.add_argument("--embed-batch", type=int, default=64, help="嵌入模型单次前向的最多文本数（动态批处理时另受 token 上限约束）")
+    parser.add_argument("--embed-batch-chars", type=int, default=config.model_config.index_embed_batch_chars,
+                        help="每次向量化调用的字符预算（按长度排序后，短切片批更大）")
+    parser.add_argument("--write-batch", type=int, default=2000, help="攒满多少个块后统一向量化并写入")
+    parser.add_argument("--upsert-batch", type=int, default=config.model_config.index_upsert_batch,
+                        help="单次 Chroma upsert 的块数")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="忽略已有断点重新开始（已入库文件仍按哈希跳过）")
+    parser.add_argument("--limit", type=int, default=0, help="最多导入的文件数，0 表示不限")
+    parser.add_argument("--dry-run", action="store_true", help="只列出待导入文件")
+    args = parser.parse_args()
+
+    config.setup_logging()
+    checkpoint = IngestCheckpoint(args.checkpoint)
+    if args.restart:
+        checkpoint.reset()
+    files = discover_files(args.directory)
+    ingestor = BulkIngestor(checkpoint, args.workers, args.write_batch, args.upsert_batch, args.embed_batch_chars)
+    todo = ingestor.plan(files)
+    if args.limit:
+        todo = todo[: args.limit]
+    print(f"发现 {len(files)} 个文件，跳过 {ingestor.stats.skipped} 个，待导入 {len(todo)} 个")
+    if args.dry_run:
+        for path, _ in todo:
+            print(f"  {path}")
+        return
+    if not todo:
+        return
+
+    rag_engine.init_global_settings()
+    embed_model = build_embedding_model(args.embed_batch)
+    ingestor.embed_model = embed_model
+    ingestor.stats.started_at = time.perf_counter()
+    stats = ingestor.run(todo)
+    print(stats.summary())
+    if isinstance(embed_model, DynamicBatchingEmbedding):
+        padding = embed_model.padding_stats()
+        print(
+            f"补齐浪费: 动态分批 {padding['waste']:.1%}（{padding['batches']} 批） vs "
+            f"固定 {embed_model.baseline_batch_size} 条一批 {padding['baseline_waste']:.1%}"
+        )
+    if checkpoint.failed:
+        print(f"失败 {len(checkpoint.failed)} 个文件（详见 {args.checkpoint}），重跑本命令会再次尝试")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,10 +13,18 @@ BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
 UPLOAD_DIR = DATA_DIR / "docs"  # 文件夹1：存放上传的 pdf/pptx
 CHROMA_PATH = DATA_DIR / "vector_store"  # 文件夹2：向量库持久化
+BM25_PATH = DATA_DIR / "bm25_index"  # BM25 倒排索引持久化，与向量库并列
+PARSE_CACHE_DIR = DATA_DIR / "parse_cache"  # MinerU 解析结果缓存（逐页 blocks + Markdown）
+INGEST_DB_PATH = DATA_DIR / "ingest_jobs.sqlite3"  # 后台入库任务队列
+DOC_REGISTRY_PATH = DATA_DIR / "doc_registry.sqlite3"  # 已索引文档登记表（文件名/哈希/页数/块数）
+QUERY_EMBED_CACHE_PATH = DATA_DIR / "query_embedding_cache.sqlite3"  # 查询向量缓存（可选持久化）
+EMBED_STORE_DIR = DATA_DIR / "embedding_store"  # 切片向量库：文本哈希 + 模型标识 -> float16 向量（memmap）
 LOG_DIR = BASE_DIR / "logs"
 LOG_FILE = LOG_DIR / "app.log"
 MODEL_DIR = BASE_DIR / "models" / "bge-m3"
 MODEL_DIR_OCR = BASE_DIR / "models" / "MinerU25"
+MODEL_DIR_ONNX = BASE_DIR / "models" / "bge-m3-onnx"  # python -m engines.embedding.backends 导出
+RERANK_MODEL_DIR = BASE_DIR / "models" / "bge-reranker-v2-m3"
 
 @dataclass
 class ModelConfig:
@@ -24,11 +32,80 @@ class ModelConfig:
 
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "qwen3:4b"
+    stream_response: bool = True  # 聊天界面默认流式输出回答
     embedding_model_name: str = str(MODEL_DIR)
     embedding_device: str = "cuda"  # Windows 下若显存紧张，可设为 "cpu"
     embedding_batch_size: int = 16
+    # 嵌入后端："hf" 原 HuggingFaceEmbedding；"torch_int8" 动态 int8 量化（CPU）；"onnx" ONNX Runtime（CPU）
+    embedding_backend: str = "hf"
+    embedding_onnx_dir: str = str(MODEL_DIR_ONNX)
+    embedding_onnx_quantized: bool = True  # 使用 int8 量化的 ONNX 模型
+    embedding_max_length: int = 1024  # onnx 后端单段最大 token 数
+    embedding_num_threads: int = 0  # onnx 后端线程数，0 为自动
+    # 动态批处理：按 token 长度分桶，每批补齐后的 token 总数不超过上限（取代固定 embedding_batch_size 条一批）
+    embedding_dynamic_batching: bool = True
+    embedding_max_batch_tokens: int = 16384
+    embedding_max_batch_items: int = 64
+    # 入库向量化前先查切片向量库，重建索引时未变化的切片不再重新计算
+    embedding_store_enabled: bool = True
+    # 查询向量缓存：按 规范化问题文本 + 模型名 复用 bge-m3 查询向量，跨会话共享
+    query_embedding_cache_enabled: bool = True
+    query_embedding_cache_max_entries: int = 1024
+    query_embedding_cache_persist: bool = False  # True 时写入 SQLite，重启后仍可命中
+    query_embedding_cache_disk_max_entries: int = 100_000
+    # 语义答案缓存：查询向量余弦相似度 >= 阈值时直接复用历史答案
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95
+    answer_cache_max_entries: int = 256
+    answer_cache_ttl_seconds: float = 24 * 3600
+    # BM25 检索参数
+    bm25_k1: float = 1.5
+    bm25_b: float = 0.75
+    # Chroma 集合与 HNSW 参数：space/M/ef_construction 仅在创建集合时生效，修改后运行 python migrate_collection.py 重建；
+    # ef_search 启动时直接应用到已有集合。参数选择见 benchmarks/bench_hnsw.py
+    chroma_collection: str = "autosafety_rag"
+    hnsw_space: str = "l2"  # "l2" / "cosine" / "ip"；bge-m3 向量已归一化，三者排序一致
+    hnsw_m: int = 16
+    hnsw_construction_ef: int = 100
+    hnsw_search_ef: int = 100
+    parallel_retrieval: bool = True  # BM25 与 向量化+Chroma 检索并发执行（False 时退回 QueryFusionRetriever 串行）
+    # 交叉编码器重排：混合检索召回 rerank_candidate_k 个候选，重排后仅 rerank_top_n 个送入 LLM
+    rerank_enabled: bool = False
+    rerank_model_name: str = str(RERANK_MODEL_DIR)
+    rerank_device: str = "cpu"
+    rerank_candidate_k: int = 20
+    rerank_top_n: int = 3
+    rerank_batch_size: int = 16
+    rerank_cache_max_entries: int = 4096  # (query, node_id) 得分缓存条数
     # MinerU 2.5 模型配置
     mineru_model_path: str = str(MODEL_DIR_OCR)
+    parse_cache_enabled: bool = True  # 命中解析缓存时跳过 VLM 推理
+    # 每批送入 VLM 的页数（版面检测与内容识别两阶段分别成批前向）；0 表示按可用显存/内存自动选择
+    mineru_batch_size: int = 0
+    mineru_render_dpi: int = 200  # 页面渲染分辨率
+    mineru_save_page_images: bool = False  # 调试用：将整页渲染图保存到输出目录 images/
+    mineru_pipeline: bool = True  # 渲染/推理/后处理三阶段流水线并行
+    # 关闭后对应块不再送入 VLM 内容识别阶段
+    mineru_table_enable: bool = True
+    mineru_formula_enable: bool = True
+    # 被关闭类型块的处理方式："text_layer" 从 PDF 文本层按 bbox 提取文字，"skip" 直接丢弃
+    mineru_disabled_block_fallback: str = "text_layer"
+    # 文本层快速通道：文本层可靠的原生数字页直接用 PyMuPDF 提取，只有扫描页/表格页送入 VLM
+    text_fast_path_enabled: bool = True
+    text_fast_path_min_chars: int = 200  # 每页最少非空白字符数
+    text_fast_path_max_image_coverage: float = 0.3  # 图片覆盖页面面积上限
+    text_fast_path_max_garbled_ratio: float = 0.05  # 乱码字符比例上限
+    # 后台入库：同时处理的任务数，以及其中可同时占用 VLM（GPU）解析 PDF 的任务数
+    ingest_max_workers: int = 2
+    ingest_vlm_slots: int = 1
+    # 索引写入：按长度排序后成批向量化（每次调用的条数/字符预算），与 Chroma 分批 upsert 重叠
+    index_embed_batch_items: int = 128
+    index_embed_batch_chars: int = 64_000
+    index_upsert_batch: int = 1000
+    # 切分策略："structure" 按条款/章节边界切分（表格、公式不拆开，节点 id 稳定），"sentence" 为 LlamaIndex 默认句子切分
+    chunk_strategy: str = "structure"
+    chunk_max_chars: int = 1000
+    chunk_min_chars: int = 200  # 短于该长度的条款与后续条款合并
 
 
 model_config = ModelConfig()
@@ -36,7 +113,7 @@ model_config = ModelConfig()
 
 def ensure_dirs() -> None:
     """确保必要的持久化目录存在。"""
-    for path in (DATA_DIR, CHROMA_PATH, UPLOAD_DIR, LOG_DIR):
+    for path in (DATA_DIR, CHROMA_PATH, BM25_PATH, PARSE_CACHE_DIR, UPLOAD_DIR, LOG_DIR):
         path.mkdir(parents=True, exist_ok=True)
 
 
@@ -61,3 +138,4 @@ if __name__ == "__main__":
     print(f"DATA_DIR: {DATA_DIR}")
     print(f"UPLOAD_DIR: {UPLOAD_DIR}")
     print(f"CHROMA_PATH: {CHROMA_PATH}")
+    print(f"BM25_PATH: {BM25_PATH}")
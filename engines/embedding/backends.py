@@ -0,0 +1,196 @@
+"""
+CPU 部署用的嵌入后端：GPU 留给 Ollama 时，fp32 bge-m3 是入库瓶颈。
+
+- "hf"：原有 HuggingFaceEmbedding（sentence-transformers，fp32）；
+- "torch_int8"：同一模型的 Linear 层做 PyTorch 动态 int8 量化，仅 CPU；
+- "onnx"：ONNX Runtime 推理（可选 int8 动态量化模型），需先导出：
+      python -m engines.embedding.backends --model-dir models/bge-m3 --output-dir models/bge-m3-onnx --quantize
+
+三种后端输出相同形式的向量（CLS 池化 + L2 归一化，与 bge-m3 的 sentence-transformers 配置一致），
+可直接替换 get_embedding_model() 的返回值；切换后端后建议用 benchmarks/bench_embedding_backends.py 核对精度。
+"""
+import argparse
+import logging
+from pathlib import Path
+from typing import Any, List
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+
+logger = logging.getLogger("autosafety")
+
+EMBEDDING_BACKENDS = ("hf", "torch_int8", "onnx")
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+
+class OnnxEmbedding(BaseEmbedding):
+    """基于 ONNX Runtime 的 bge-m3 稠密向量（CLS 池化 + L2 归一化）。"""
+
+    model_dir: str = Field(description="导出的 ONNX 模型与分词器目录")
+    max_length: int = Field(default=1024, description="单段文本最大 token 数")
+
+    _session: Any = PrivateAttr()
+    _tokenizer: Any = PrivateAttr()
+    _input_names: Any = PrivateAttr()
+
+    def __init__(self, model_dir: str, quantized: bool = True, num_threads: int = 0, **kwargs: Any):
+        super().__init__(model_dir=model_dir, model_name=model_dir, **kwargs)
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_file = Path(model_dir) / (ONNX_QUANTIZED_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+        self._input_names = {item.name for item in self._session.get_inputs()}
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OnnxEmbedding"
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        encoded = self._tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self._input_names}
+        hidden = self._session.run(None, feeds)[0]
+        cls = hidden[:, 0].astype(np.float32)
+        cls /= np.maximum(np.linalg.norm(cls, axis=1, keepdims=True), 1e-12)
+        return cls.tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+
+def quantize_int8(embedding: BaseEmbedding) -> BaseEmbedding:
+    """对 HuggingFaceEmbedding 内部 SentenceTransformer 的 Linear 层做动态 int8 量化（原地，仅 CPU 有效）。"""
+    import torch
+
+    # HuggingFaceEmbedding 未公开底层模型，只能经私有属性访问
+    torch.ao.quantization.quantize_dynamic(embedding._model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return embedding
+
+
+def create_embedding_model(
+    backend: str,
+    model_name: str,
+    device: str = "cpu",
+    embed_batch_size: int = 16,
+    onnx_dir: str = "",
+    onnx_quantized: bool = True,
+    max_length: int = 1024,
+    num_threads: int = 0,
+) -> BaseEmbedding:
+    """
+    按后端名创建嵌入模型。
+
+    Args:
+        backend: "hf" / "torch_int8" / "onnx"
+        model_name: HuggingFace 模型目录（hf、torch_int8 使用）
+        device: hf 后端的设备；torch_int8、onnx 固定为 CPU
+        embed_batch_size: 单次前向的文本数
+        onnx_dir: ONNX 模型目录（onnx 使用）
+        onnx_quantized: 使用 int8 动态量化的 ONNX 模型
+        max_length: onnx 后端单段最大 token 数
+        num_threads: onnx 后端线程数，0 表示由 ONNX Runtime 决定
+
+    Returns:
+        LlamaIndex BaseEmbedding 实例
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"未知的嵌入后端: {backend}，可选 {EMBEDDING_BACKENDS}")
+    if backend == "onnx":
+        return OnnxEmbedding(
+            model_dir=onnx_dir,
+            quantized=onnx_quantized,
+            num_threads=num_threads,
+            max_length=max_length,
+            embed_batch_size=embed_batch_size,
+        )
+
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    embedding = HuggingFaceEmbedding(
+        model_name=model_name,
+        device="cpu" if backend == "torch_int8" else device,
+        embed_batch_size=embed_batch_size,
+        # 强制使用 Safetensors，避开 PyTorch 2.6 版本检查
+        model_kwargs={"use_safetensors": True},
+    )
+    if backend == "torch_int8":
+        quantize_int8(embedding)
+    return embedding
+
+
+def export_onnx(model_dir: str, output_dir: str, quantize: bool = True, opset: int = 17) -> Path:
+    """
+    将 HuggingFace 模型导出为 ONNX（last_hidden_state 输出），并可额外生成 int8 动态量化版本。
+
+    Args:
+        model_dir: HuggingFace 模型目录
+        output_dir: 输出目录（同时保存分词器）
+        quantize: 是否生成 model_quantized.onnx
+        opset: ONNX opset 版本
+
+    Returns:
+        输出目录
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModel.from_pretrained(model_dir, use_safetensors=True).eval()
+    dummy = tokenizer(["机动车安全技术条件"], return_tensors="pt")
+    dynamic_axes = {"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"},
+                    "last_hidden_state": {0: "batch", 1: "seq"}}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            str(out / ONNX_MODEL_FILE),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(str(out))
+    print(f"已导出 ONNX 模型: {out / ONNX_MODEL_FILE}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        # bge-m3 权重超过 2GB，需使用外部数据格式
+        quantize_dynamic(
+            str(out / ONNX_MODEL_FILE),
+            str(out / ONNX_QUANTIZED_MODEL_FILE),
+            weight_type=QuantType.QInt8,
+            use_external_data_format=True,
+        )
+        print(f"已生成 int8 量化模型: {out / ONNX_QUANTIZED_MODEL_FILE}")
+    return out
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="导出 bge-m3 的 ONNX 模型（可选 int8 动态量化）")
+    arg_parser.add_argument("--model-dir", required=True)
+    arg_parser.add_argument("--output-dir", required=True)
+    arg_parser.add_argument("--quantize", action="store_true")
+    arg_parser.add_argument("--opset", type=int, default=17)
+    args = arg_parser.parse_args()
+    export_onnx(args.model_dir, args.output_dir, quantize=args.quantize, opset=args.opset)
@@ -0,0 +1,158 @@
+"""
+按 token 长度分桶的动态批处理：包装 get_embedding_model() 的底层模型。
+
+bge-m3 最长接受 8192 token，固定 embed_batch_size 分批时，批内每条短切片都被补齐到最长的一条。
+DynamicBatchingEmbedding 先用模型自身的分词器统计每条文本的 token 数，按长度排序后分批：
+每批「补齐后的 token 总数」（条数 × 批内最长长度）不超过 max_batch_tokens，条数不超过 max_batch_items，
+向量按原顺序返回。同时累计实际 token、补齐后 token，以及同一输入按固定条数分批时的补齐 token，用于对比补齐浪费。
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+
+logger = logging.getLogger("autosafety")
+
+
+def plan_token_batches(lengths: Sequence[int], max_batch_tokens: int, max_batch_items: int) -> List[List[int]]:
+    """
+    按 token 长度升序分批，补齐后的 token 总数不超过 max_batch_tokens（单条超长时独占一批）。
+
+    Args:
+        lengths: 每条文本的 token 数
+        max_batch_tokens: 每批补齐后的 token 上限
+        max_batch_items: 每批最多条数
+
+    Returns:
+        下标批列表
+    """
+    batches, current = [], []
+    for idx in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        # 升序排列，新加入的一条即批内最长
+        if current and (len(current) >= max_batch_items or (len(current) + 1) * lengths[idx] > max_batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(idx)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def fixed_batches(count: int, batch_size: int) -> List[List[int]]:
+    """原始顺序、固定条数分批（现有 embed_batch_size 行为）。"""
+    return [list(range(start, min(start + batch_size, count))) for start in range(0, count, batch_size)]
+
+
+def padded_tokens(lengths: Sequence[int], batches: List[List[int]]) -> int:
+    """批内补齐到最长一条后的 token 总数。"""
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches if batch)
+
+
+def padding_report(lengths: Sequence[int], batch_size: int, max_batch_tokens: int, max_batch_items: int) -> Dict[str, Any]:
+    """对同一组长度比较固定分批与动态分批的补齐浪费。"""
+    real = sum(lengths)
+    fixed = fixed_batches(len(lengths), batch_size)
+    dynamic = plan_token_batches(lengths, max_batch_tokens, max_batch_items)
+    fixed_padded = padded_tokens(lengths, fixed)
+    dynamic_padded = padded_tokens(lengths, dynamic)
+    return {
+        "texts": len(lengths),
+        "real_tokens": real,
+        "fixed_batches": len(fixed),
+        "fixed_padded_tokens": fixed_padded,
+        "fixed_waste": 1 - real / fixed_padded if fixed_padded else 0.0,
+        "dynamic_batches": len(dynamic),
+        "dynamic_padded_tokens": dynamic_padded,
+        "dynamic_waste": 1 - real / dynamic_padded if dynamic_padded else 0.0,
+    }
+
+
+def token_counter(embedding: BaseEmbedding) -> Optional[Callable[[List[str]], List[int]]]:
+    """取嵌入模型自身的分词器构造 token 计数函数（截断到模型最大长度）；取不到时返回 None。"""
+    sentence_model = getattr(embedding, "_model", None)
+    tokenizer = getattr(sentence_model, "tokenizer", None) or getattr(embedding, "_tokenizer", None)
+    if tokenizer is None:
+        return None
+    max_length = getattr(sentence_model, "max_seq_length", None) or getattr(embedding, "max_length", None)
+
+    def count(texts: List[str]) -> List[int]:
+        ids = tokenizer(list(texts), add_special_tokens=True, truncation=bool(max_length), max_length=max_length)
+        return [len(item) for item in ids["input_ids"]]
+
+    return count
+
+
+class DynamicBatchingEmbedding(BaseEmbedding):
+    """在任一 BaseEmbedding 外层按 token 数动态分批；查询向量直接透传。"""
+
+    max_batch_tokens: int = Field(default=16384, description="每批补齐后的 token 上限")
+    max_batch_items: int = Field(default=64, description="每批最多条数")
+    baseline_batch_size: int = Field(default=16, description="对比用的固定分批条数")
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _count_tokens: Callable[[List[str]], List[int]] = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _stats: Dict[str, int] = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, **kwargs: Any):
+        # 外层一次接收整批文本再自行分桶，内层单次调用即一次前向
+        kwargs.setdefault("embed_batch_size", 2048)
+        super().__init__(model_name=inner.model_name, **kwargs)
+        self._inner = inner
+        self._inner.embed_batch_size = 2048  # 分批已在外层完成，内层不再二次切分
+        counter = token_counter(inner)
+        if counter is None:
+            logger.warning("嵌入模型没有可用的分词器，动态批处理按字符数近似 token 数")
+            counter = lambda texts: [len(text) for text in texts]
+        self._count_tokens = counter
+        self._lock = threading.Lock()
+        self._stats = {"texts": 0, "batches": 0, "real_tokens": 0, "padded_tokens": 0, "baseline_padded_tokens": 0}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "DynamicBatchingEmbedding"
+
+    @property
+    def inner(self) -> BaseEmbedding:
+        return self._inner
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        return self._count_tokens(texts)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._inner.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await self._inner.aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._inner.get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        lengths = self._count_tokens(texts)
+        batches = plan_token_batches(lengths, self.max_batch_tokens, self.max_batch_items)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        for batch in batches:
+            for idx, embedding in zip(batch, self._inner.get_text_embedding_batch([texts[i] for i in batch])):
+                results[idx] = embedding
+        with self._lock:
+            self._stats["texts"] += len(texts)
+            self._stats["batches"] += len(batches)
+            self._stats["real_tokens"] += sum(lengths)
+            self._stats["padded_tokens"] += padded_tokens(lengths, batches)
+            self._stats["baseline_padded_tokens"] += padded_tokens(
+                lengths, fixed_batches(len(lengths), self.baseline_batch_size)
+            )
+        return results
+
+    def padding_stats(self) -> Dict[str, Any]:
+        """累计补齐浪费：waste = 1 - 实际 token / 补齐后 token。"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["waste"] = 1 - stats["real_tokens"] / stats["padded_tokens"] if stats["padded_tokens"] else 0.0
+        stats["baseline_waste"] = (
+            1 - stats["real_tokens"] / stats["baseline_padded_tokens"] if stats["baseline_padded_tokens"] else 0.0
+        )
+        return stats
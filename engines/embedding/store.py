@@ -0,0 +1,148 @@
+"""
+内容寻址的切片向量库：sha256(嵌入文本) + 模型标识 -> float16 向量，存放在内存映射文件中。
+
+重建 Chroma 集合（删库重建、HNSW 参数调整、元数据结构变化）时，未变化的切片直接从这里取回向量，
+不再调用嵌入模型，重建耗时取决于磁盘读写而非 GPU/CPU 推理。
+
+目录结构（每个模型标识一个子目录）：
+    vectors.f16      float16 行矩阵（np.memmap，容量不足时按倍数扩展）
+    index.sqlite3    key -> 行号，以及向量维度等元信息
+向量先写入 memmap 并 flush，再在一个事务内登记行号，中断时不会留下指向未写入数据的索引。
+行号在 SQLite 写事务（BEGIN IMMEDIATE）内按 MAX(row) + 1 分配，应用与 bulk_ingest.py 等多个进程
+同时写入同一模型目录时不会分到相同的行；扩展 memmap 文件同样只在该事务内进行。
+"""
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("autosafety")
+
+INITIAL_CAPACITY = 1024
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """float16 memmap 向量库（线程安全）；model_id 不同的向量互不可见。"""
+
+    def __init__(self, root: Path, model_id: str):
+        slug = re.sub(r"[^0-9A-Za-z._-]+", "_", model_id).strip("_")[:64]
+        self.model_id = model_id
+        self.dir = Path(root) / f"{slug}_{hashlib.sha256(model_id.encode('utf-8')).hexdigest()[:8]}"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.dir / "vectors.f16"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.dir / "index.sqlite3"), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_row ON vectors (row)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('model_id', ?)", (model_id,))
+            meta = dict(self._conn.execute("SELECT name, value FROM meta"))
+            self._rows: Dict[str, int] = dict(self._conn.execute("SELECT key, row FROM vectors"))
+        self.dim: Optional[int] = int(meta["dim"]) if "dim" in meta else None
+        self._matrix: Optional[np.memmap] = None
+        self._capacity = 0
+        if self.dim is not None and self.vectors_path.exists():
+            self._open()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _open(self) -> None:
+        row_bytes = self.dim * np.dtype(np.float16).itemsize
+        self._capacity = self.vectors_path.stat().st_size // row_bytes
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float16, mode="r+", shape=(self._capacity, self.dim))
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        if self.vectors_path.exists():
+            self._open()  # 其他进程可能已扩展文件
+            if rows <= self._capacity:
+                return
+        capacity = max(INITIAL_CAPACITY, self._capacity)
+        while capacity < rows:
+            capacity *= 2
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * np.dtype(np.float16).itemsize)
+        self._open()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """按嵌入文本查找向量；未命中的位置为 None。"""
+        keys = [text_key(text) for text in texts]
+        with self._lock:
+            rows = [self._rows.get(key) for key in keys]
+            found = sum(row is not None for row in rows)
+            self.hits += found
+            self.misses += len(rows) - found
+            if self._matrix is None:
+                return [None] * len(texts)
+            return [None if row is None else self._matrix[row].astype(np.float32).tolist() for row in rows]
+
+    def put_many(self, texts: Sequence[str], embeddings: Sequence[Sequence[float]]) -> None:
+        """写入新向量（已存在的 key 跳过）。"""
+        if not texts:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float16)
+        keys = [text_key(text) for text in texts]
+        with self._lock:
+            if all(key in self._rows for key in keys):
+                return
+            # 写事务内读取其他进程已登记的行并分配新行号，提交前其他写入方会等待
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                new_rows = self._write_rows(keys, vectors)
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+            self._rows.update(new_rows)
+
+    def _write_rows(self, keys: List[str], vectors: np.ndarray) -> Dict[str, int]:
+        """在写事务内调用：同步其他进程登记的维度与行号，追加新向量并登记，返回新增的 key -> 行号。"""
+        dim = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if dim is None:
+            self.dim = int(vectors.shape[1])
+            self._conn.execute("INSERT INTO meta (name, value) VALUES ('dim', ?)", (str(self.dim),))
+        else:
+            self.dim = int(dim[0])
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"向量维度 {vectors.shape[1]} 与向量库 {self.dim} 不一致（model_id={self.model_id}）")
+        known_max = max(self._rows.values(), default=-1)
+        self._rows.update(self._conn.execute("SELECT key, row FROM vectors WHERE row > ?", (known_max,)))
+        next_row = self._conn.execute("SELECT COALESCE(MAX(row), -1) + 1 FROM vectors").fetchone()[0]
+        new_rows = {}
+        for key, vector in zip(keys, vectors):
+            if key in self._rows or key in new_rows:
+                continue
+            new_rows[key] = (next_row + len(new_rows), vector)
+        self._ensure_capacity(next_row + len(new_rows))  # 同步的行也须落在 memmap 范围内
+        if not new_rows:
+            return {}
+        for row, vector in new_rows.values():
+            self._matrix[row] = vector
+        self._matrix.flush()
+        self._conn.executemany(
+            "INSERT INTO vectors (key, row) VALUES (?, ?)",
+            [(key, row) for key, (row, _) in new_rows.items()],
+        )
+        return {key: row for key, (row, _) in new_rows.items()}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._rows), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,61 @@
+"""
+批量入库断点文件（JSON）。
+
+以文件内容哈希为键记录每个文件的状态：
+    done         已完整写入 Chroma + BM25
+    in_progress  已开始写入但未完成（重跑时先按 file_hash 清理残留节点再重新入库）
+    failed       解析失败，附错误信息（重跑时会再次尝试）
+"""
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+
+class IngestCheckpoint:
+    """批量入库进度，原子写盘；mark_done 由调用方在一批节点写入后统一 save。"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.done: Dict[str, Dict[str, Any]] = {}
+        self.in_progress: Dict[str, str] = {}
+        self.failed: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.done = data.get("done", {})
+            self.in_progress = data.get("in_progress", {})
+            self.failed = data.get("failed", {})
+
+    def reset(self) -> None:
+        self.done.clear()
+        self.in_progress.clear()
+        self.failed.clear()
+        self.save()
+
+    def mark_in_progress(self, file_hash: str, file_name: str) -> None:
+        self.in_progress[file_hash] = file_name
+        self.failed.pop(file_hash, None)
+        self.save()
+
+    def mark_done(self, file_hash: str, file_name: str, pages: int, chunks: int) -> None:
+        self.in_progress.pop(file_hash, None)
+        self.done[file_hash] = {"file": file_name, "pages": pages, "chunks": chunks, "finished_at": time.time()}
+
+    def mark_failed(self, file_hash: str, file_name: str, error: str) -> None:
+        self.in_progress.pop(file_hash, None)
+        self.failed[file_hash] = {"file": file_name, "error": error}
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(
+                {"done": self.done, "in_progress": self.in_progress, "failed": self.failed},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        os.replace(tmp_path, self.path)
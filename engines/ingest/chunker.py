@@ -0,0 +1,254 @@
+"""
+法规 Markdown 结构化切分。
+
+MinerUParser._blocks_to_markdown 输出的 Markdown 包含 `# 第 N 页` 页标题、条款编号（如 `4.2.1`、`A.7.4`、`第三章`）、
+HTML 表格与 `$$` 公式块。本切分器：
+- 沿条款/章节边界切分，相邻的短条款合并到 chunk_max_chars 以内；
+- 表格与公式块整体保留，绝不从中间切开（超长时单独成块）；
+- 超长条款按段落/句子切分，续块前补上条款标题作为上下文；
+- 节点元数据带上起止页码与条款编号/标题；
+- 节点 id 由 文件名 + 页码 + 块序号 + 文本 哈希得到，同一文件重复入库时 id 不变（upsert 幂等）。
+"""
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence
+
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.node_parser import NodeParser
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.utils import get_tqdm_iterable
+
+PAGE_HEADING_RE = re.compile(r"^#+\s*第\s*(\d+)\s*页\s*$")
+# 多级条款号（4.2 / 4.2.1 / A.7.4）后接标题或正文
+MULTI_LEVEL_CLAUSE_RE = re.compile(r"^#*\s*((?:[A-Z]\.)?\d+(?:\.\d+)+)[\s　]+(\S.*)$")
+# 一级条款号（4 技术要求）：只接受较短的标题行，避免把以数字开头的正文误判为条款
+TOP_LEVEL_CLAUSE_RE = re.compile(r"^#*\s*(\d{1,2})[\s　]+([^\d\s].{0,29})$")
+# 第X章/节/条、附录X
+CHAPTER_RE = re.compile(r"^#*\s*(第[一二三四五六七八九十百零\d]+[章节条]|附\s*录\s*[A-Z])[\s　]*(.{0,40})$")
+SENTENCE_END_RE = re.compile(r"(?<=[。；！？;!?])")
+
+# 不参与向量化与 LLM 提示的切分元数据
+EXCLUDED_CHUNK_METADATA_KEYS = ["page_end"]
+
+
+@dataclass
+class _Section:
+    clause_id: str
+    title: str
+    page: Optional[int]
+    parts: List[str] = field(default_factory=list)  # 段落行或整块表格/公式
+    page_end: Optional[int] = None
+
+
+@dataclass
+class Chunk:
+    """切分结果：文本与条款/页码信息。"""
+
+    text: str
+    clause_id: str
+    clause_title: str
+    page_start: Optional[int]
+    page_end: Optional[int]
+
+
+def _match_heading(line: str) -> Optional[tuple]:
+    for pattern in (MULTI_LEVEL_CLAUSE_RE, CHAPTER_RE, TOP_LEVEL_CLAUSE_RE):
+        match = pattern.match(line)
+        if match:
+            return re.sub(r"\s+", "", match.group(1)), match.group(2).strip()
+    return None
+
+
+def _sections(text: str, page: Optional[int]) -> List[_Section]:
+    """逐行扫描，把表格/公式收拢成整块，按条款标题分节。"""
+    lines = text.splitlines()
+    sections = [_Section("", "", page, page_end=page)]
+    idx = 0
+    while idx < len(lines):
+        line = lines[idx].strip()
+        idx += 1
+        if not line or line == "---":
+            continue
+        page_match = PAGE_HEADING_RE.match(line)
+        if page_match:
+            page = int(page_match.group(1))
+            if not sections[-1].parts:
+                sections[-1].page = page
+            continue
+
+        if "<table" in line.lower():
+            block = [line]
+            while "</table>" not in block[-1].lower() and idx < len(lines):
+                block.append(lines[idx].rstrip())
+                idx += 1
+            sections[-1].parts.append("\n".join(block))
+        elif line == "$$" or (line.startswith("$$") and not (len(line) > 2 and line.endswith("$$"))):
+            block = [line]
+            while idx < len(lines):
+                block.append(lines[idx].rstrip())
+                idx += 1
+                if block[-1].strip().endswith("$$"):
+                    break
+            sections[-1].parts.append("\n".join(block))
+        else:
+            heading = _match_heading(line)
+            if heading is not None:
+                sections.append(_Section(heading[0], heading[1], page, [line], page_end=page))
+                continue
+            sections[-1].parts.append(line)
+        sections[-1].page_end = page
+    return [section for section in sections if section.parts]
+
+
+def _is_atomic(part: str) -> bool:
+    return "<table" in part.lower() or part.lstrip().startswith("$$")
+
+
+def _split_long_paragraph(part: str, max_chars: int) -> List[str]:
+    """超长普通段落按句子切分；表格/公式不切。"""
+    if len(part) <= max_chars or _is_atomic(part):
+        return [part]
+    pieces, current = [], ""
+    for sentence in SENTENCE_END_RE.split(part):
+        if current and len(current) + len(sentence) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += sentence
+    if current:
+        pieces.append(current)
+    # 没有句末标点的超长行按长度硬切
+    return [piece[i:i + max_chars] for piece in pieces for i in range(0, len(piece), max_chars)]
+
+
+def _split_section(section: _Section, max_chars: int, header_count: int = 1) -> List[str]:
+    """
+    把超长条款切成多块，续块以条款标题开头；前 header_count 个部分视为标题行。
+    标题行与续块标题计入 max_chars：正文按扣除标题后的余量切分（单个表格/公式除外）。
+    """
+    heading = section.parts[header_count - 1] if section.clause_id else ""
+    continuation = f"（续）{heading}" if heading else ""
+    header_size = max(sum(len(p) + 1 for p in section.parts[:header_count]), len(continuation) + 1 if continuation else 0)
+    budget = max(max_chars - header_size, max_chars // 4)
+    parts = section.parts[:header_count] + [
+        piece for part in section.parts[header_count:] for piece in _split_long_paragraph(part, budget)
+    ]
+    texts, current, has_body = [], [], False
+    for idx, part in enumerate(parts):
+        size = sum(len(p) + 1 for p in current)
+        # 只有标题时不单独成块，标题始终与其后的正文/表格在一起
+        if has_body and size + len(part) > max_chars:
+            texts.append("\n".join(current))
+            current, has_body = ([continuation] if continuation else []), False
+        current.append(part)
+        has_body = has_body or idx >= header_count
+    if has_body:
+        texts.append("\n".join(current))
+    return texts
+
+
+def split_regulation_markdown(text: str, max_chars: int = 1000, min_chars: int = 200, page: Optional[int] = None) -> List[Chunk]:
+    """
+    按条款结构切分一段法规 Markdown。
+
+    Args:
+        text: Markdown 文本
+        max_chars: 单块最大字符数（单个表格/公式超过时仍整块保留）
+        min_chars: 小于该长度的块会与后续条款合并
+        page: 文本开头所在页码（文本内的 `# 第 N 页` 会覆盖）
+
+    Returns:
+        Chunk 列表，顺序与原文一致
+    """
+    chunks: List[Chunk] = []
+    pending: List[_Section] = []
+
+    def emit_pending() -> None:
+        if not pending:
+            return
+        first = next((s for s in pending if s.clause_id), pending[0])
+        chunks.append(
+            Chunk(
+                text="\n".join("\n".join(s.parts) for s in pending),
+                clause_id=first.clause_id,
+                clause_title=first.title,
+                page_start=pending[0].page,
+                page_end=pending[-1].page_end,
+            )
+        )
+        pending.clear()
+
+    for section in _sections(text, page):
+        size = sum(len(p) + 1 for p in section.parts)
+        pending_size = sum(len(p) + 1 for s in pending for p in s.parts)
+        if size > max_chars:
+            if pending_size < min_chars:
+                # 过短的前文（如上级章标题）并入超长条款一起切分
+                header_count = 1 + sum(len(s.parts) for s in pending)
+                section = _Section(section.clause_id, section.title, pending[0].page if pending else section.page,
+                                   [p for s in pending for p in s.parts] + section.parts, section.page_end)
+            else:
+                header_count = 1
+                emit_pending()
+            # 并入的前文自带条款号时，首块沿用最前面的条款号/标题（续块只含本条款正文）
+            first = next((s for s in pending if s.clause_id), section)
+            pending.clear()
+            for idx, piece in enumerate(_split_section(section, max_chars, header_count if section.clause_id else 0)):
+                head = first if idx == 0 else section
+                chunks.append(Chunk(piece, head.clause_id, head.title, section.page, section.page_end))
+            continue
+        if pending and pending_size + size > max_chars:
+            emit_pending()
+        pending.append(section)
+        if pending_size + size >= max_chars:
+            emit_pending()
+    emit_pending()
+    return chunks
+
+
+def stable_chunk_id(file_name: str, page: Any, ordinal: int, text: str) -> str:
+    """由 文件名 + 页码 + 块序号 + 文本 得到稳定的节点 id。"""
+    digest = hashlib.sha256(f"{file_name}\x1f{page}\x1f{ordinal}\x1f{text}".encode("utf-8")).hexdigest()
+    return f"{digest[:8]}-{digest[8:12]}-{digest[12:16]}-{digest[16:20]}-{digest[20:32]}"
+
+
+class RegulationNodeParser(NodeParser):
+    """基于条款结构的节点切分器，可直接作为 Settings.transformations 使用。"""
+
+    max_chars: int = Field(default=1000, description="单块最大字符数")
+    min_chars: int = Field(default=200, description="短条款合并阈值")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RegulationNodeParser"
+
+    def _parse_nodes(self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs: Any) -> List[BaseNode]:
+        all_nodes: List[BaseNode] = []
+        for node in get_tqdm_iterable(nodes, show_progress, "Splitting regulation markdown"):
+            page = node.metadata.get("page_number")
+            chunks = split_regulation_markdown(
+                node.get_content(metadata_mode=MetadataMode.NONE),
+                max_chars=self.max_chars,
+                min_chars=self.min_chars,
+                page=page if isinstance(page, int) else None,
+            )
+            file_name = node.metadata.get("file_name", "")
+            built = build_nodes_from_splits(
+                [chunk.text for chunk in chunks],
+                node,
+                id_func=lambda i, doc: stable_chunk_id(file_name, page, i, chunks[i].text),
+            )
+            for chunk, text_node in zip(chunks, built):
+                if chunk.page_start is not None:
+                    text_node.metadata["page_number"] = chunk.page_start
+                    text_node.metadata["page_end"] = chunk.page_end
+                text_node.metadata["clause_id"] = chunk.clause_id
+                text_node.metadata["clause_title"] = chunk.clause_title
+                for key in EXCLUDED_CHUNK_METADATA_KEYS:
+                    if key not in text_node.excluded_embed_metadata_keys:
+                        text_node.excluded_embed_metadata_keys.append(key)
+                    if key not in text_node.excluded_llm_metadata_keys:
+                        text_node.excluded_llm_metadata_keys.append(key)
+            all_nodes.extend(built)
+        return all_nodes
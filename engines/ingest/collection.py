@@ -0,0 +1,187 @@
+"""
+Chroma 集合与 HNSW 参数：创建集合时写入距离度量、M、ef_construction、ef_search，并支持用已存向量重建集合。
+
+- space / M / ef_construction 决定索引结构，只在创建集合时生效，修改后需重建（migrate_collection.py）；
+- ef_search 只影响查询，Chroma 1.x 可直接在已有集合上修改（重新打开集合后生效），无需重建；
+- 重建时从旧集合分页读出 ids、向量、元数据与文本写入临时集合，校验条数后删除旧集合并把临时集合改名，
+  不调用嵌入模型；节点 id 不变，BM25 索引与文档登记表无需改动。
+"""
+import logging
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("autosafety")
+
+HNSW_SPACES = ("l2", "cosine", "ip")
+REBUILD_SUFFIX = "_rebuild"
+
+
+@dataclass(frozen=True)
+class HnswParams:
+    """HNSW 索引参数（默认值与 Chroma 一致）。"""
+
+    space: str = "l2"
+    m: int = 16
+    construction_ef: int = 100
+    search_ef: int = 100
+
+    def __post_init__(self) -> None:
+        if self.space not in HNSW_SPACES:
+            raise ValueError(f"不支持的距离度量: {self.space}，可选 {HNSW_SPACES}")
+
+    @classmethod
+    def from_config(cls, model_config: Any) -> "HnswParams":
+        return cls(
+            space=model_config.hnsw_space,
+            m=model_config.hnsw_m,
+            construction_ef=model_config.hnsw_construction_ef,
+            search_ef=model_config.hnsw_search_ef,
+        )
+
+    def to_metadata(self) -> Dict[str, Any]:
+        """Chroma 集合元数据写法（0.5 与 1.x 均识别）。"""
+        return {
+            "hnsw:space": self.space,
+            "hnsw:M": self.m,
+            "hnsw:construction_ef": self.construction_ef,
+            "hnsw:search_ef": self.search_ef,
+        }
+
+    def needs_rebuild(self, other: "HnswParams") -> bool:
+        """索引结构参数不同（ef_search 之外）时只能重建集合。"""
+        return (self.space, self.m, self.construction_ef) != (other.space, other.m, other.construction_ef)
+
+    def describe(self) -> str:
+        return ", ".join(f"{key}={value}" for key, value in asdict(self).items())
+
+
+def current_params(collection: Any) -> HnswParams:
+    """读取集合实际生效的 HNSW 参数：优先 Chroma 1.x 的 configuration，其次集合元数据。"""
+    hnsw = (getattr(collection, "configuration_json", None) or {}).get("hnsw") or {}
+    if hnsw:
+        return HnswParams(
+            space=hnsw.get("space", "l2"),
+            m=hnsw.get("max_neighbors", 16),
+            construction_ef=hnsw.get("ef_construction", 100),
+            search_ef=hnsw.get("ef_search", 100),
+        )
+    metadata = collection.metadata or {}
+    return HnswParams(
+        space=metadata.get("hnsw:space", "l2"),
+        m=metadata.get("hnsw:M", 16),
+        construction_ef=metadata.get("hnsw:construction_ef", 100),
+        search_ef=metadata.get("hnsw:search_ef", 100),
+    )
+
+
+def set_search_ef(collection: Any, search_ef: int) -> bool:
+    """
+    在已有集合上修改 ef_search；当前 Chroma 版本不支持时返回 False。
+
+    新值写入集合配置，本进程中已加载的索引仍按旧值查询，重新打开客户端（或重启进程）后生效，
+    因此 get_vector_store 在首次查询前调用。
+    """
+    try:
+        collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+    except Exception as exc:  # chromadb<1.0 的 modify 不接受 configuration
+        logger.warning("无法在线修改 ef_search（%s），需重建集合", exc)
+        return False
+    return True
+
+
+def open_collection(client: Any, name: str, params: HnswParams) -> Any:
+    """
+    获取或创建集合；新建时写入 HNSW 参数，已有集合参数不一致时调整 ef_search 或提示重建。
+
+    Args:
+        client: chromadb 客户端
+        name: 集合名
+        params: 期望的 HNSW 参数
+
+    Returns:
+        Chroma 集合
+    """
+    names = _collection_names(client)
+    if name not in names and f"{name}{REBUILD_SUFFIX}" in names:
+        logger.warning("发现未完成的重建集合 %s%s，请先运行 python migrate_collection.py 完成迁移", name, REBUILD_SUFFIX)
+    collection = client.get_or_create_collection(name, metadata=params.to_metadata())
+    actual = current_params(collection)
+    if actual.needs_rebuild(params):
+        logger.warning(
+            "集合 %s 的 HNSW 参数与配置不一致（实际 %s；配置 %s），运行 python migrate_collection.py 重建后生效",
+            name,
+            actual.describe(),
+            params.describe(),
+        )
+    if actual.search_ef != params.search_ef and set_search_ef(collection, params.search_ef):
+        logger.info("集合 %s 的 ef_search: %s -> %s", name, actual.search_ef, params.search_ef)
+    return collection
+
+
+def _collection_names(client: Any) -> set:
+    # chromadb 0.5 返回 Collection 对象，0.6+ 返回名称字符串
+    return {getattr(item, "name", item) for item in client.list_collections()}
+
+
+def copy_collection(
+    source: Any,
+    target: Any,
+    batch_size: int = 1000,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """分页把 source 的 ids、向量、元数据与文本原样写入 target，返回写入条数。"""
+    max_batch = getattr(getattr(target, "_client", None), "get_max_batch_size", lambda: batch_size)()
+    batch_size = max(1, min(batch_size, max_batch))
+    total, copied = source.count(), 0
+    while copied < total:
+        res = source.get(include=["embeddings", "metadatas", "documents"], limit=batch_size, offset=copied)
+        ids = res.get("ids") or []
+        if not ids:
+            break
+        target.upsert(ids=ids, embeddings=res["embeddings"], metadatas=res["metadatas"], documents=res["documents"])
+        copied += len(ids)
+        if progress is not None:
+            progress(copied, total)
+    return copied
+
+
+def rebuild_collection(
+    client: Any,
+    name: str,
+    params: HnswParams,
+    batch_size: int = 1000,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Any:
+    """
+    以新的 HNSW 参数重建集合（复用已存向量）；上次在改名前中断时直接完成改名。
+
+    Args:
+        client: chromadb 客户端
+        name: 集合名
+        params: 新的 HNSW 参数
+        batch_size: 每次读写条数
+        progress: 进度回调 (已复制, 总数)
+
+    Returns:
+        重建后的集合
+    """
+    temp_name = f"{name}{REBUILD_SUFFIX}"
+    names = _collection_names(client)
+    if name not in names and temp_name in names:
+        logger.info("完成上次中断的重建：%s -> %s", temp_name, name)
+        temp = client.get_collection(temp_name)
+        temp.modify(name=name)
+        return client.get_collection(name)
+
+    source = client.get_or_create_collection(name)
+    if temp_name in names:
+        client.delete_collection(temp_name)  # 上次复制到一半的临时集合
+    temp = client.create_collection(temp_name, metadata=params.to_metadata())
+    copied = copy_collection(source, temp, batch_size, progress)
+    if copied != source.count() or temp.count() != copied:
+        client.delete_collection(temp_name)
+        raise RuntimeError(f"重建集合 {name} 失败：复制 {copied} 条，源集合 {source.count()} 条")
+    client.delete_collection(name)
+    temp.modify(name=name)
+    logger.info("集合 %s 已重建（%s 条）：%s", name, copied, params.describe())
+    return client.get_collection(name)
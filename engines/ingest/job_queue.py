@@ -0,0 +1,139 @@
+"""
+持久化入库任务队列（SQLite）。
+
+状态流转：queued -> running -> done / failed。
+进程重启后，上次未完成的 running 任务会重新排队，上传文件本身已落地在 UPLOAD_DIR。
+"""
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_COLUMNS = "id, file_name, file_path, file_hash, status, progress, message, doc_count, created_at, updated_at"
+
+
+@dataclass
+class IngestJob:
+    """单个文件的入库任务。"""
+
+    id: int
+    file_name: str
+    file_path: str
+    file_hash: str
+    status: str
+    progress: float
+    message: str
+    doc_count: int
+    created_at: float
+    updated_at: float
+
+
+class JobQueue:
+    """SQLite 任务表的线程安全封装（单连接 + 锁，WAL 模式）。"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_name TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    file_hash TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT NOT NULL DEFAULT '',
+                    doc_count INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_hash ON jobs(file_hash)")
+
+    def submit(self, file_name: str, file_path: str, file_hash: str) -> int:
+        """新建排队任务，返回任务 id。"""
+        now = time.time()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO jobs (file_name, file_path, file_hash, status, message, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (file_name, file_path, file_hash, QUEUED, "排队中", now, now),
+            )
+            return cur.lastrowid
+
+    def claim_next(self) -> Optional[IngestJob]:
+        """取出最早的排队任务并标记为 running；无任务返回 None。"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, message = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, "开始处理", now, row[0]),
+            )
+        job = IngestJob(*row)
+        job.status, job.message, job.updated_at = RUNNING, "开始处理", now
+        return job
+
+    def update(
+        self,
+        job_id: int,
+        status: Optional[str] = None,
+        progress: Optional[float] = None,
+        message: Optional[str] = None,
+        doc_count: Optional[int] = None,
+    ) -> None:
+        """更新任务状态/进度，只写入非 None 的字段。"""
+        fields = {"status": status, "progress": progress, "message": message, "doc_count": doc_count}
+        fields = {key: value for key, value in fields.items() if value is not None}
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def requeue_interrupted(self) -> int:
+        """启动时调用：把上次进程退出时仍在 running 的任务重新排队。"""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = 0, message = ?, updated_at = ? WHERE status = ?",
+                (QUEUED, "重启后重新排队", time.time(), RUNNING),
+            )
+            return cur.rowcount
+
+    def find_active(self, file_hash: str) -> Optional[IngestJob]:
+        """返回同内容的排队/处理中任务。"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE file_hash = ? AND status IN (?, ?) ORDER BY id LIMIT 1",
+                (file_hash, QUEUED, RUNNING),
+            ).fetchone()
+        return IngestJob(*row) if row else None
+
+    def recent(self, limit: int = 20) -> List[IngestJob]:
+        """最近的任务（新任务在前）。"""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [IngestJob(*row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数。"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
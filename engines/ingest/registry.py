@@ -0,0 +1,99 @@
+"""
+已索引文档登记表（SQLite）：每个文件版本一行，记录文件名、内容哈希、页数、块数与入库时间。
+
+界面列出已索引文件、按内容去重、展示库容量时只查询本表（O(文件数)），不再全量扫描 Chroma 元数据。
+由 rag_engine 在每次写入/删除节点后按文件名同步，单个文件名的所有行在一个事务内替换。
+"""
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+@dataclass
+class RegisteredDocument:
+    """一个已索引的文件版本。"""
+
+    file_hash: str
+    file_name: str
+    page_count: int
+    chunk_count: int
+    ingested_at: float
+
+
+class DocumentRegistry:
+    """SQLite 登记表的线程安全封装（单连接 + 锁，WAL 模式）。"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    file_hash TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    page_count INTEGER NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    ingested_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_name ON documents(file_name)")
+
+    def replace_file(self, file_name: str, versions: Iterable[Tuple[str, int, int]]) -> None:
+        """
+        用 Chroma 中的现状替换某文件名的全部登记行。
+
+        Args:
+            file_name: 文件名
+            versions: [(file_hash, page_count, chunk_count)]，为空表示该文件已无节点
+
+        已登记的版本（file_hash 不变）保留原入库时间，只有新版本记为当前时间。
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            ingested = dict(
+                self._conn.execute("SELECT file_hash, ingested_at FROM documents WHERE file_name = ?", (file_name,))
+            )
+            self._conn.execute("DELETE FROM documents WHERE file_name = ?", (file_name,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (file_hash, file_name, page_count, chunk_count, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (file_hash, file_name, pages, chunks, ingested.get(file_hash, now))
+                    for file_hash, pages, chunks in versions
+                    if chunks
+                ],
+            )
+
+    def file_names(self) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT DISTINCT file_name FROM documents")}
+
+    def hashes(self) -> Dict[str, str]:
+        """{file_hash: file_name}"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT file_hash, file_name FROM documents"))
+
+    def chunk_total(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(chunk_count), 0) FROM documents").fetchone()[0]
+
+    def documents(self) -> List[RegisteredDocument]:
+        """全部登记文件，最近入库的在前。"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_hash, file_name, page_count, chunk_count, ingested_at FROM documents "
+                "ORDER BY ingested_at DESC"
+            ).fetchall()
+        return [RegisteredDocument(*row) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
@@ -0,0 +1,86 @@
+"""
+后台入库工作线程池：从 JobQueue 取任务并调用入库处理函数，与 Streamlit 脚本运行解耦。
+
+并发预算由 max_workers 限定同时处理的任务数；占用 VLM（GPU）的部分由 handler 自行申请额外的信号量。
+"""
+import logging
+import threading
+from typing import Callable, List, Optional
+
+from engines.ingest.job_queue import DONE, FAILED, IngestJob, JobQueue
+
+logger = logging.getLogger("autosafety")
+
+# handler(job, report) -> 入库页数；report(progress, message) 用于上报进度
+ProgressFn = Callable[[float, str], None]
+IngestHandler = Callable[[IngestJob, ProgressFn], int]
+
+
+class IngestWorker:
+    """持久化队列 + 固定大小线程池。"""
+
+    def __init__(self, queue: JobQueue, handler: IngestHandler, max_workers: int = 2):
+        self.queue = queue
+        self.handler = handler
+        self.max_workers = max(1, max_workers)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._finished = 0
+        self._finished_lock = threading.Lock()
+
+    def start(self) -> "IngestWorker":
+        """恢复中断的任务并启动工作线程。"""
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            logger.info("重新排队上次未完成的入库任务: %s", requeued)
+        for idx in range(self.max_workers):
+            thread = threading.Thread(target=self._loop, name=f"ingest-worker-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def submit(self, file_name: str, file_path: str, file_hash: str) -> int:
+        """提交入库任务并唤醒空闲线程，返回任务 id。"""
+        job_id = self.queue.submit(file_name, file_path, file_hash)
+        logger.info("入库任务已排队: #%s %s", job_id, file_name)
+        self._wakeup.set()
+        return job_id
+
+    @property
+    def finished_count(self) -> int:
+        """本进程内已结束（成功或失败）的任务数，界面据此判断是否需要刷新索引状态。"""
+        with self._finished_lock:
+            return self._finished
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            job = self.queue.claim_next()
+            if job is None:
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: IngestJob) -> None:
+        logger.info("开始入库任务: #%s %s", job.id, job.file_name)
+
+        def report(progress: float, message: str) -> None:
+            self.queue.update(job.id, progress=progress, message=message)
+
+        try:
+            doc_count = self.handler(job, report)
+            self.queue.update(job.id, status=DONE, progress=1.0, message="完成", doc_count=doc_count)
+            logger.info("入库任务完成: #%s %s, 页数=%s", job.id, job.file_name, doc_count)
+        except Exception as exc:
+            logger.exception("入库任务失败: #%s %s", job.id, job.file_name)
+            self.queue.update(job.id, status=FAILED, message=f"失败: {exc}")
+        finally:
+            with self._finished_lock:
+                self._finished += 1
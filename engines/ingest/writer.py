@@ -0,0 +1,110 @@
+"""
+批量索引写入：按长度排序、自适应成批向量化，并与 Chroma upsert 重叠执行。
+
+VectorStoreIndex(nodes) 按原始顺序每 embed_batch_size 个节点向量化一次，长短切片混在同一批里，
+短切片被补齐到批内最长长度；写入 Chroma 也要等全部向量化完成后才开始。本模块：
+- 按 EMBED 文本长度排序，相近长度的切片进入同一批，减少补齐；
+- 每批的条数由字符预算决定（短切片批更大，长切片批更小），上限 max_batch_items；
+- 向量化在后台线程中进行（engines.ocr_by_vlm.pipeline.background_iter），主线程同时把已向量化的节点
+  分批 upsert 到 Chroma，两阶段重叠；各阶段忙碌时间记录在 StageStats 中。
+"""
+import logging
+from typing import Any, Callable, Iterator, List, Sequence
+
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+from engines.ocr_by_vlm.pipeline import StageStats, background_iter
+
+logger = logging.getLogger("autosafety")
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+WriteFn = Callable[[List[BaseNode]], None]
+
+
+def upsert_chroma(collection: Any, nodes: Sequence[BaseNode], batch_size: int = 1000) -> None:
+    """将已向量化的节点分批 upsert 到 Chroma 集合；元数据与文本的写法与 ChromaVectorStore.add 保持一致。"""
+    max_batch = getattr(getattr(collection, "_client", None), "get_max_batch_size", lambda: batch_size)()
+    batch_size = max(1, min(batch_size, max_batch))
+    for start in range(0, len(nodes), batch_size):
+        chunk = nodes[start:start + batch_size]
+        metadatas = []
+        for node in chunk:
+            metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=True)
+            metadatas.append({key: "" if value is None else value for key, value in metadata.items()})
+        collection.upsert(
+            ids=[node.node_id for node in chunk],
+            embeddings=[node.get_embedding() for node in chunk],
+            metadatas=metadatas,
+            documents=[node.get_content(metadata_mode=MetadataMode.NONE) for node in chunk],
+        )
+
+
+def plan_batches(lengths: Sequence[int], max_batch_items: int, max_batch_chars: int) -> List[List[int]]:
+    """
+    按长度升序把下标分批：每批总字符数不超过 max_batch_chars（单条超长时独占一批），条数不超过 max_batch_items。
+
+    Args:
+        lengths: 每条文本的长度
+        max_batch_items: 每批最多条数
+        max_batch_chars: 每批字符预算
+
+    Returns:
+        下标批列表
+    """
+    batches, current, current_chars = [], [], 0
+    for idx in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        if current and (len(current) >= max_batch_items or current_chars + lengths[idx] > max_batch_chars):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(idx)
+        current_chars += lengths[idx]
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BulkIndexWriter:
+    """排序 + 自适应分批向量化，与写入阶段重叠。"""
+
+    def __init__(
+        self,
+        embed_fn: EmbedFn,
+        write_fn: WriteFn,
+        max_batch_items: int = 128,
+        max_batch_chars: int = 64_000,
+        write_batch: int = 1000,
+        queue_size: int = 2,
+    ):
+        self.embed_fn = embed_fn
+        self.write_fn = write_fn
+        self.max_batch_items = max_batch_items
+        self.max_batch_chars = max_batch_chars
+        self.write_batch = write_batch
+        self.queue_size = queue_size
+
+    def _embedded(self, nodes: List[BaseNode]) -> Iterator[List[BaseNode]]:
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        batches = plan_batches([len(text) for text in texts], self.max_batch_items, self.max_batch_chars)
+        logger.info("向量化分批: %s 个块 -> %s 批", len(texts), len(batches))
+        ready: List[BaseNode] = []
+        for batch in batches:
+            embeddings = self.embed_fn([texts[i] for i in batch])
+            for idx, embedding in zip(batch, embeddings):
+                nodes[idx].embedding = embedding
+                ready.append(nodes[idx])
+            while len(ready) >= self.write_batch:
+                yield ready[: self.write_batch]
+                ready = ready[self.write_batch:]
+        if ready:
+            yield ready
+
+    def write(self, nodes: List[BaseNode]) -> StageStats:
+        """向量化并写入全部节点，返回各阶段耗时（embed 为后台向量化，write 为写入）。"""
+        stats = StageStats()
+        for chunk in background_iter(self._embedded(nodes), self.queue_size, stats, "embed"):
+            with stats.track("write", len(chunk)):
+                self.write_fn(chunk)
+        stats.finish()
+        logger.info("批量写入 %s 个块 | %s", len(nodes), stats.report())
+        return stats
@@ -13,44 +13,93 @@ pip install transformers torch pdf2image pillow pymupdf mineru-vl-utils
 功能: 使用MinerU 2.5模型将PDF转换为Markdown格式，支持文字、表格、公式、图片提取
 """
 
+import logging
 import os
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple
 
-import torch
-from transformers import AutoProcessor, Qwen2VLForConditionalGeneration
 from PIL import Image
-from pdf2image import convert_from_path
 
 # 导入配置模块
-from config import model_config
+from config import model_config, PARSE_CACHE_DIR
 
-# 需要安装 mineru_vl_utils
-# pip install "mineru-vl-utils[transformers]"
-from mineru_vl_utils import MinerUClient
-from Visualize_parser_pdf.utils.draw_utils import draw_layout_bbox
+# torch / transformers / mineru_vl_utils 在实例化与加载模型时才导入：
+# 文本层快速通道与 Markdown 组装不依赖模型，可在未安装模型依赖的环境中使用与测试
 
+try:
+    import psutil
+except ImportError:  # 未安装 psutil 时 CPU 批大小使用保守默认值
+    psutil = None
+from Visualize_parser_pdf.utils.draw_utils import LayoutDrawer
+from engines.ocr_by_vlm.parse_cache import ParseCache
+from engines.ocr_by_vlm.page_source import count_pages, iter_pdf_pages
+from engines.ocr_by_vlm.pipeline import BackgroundWorker, StageStats, background_iter, timed_iter
+from engines.ocr_by_vlm.text_layer import PageRoute, TextLayer
+
+logger = logging.getLogger("autosafety")
+
+
+def _default_device() -> str:
+    """有可用 GPU 时使用 cuda；未安装 torch 时按 cpu 处理（只用文本层时无需 torch）"""
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    return "cuda" if torch.cuda.is_available() else "cpu"
 
 
 class MinerUParser:
     """MinerU PDF解析器封装"""
     
-    def __init__(self, model_name: str = None):
+    def __init__(self, model_name: str = None, use_cache: bool = None):
         """初始化解析器
         
         Args:
             model_name: 模型名称或路径，如果为None则使用config中的默认路径
+            use_cache: 是否使用解析缓存，如果为None则使用config中的配置
         """
         # 使用config中的默认路径或用户提供的路径
         self.model_name = model_name or model_config.mineru_model_path
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.use_cache = model_config.parse_cache_enabled if use_cache is None else use_cache
+        self.device = _default_device()
         self.model = None
         self.processor = None
         self.client = None
+        self.batch_size = model_config.mineru_batch_size or self._auto_batch_size()
+        self.dpi = model_config.mineru_render_dpi
+        self.save_page_images = model_config.mineru_save_page_images
+        self.pipelined = model_config.mineru_pipeline
+        self.table_enable = model_config.mineru_table_enable
+        self.formula_enable = model_config.mineru_formula_enable
+        self.disabled_block_fallback = model_config.mineru_disabled_block_fallback
+        self.text_fast_path = model_config.text_fast_path_enabled
+        self.last_stage_stats = {}
+        self._vlm_seconds_per_page = None  # 历史VLM单页耗时，用于估算快速通道节省的时间
         
+    def _auto_batch_size(self) -> int:
+        """根据可用显存/内存估算每批页数（经验值：GPU 约 1GB/页，CPU 约 2GB/页）"""
+        if self.device == "cuda":
+            import torch
+
+            free_bytes, _ = torch.cuda.mem_get_info()
+            per_page = 1 << 30
+        elif psutil is not None:
+            free_bytes = psutil.virtual_memory().available
+            per_page = 2 << 30
+        else:
+            return 2
+        return max(1, min(16, int(free_bytes // per_page)))
+
     def load_model(self) -> None:
         """加载模型到内存"""
         if self.model is None:
+            from transformers import AutoProcessor, Qwen2VLForConditionalGeneration
+
+            # 需要安装 mineru_vl_utils
+            # pip install "mineru-vl-utils[transformers]"
+            from mineru_vl_utils import MinerUClient
+
             print(f"正在加载模型到 {self.device}...")
             
             # 加载模型和处理器
@@ -69,42 +118,137 @@ class MinerUParser:
             self.client = MinerUClient(
                 backend="transformers",
                 model=self.model,
-                processor=self.processor
+                processor=self.processor,
+                batch_size=self.batch_size
             )
             
-            print("模型加载完成!")
+            print(f"模型加载完成! batch_size={self.batch_size}")
     
-    def _extract_images_from_pdf(self, pdf_path: str, output_dir: str) -> Dict[int, List[str]]:
-        """从PDF中提取图片
+    def extract_blocks_batched(self, images: List[Image.Image], not_extract_list: Optional[List[str]] = None) -> List[List[Dict]]:
+        """批量两阶段提取：每批 batch_size 页，版面检测一次前向、全部块的内容识别再成批前向
         
         Args:
-            pdf_path: PDF文件路径
-            output_dir: 图片输出目录
+            images: 页面图片列表
+            not_extract_list: 跳过内容识别的块类型（仍做版面检测，content 为空）
             
         Returns:
-            图片路径字典，键为页码，值为图片路径列表
+            与 images 一一对应的 extracted_blocks 列表
         """
-        os.makedirs(output_dir, exist_ok=True)
-        images = convert_from_path(pdf_path)
+        kwargs = {"not_extract_list": not_extract_list} if not_extract_list else {}
+        results = []
+        for start in range(0, len(images), self.batch_size):
+            batch = images[start:start + self.batch_size]
+            if len(batch) == 1:
+                results.append(self.client.two_step_extract(batch[0], **kwargs))
+            else:
+                results.extend(self.client.batch_two_step_extract(batch, **kwargs))
+        return results
+
+    def _skipped_block_types(self, table_enable: Optional[bool], formula_enable: Optional[bool]) -> List[str]:
+        """根据表格/公式开关得到不做VLM内容识别的块类型"""
+        table_enable = self.table_enable if table_enable is None else table_enable
+        formula_enable = self.formula_enable if formula_enable is None else formula_enable
+        skipped = []
+        if not table_enable:
+            skipped.append("table")
+        if not formula_enable:
+            skipped.append("equation")
+        return skipped
+
+    def _cache_settings(self, skipped_types: Optional[List[str]] = None, text_fast_path: bool = False) -> Dict[str, Any]:
+        """影响解析结果的参数，作为解析缓存键的一部分"""
+        settings = {"renderer": "pypdfium2", "dpi": self.dpi}
+        if skipped_types:
+            settings["not_extract"] = sorted(skipped_types)
+            settings["fallback"] = self.disabled_block_fallback
+        if text_fast_path:
+            settings["text_fast_path"] = {
+                "min_chars": model_config.text_fast_path_min_chars,
+                "max_image_coverage": model_config.text_fast_path_max_image_coverage,
+                "max_garbled_ratio": model_config.text_fast_path_max_garbled_ratio,
+                "tables": "table" not in (skipped_types or []),
+            }
+        return settings
+
+    def _route_pages(self, text_layer: TextLayer, page_nums: List[int], skipped_types: List[str]) -> Dict[int, PageRoute]:
+        """逐页分类：文本层可靠的页走 PyMuPDF 快速通道，其余送入 VLM"""
+        return {
+            page_num: text_layer.classify_page(
+                page_num,
+                min_chars=model_config.text_fast_path_min_chars,
+                max_image_coverage=model_config.text_fast_path_max_image_coverage,
+                max_garbled_ratio=model_config.text_fast_path_max_garbled_ratio,
+                detect_tables="table" not in skipped_types,
+            )
+            for page_num in page_nums
+        }
+
+    @staticmethod
+    def _interleave_pages(page_nums: List[int], rendered: Iterable[Tuple[int, Image.Image]], render_pages: set) -> Iterator[Tuple[int, Optional[Image.Image]]]:
+        """按页序合并渲染页与免渲染页（后者图片为None）"""
+        rendered = iter(rendered)
+        for page_num in page_nums:
+            if page_num in render_pages:
+                yield next(rendered)
+            else:
+                yield page_num, None
+
+    def _build_route_report(self, routes: Dict[int, PageRoute], stats: StageStats) -> Dict[str, Any]:
+        """汇总每条通道的页数，并按VLM单页耗时估算快速通道节省的墙钟时间"""
+        text_pages = [n for n, route in routes.items() if not route.use_vlm]
+        text_seconds = stats.busy.get("text", 0.0)
+        infer_seconds = stats.busy.get("infer", 0.0)
+        text_extracted = stats.items.get("text", 0)
+        vlm_inferred = stats.items.get("infer", 0)
+        if vlm_inferred:
+            per_page = infer_seconds / vlm_inferred
+            prev = self._vlm_seconds_per_page
+            self._vlm_seconds_per_page = per_page if prev is None else 0.7 * prev + 0.3 * per_page
+        saved = None
+        if self._vlm_seconds_per_page is not None:
+            saved = round(len(text_pages) * self._vlm_seconds_per_page - text_seconds, 2)
+        return {
+            "text_pages": len(text_pages),
+            "vlm_pages": len(routes) - len(text_pages),
+            "text_extracted_pages": text_extracted,
+            "vlm_inferred_pages": vlm_inferred,
+            "cached_pages": len(routes) - text_extracted - vlm_inferred,
+            "text_seconds": round(text_seconds, 3),
+            "vlm_seconds": round(infer_seconds, 3),
+            "estimated_saved_seconds": saved,
+            "pages": {n: {"route": "vlm" if route.use_vlm else "text", "reason": route.reason} for n, route in routes.items()},
+        }
+
+    def _fill_skipped_blocks(self, blocks: List[Dict], page_num: int, skipped_types: List[str], text_layer: Optional[TextLayer]) -> List[Dict]:
+        """处理未做内容识别的块：从文本层按 bbox 取文字（标记 content_source=text_layer），取不到或配置为 skip 时丢弃
         
-        page_images = {}
-        for page_idx, image in enumerate(images):
-            img_path = os.path.join(output_dir, f"page_{page_idx+1}.jpg")
-            image.save(img_path, "JPEG")
-            page_images[page_idx+1] = [img_path]
+        Args:
+            blocks: 当前页提取的块列表
+            page_num: 页码
+            skipped_types: 跳过内容识别的块类型
+            text_layer: PDF 文本层，为None时直接丢弃
             
-        return page_images
-    
+        Returns:
+            处理后的块列表
+        """
+        kept = []
+        for block in blocks:
+            if block.get("type") not in skipped_types or block.get("content"):
+                kept.append(block)
+                continue
+            bbox = block.get("bbox")
+            text = text_layer.text_in_bbox(page_num, bbox) if text_layer is not None and bbox and len(bbox) == 4 else ""
+            if text:
+                block["content"] = text
+                block["content_source"] = "text_layer"
+                kept.append(block)
+        return kept
 
-    def _blocks_to_markdown(self, blocks: List[Dict], image_path: str, output_dir: str, page_num: int, img_counter: Dict[str, int]) -> str:
+    def _blocks_to_markdown(self, blocks: List[Dict]) -> str:
         """将提取的块转换为Markdown格式
         
         Args:
-            blocks: 提取的块列表
-            image_path: 原始页面图片路径
-            output_dir: 输出目录
-            page_num: 页码
-            img_counter: 图片计数器字典
+            blocks: 提取的块列表（图片块需已由 _crop_block_images 写入 image_name）
             
         Returns:
             Markdown格式的文本
@@ -118,17 +262,16 @@ class MinerUParser:
             if block_type == "text":
                 if content:
                     md_content += content + "\n"
+            elif block_type == "image": # mineru 提取的图片 type是image；快速通道页的图片块同样带 content_source=text_layer
+                cropped_img_name = block.get("image_name")
+                if cropped_img_name:
+                    md_content += f"![图片](images/{cropped_img_name})\n"
+            elif block.get("content_source") == "text_layer":
+                if content:
+                    md_content += content + "\n" # 文本层回退的表格/公式按普通文本输出
             elif block_type == "table":
                 if content:
                     md_content += content + "\n" # 原生输出html表格
-            elif block_type == "image": # mineru 提取的图片 type是image
-                bbox = block.get("bbox", None)
-                if bbox and len(bbox) == 4:
-                    cropped_img_name = self._crop_and_save_image(
-                        image_path, bbox, output_dir, page_num, img_counter
-                    )
-                    if cropped_img_name:
-                        md_content += f"![图片](images/{cropped_img_name})\n"
             elif block_type == "equation": # mineru 提取的公式 type是equation
                 if content:
                     md_content += f"$$\n{content}\n$$\n"
@@ -138,21 +281,39 @@ class MinerUParser:
         
         return md_content.strip()
     
-    def _crop_and_save_image(self, image_path: str, bbox: List[float], output_dir: str, page_num: int, img_counter: Dict[str, int]) -> Optional[str]:
+    def _crop_block_images(self, blocks: List[Dict], page_image: Image.Image, output_dir: str, page_num: int) -> None:
+        """在页面图片仍在内存时裁剪所有图片块，文件名写入 block['image_name']
+        
+        Args:
+            blocks: 当前页提取的块列表
+            page_image: 当前页渲染图片
+            output_dir: 输出目录
+            page_num: 页码
+        """
+        img_counter = {'count': 0}
+        for block in blocks:
+            if block.get("type") != "image":
+                continue
+            bbox = block.get("bbox", None)
+            if bbox and len(bbox) == 4:
+                cropped_img_name = self._crop_and_save_image(page_image, bbox, output_dir, page_num, img_counter)
+                if cropped_img_name:
+                    block["image_name"] = cropped_img_name
+    
+    def _crop_and_save_image(self, page_image: Image.Image, bbox: List[float], output_dir: str, page_num: int, img_counter: Dict[str, int]) -> Optional[str]:
         """根据bbox裁剪图片并保存
         
         Args:
-            image_path: 原始页面图片路径
+            page_image: 页面图片
             bbox: 边界框坐标 [x1, y1, x2, y2]，归一化坐标(0-1)
             output_dir: 输出目录
             page_num: 页码
-            img_counter: 图片计数器字典
+            img_counter: 当前页图片计数器字典
             
         Returns:
             裁剪后的图片文件名，失败返回None
         """
         try:
-            page_image = Image.open(image_path)
             width, height = page_image.size
             
             x1, y1, x2, y2 = bbox
@@ -193,6 +354,10 @@ class MinerUParser:
             current_page = page_blocks[i]
             next_page = page_blocks[i + 1]
             
+            # 只选取了部分页时，不相邻的两页之间不存在跨页表格
+            if next_page['page_num'] != current_page['page_num'] + 1:
+                continue
+            
             current_blocks = current_page['blocks']
             next_blocks = next_page['blocks']
             
@@ -201,12 +366,12 @@ class MinerUParser:
             
             # 检查当前页的最后一个块是否是表格
             current_last_block = current_blocks[-1]
-            if current_last_block.get('type') != 'table':
+            if current_last_block.get('type') != 'table' or current_last_block.get('content_source') == 'text_layer':
                 continue
             
-            # 检查下一页的第一个块是否是表格
+            # 检查下一页的第一个块是否是表格（文本层回退的表格不是HTML，不做合并）
             next_first_block = next_blocks[0]
-            if next_first_block.get('type') != 'table':
+            if next_first_block.get('type') != 'table' or next_first_block.get('content_source') == 'text_layer':
                 continue
             
             # 判断是否为跨页表格（简单规则：当前页最后一个和下一页第一个都是表格）
@@ -226,16 +391,97 @@ class MinerUParser:
             
             print("跨页表格合并完成")
     
-    def parse_pdf_to_markdown(self, pdf_path: str, output_dir: str) -> str:
+    def _infer_pages(self, pages: Iterable[Tuple[int, Image.Image]], cache: Optional[ParseCache], total_pages: int, stats: StageStats,
+                     skipped_types: Optional[List[str]] = None, text_layer: Optional[TextLayer] = None,
+                     text_pages: Optional[set] = None) -> Iterator[Tuple[Dict, Image.Image]]:
+        """推理阶段：按页序产出 (页面数据, 页面图片)
+        
+        缓存命中的页直接使用缓存块；未命中的页攒满 batch_size 后成批推理。
+        为保证后处理按页序进行，命中页会随所在批次一起产出，批内最多暂存 2*batch_size 页。
+        
+        Args:
+            pages: (页码, 图片) 迭代器
+            cache: 解析缓存，为None时不使用缓存
+            total_pages: 总页数（仅用于日志）
+            stats: 阶段统计
+            skipped_types: 跳过VLM内容识别的块类型
+            text_layer: 被跳过块的文本层回退来源 / 快速通道页的提取来源
+            text_pages: 走文本层快速通道的页码，这些页不送入VLM
+        """
+        held = []  # 按页序暂存的 (页面数据, 图片)
+        misses = 0
+        
+        def flush():
+            todo = [(page_data, image) for page_data, image in held if page_data['blocks'] is None]
+            if todo:
+                # 仅在确有页面需要推理时才加载模型
+                self.load_model()
+                batch_pages = [page_data['page_num'] for page_data, _ in todo]
+                print(f"正在处理第 {batch_pages} 页 / 共 {total_pages} 页 (批大小 {len(todo)})...")
+                with stats.track("infer", items=len(todo)):
+                    results = self.extract_blocks_batched([image for _, image in todo], skipped_types)
+                for (page_data, _), extracted_blocks in zip(todo, results):
+                    if skipped_types:
+                        fallback = text_layer if self.disabled_block_fallback == "text_layer" else None
+                        extracted_blocks = self._fill_skipped_blocks(extracted_blocks, page_data['page_num'], skipped_types, fallback)
+                    page_data['blocks'] = extracted_blocks
+                    if cache is not None:
+                        cache.save_page(page_data['page_num'], extracted_blocks)
+            items = list(held)
+            held.clear()
+            return items
+        
+        for page_num, image in pages:
+            extracted_blocks = cache.load_page(page_num) if cache is not None else None
+            if extracted_blocks is None and text_pages and page_num in text_pages:
+                with stats.track("text"):
+                    extracted_blocks = text_layer.page_blocks(page_num)
+                if cache is not None:
+                    cache.save_page(page_num, extracted_blocks)
+            held.append(({'page_num': page_num, 'blocks': extracted_blocks}, image))
+            if extracted_blocks is None:
+                misses += 1
+            if misses >= self.batch_size or len(held) >= 2 * self.batch_size:
+                yield from flush()
+                misses = 0
+        yield from flush()
+
+    @staticmethod
+    def _resolve_pages(total_pages: int, start_page: Optional[int], end_page: Optional[int], pages: Optional[Iterable[int]]) -> Optional[List[int]]:
+        """将页码范围/页码列表解析为有序页码列表（1-based），未指定任何限制时返回None表示全部页"""
+        if pages is not None:
+            selected = sorted({p for p in pages if 1 <= p <= total_pages})
+        elif start_page is not None or end_page is not None:
+            first = max(1, start_page or 1)
+            last = min(total_pages, end_page or total_pages)
+            selected = list(range(first, last + 1))
+        else:
+            return None
+        if not selected:
+            raise ValueError(f"页码范围无效: start_page={start_page}, end_page={end_page}, pages={pages}, 总页数={total_pages}")
+        return selected
+
+    def parse_pdf_to_markdown(self, pdf_path: str, output_dir: str, start_page: Optional[int] = None,
+                              end_page: Optional[int] = None, pages: Optional[Iterable[int]] = None,
+                              formula_enable: Optional[bool] = None, table_enable: Optional[bool] = None,
+                              text_fast_path: Optional[bool] = None,
+                              route_report: Optional[Dict[str, Any]] = None) -> Tuple[str, Optional[str]]:
         """
         将PDF转换为Markdown格式
         
         Args:
             pdf_path: PDF文件路径
             output_dir: 输出目录，将包含markdown文件和images子目录
+            start_page: 起始页码（1-based，含），为None时从第1页开始
+            end_page: 结束页码（1-based，含），为None时到最后一页
+            pages: 任意页码列表（1-based），指定时忽略 start_page/end_page
+            formula_enable: 是否用VLM识别公式，为None时使用config中的配置
+            table_enable: 是否用VLM识别表格，为None时使用config中的配置
+            text_fast_path: 文本层可靠的页是否跳过VLM，为None时使用config中的配置
+            route_report: 传入字典时写入本次解析各页走的通道（文本层/VLM）与估计节省的耗时
             
         Returns:
-            生成的Markdown文件绝对路径
+            (Markdown文件绝对路径, 布局可视化PDF文件绝对路径)
         """
         # 验证输入
         if not os.path.exists(pdf_path):
@@ -248,93 +494,200 @@ class MinerUParser:
         images_dir = os.path.join(output_dir, "images")
         os.makedirs(images_dir, exist_ok=True)
         
-        # 加载模型
-        self.load_model()
-        
-        # 从PDF中提取图片
-        print(f"正在从PDF中提取图片...")
-        page_images = self._extract_images_from_pdf(pdf_path, images_dir)
-        
-        # 处理每一页图片并收集结果
-        total_pages = len(page_images)
-        page_blocks = []  # 存储每一页的提取块
-        
-        for page_num, img_paths in sorted(page_images.items()):
-            print(f"正在处理第 {page_num}/{total_pages} 页...")
-            
-            if img_paths:
-                img_path = img_paths[0]  # 每页只有一张图片
-                
-                # 打开图片
-                image = Image.open(img_path)
-                
-                # 使用MinerU客户端进行两阶段提取
-                extracted_blocks = self.client.two_step_extract(image)
-                
-                # 保存当前页的块信息
-                page_blocks.append({
-                    'page_num': page_num,
-                    'blocks': extracted_blocks,
-                    'image_path': img_path
-                })
-        
-        # 检测并合并跨页表格
-        print("正在检测跨页表格...")
-        self._merge_cross_page_tables(page_blocks)
+        md_filename = os.path.splitext(os.path.basename(pdf_path))[0] + ".md"
+        layout_pdf_name = os.path.splitext(os.path.basename(pdf_path))[0] + "_layout.pdf"
+        layout_pdf_path = os.path.join(output_dir, layout_pdf_name)
+
+        # 页码选择：渲染、推理与布局绘制都只覆盖选中的页
+        total_pages = count_pages(pdf_path)
+        selected = self._resolve_pages(total_pages, start_page, end_page, pages)
+        page_nums = selected or list(range(1, total_pages + 1))
+        skipped_types = self._skipped_block_types(table_enable, formula_enable)
+        text_fast_path = self.text_fast_path if text_fast_path is None else text_fast_path
+
+        # 解析缓存：在加载模型之前查询
+        cache = None
+        if self.use_cache:
+            cache = ParseCache(str(PARSE_CACHE_DIR), pdf_path, self.model_name, self._cache_settings(skipped_types, text_fast_path))
+            if cache.has_document(selected) and cache.has_pages(page_nums):
+                print(f"命中解析缓存({cache.key})，跳过VLM推理")
+                md_path = cache.restore_document(output_dir, md_filename, selected)
+                page_blocks = [{'page_num': n, 'blocks': cache.load_page(n)} for n in page_nums]
+                self._merge_cross_page_tables(page_blocks)
+                drawer = LayoutDrawer(pdf_path, keep_all_pages=selected is None)
+                for page_data in page_blocks:
+                    drawer.add_page(page_data['page_num'], page_data['blocks'])
+                drawer.save(layout_pdf_path)
+                if route_report is not None:
+                    route_report.update(cached_pages=len(page_nums))
+                return os.path.abspath(md_path), os.path.abspath(layout_pdf_path)
         
-        # 将所有页面的块转换为Markdown
-        full_md_content = ""
-        img_counter = {'count': 0}
+        # 渲染 -> 推理 -> 后处理(裁图/Markdown/布局绘制)；流水线模式下三阶段在不同线程中重叠执行
+        print(f"正在解析PDF (选中 {len(page_nums)}/{total_pages} 页, dpi={self.dpi}, 流水线={'开' if self.pipelined else '关'}, "
+              f"跳过识别={skipped_types or '无'})...")
+        stats = StageStats()
+        text_layer = None
+        if text_fast_path or (skipped_types and self.disabled_block_fallback == "text_layer"):
+            text_layer = TextLayer(pdf_path)
+
+        # 文本层快速通道：只渲染送入VLM的页和含图片（需裁图）的页
+        routes = {}
+        if text_fast_path:
+            with stats.track("classify", items=len(page_nums)):
+                routes = self._route_pages(text_layer, page_nums, skipped_types)
+        text_pages = {n for n, route in routes.items() if not route.use_vlm}
+        render_pages = [n for n in page_nums if n not in text_pages or routes[n].has_images]
+        if text_pages:
+            print(f"文本层快速通道: {len(text_pages)} 页, VLM: {len(page_nums) - len(text_pages)} 页")
+
+        assembler = _PageAssembler(self, pdf_path, output_dir, keep_all_pages=selected is None)
+        queue_size = 2 * self.batch_size
         
-        for page_data in page_blocks:
-            page_num = page_data['page_num']
-            blocks = page_data['blocks']
-            image_path = page_data['image_path']
-            
-            # 将提取的块转换为Markdown格式
-            page_md = self._blocks_to_markdown(blocks, image_path, output_dir, page_num, img_counter)
-            
-            # 添加到完整内容
-            full_md_content += f"\n\n---\n\n# 第 {page_num} 页\n\n{page_md}"
+        page_iter = iter_pdf_pages(pdf_path, dpi=self.dpi, pages=render_pages)
+        try:
+            if self.pipelined:
+                page_iter = background_iter(page_iter, queue_size, stats, "render")
+                page_iter = self._interleave_pages(page_nums, page_iter, set(render_pages))
+                post = BackgroundWorker(assembler.add, queue_size, stats, "post")
+                try:
+                    for item in self._infer_pages(page_iter, cache, total_pages, stats, skipped_types, text_layer, text_pages):
+                        post.submit(item)
+                finally:
+                    post.close()
+            else:
+                page_iter = timed_iter(page_iter, stats, "render")
+                page_iter = self._interleave_pages(page_nums, page_iter, set(render_pages))
+                for item in self._infer_pages(page_iter, cache, total_pages, stats, skipped_types, text_layer, text_pages):
+                    with stats.track("post"):
+                        assembler.add(item)
+        finally:
+            if text_layer is not None:
+                text_layer.close()
+        with stats.track("post", items=0):
+            full_md_content = assembler.finish()
+        stats.finish()
+        self.last_stage_stats = stats.summary()
+        print(stats.report())
+        if routes:
+            report = self._build_route_report(routes, stats)
+            logger.info(
+                "%s 解析通道: 文本层 %s 页 (%.2fs), VLM %s 页 (%.2fs), 缓存命中 %s 页, 估计节省 %ss",
+                os.path.basename(pdf_path), report['text_pages'], report['text_seconds'], report['vlm_pages'],
+                report['vlm_seconds'], report['cached_pages'],
+                report['estimated_saved_seconds'] if report['estimated_saved_seconds'] is not None else '未知',
+            )
+            if route_report is not None:
+                route_report.update(report)
         
         # 保存Markdown文件
-        md_filename = os.path.splitext(os.path.basename(pdf_path))[0] + ".md"
         md_path = os.path.join(output_dir, md_filename)
         
         with open(md_path, "w", encoding="utf-8") as f:
-            f.write(full_md_content.strip())
+            f.write(full_md_content)
+        
+        if cache is not None:
+            cache.save_document(full_md_content, images_dir, selected)
         
         print(f"PDF解析完成! 输出文件: {md_path}")
         
-        # Draw layout bbox on PDF
-        layout_pdf_name = os.path.splitext(os.path.basename(pdf_path))[0] + "_layout.pdf"
-        layout_pdf_path = os.path.join(output_dir, layout_pdf_name)
-        print(f"正在生成布局可视化PDF...")
-        draw_layout_bbox(page_blocks, pdf_path, layout_pdf_path)
+        # 布局框已在后处理阶段逐页绘制，这里只需写出
+        assembler.save_layout(layout_pdf_path)
         print(f"布局可视化PDF生成完成: {layout_pdf_path}")
 
         return os.path.abspath(md_path), os.path.abspath(layout_pdf_path)
 
 
-# 全局解析器实例，确保模型只加载一次
+class _PageAssembler:
+    """后处理阶段：按页序合并跨页表格、裁剪图片、生成Markdown并绘制布局框
+    
+    第 k 页需等第 k+1 页的块到达、完成跨页表格合并后才能定稿。
+    """
+    
+    def __init__(self, parser: MinerUParser, pdf_path: str, output_dir: str, keep_all_pages: bool = True):
+        self.parser = parser
+        self.output_dir = output_dir
+        self.md_parts = []
+        self._prev = None
+        try:
+            self.drawer = LayoutDrawer(pdf_path, keep_all_pages=keep_all_pages)
+        except Exception as e:
+            print(f"初始化布局绘制失败，将跳过布局可视化: {e}")
+            self.drawer = None
+    
+    def add(self, item: Tuple[Dict, Image.Image]) -> None:
+        page_data, image = item
+        page_num = page_data['page_num']
+        if image is not None:  # 文本层快速通道中无图片的页不渲染
+            self.parser._crop_block_images(page_data['blocks'], image, self.output_dir, page_num)
+        if self.parser.save_page_images and image is not None:
+            image.save(os.path.join(self.output_dir, "images", f"page_{page_num}.jpg"), "JPEG")
+        if self._prev is not None:
+            # 检测并合并跨页表格（仅相邻页）
+            self.parser._merge_cross_page_tables([self._prev, page_data])
+            self._finalize(self._prev)
+        self._prev = page_data
+    
+    def _finalize(self, page_data: Dict) -> None:
+        page_num = page_data['page_num']
+        # 将提取的块转换为Markdown格式
+        page_md = self.parser._blocks_to_markdown(page_data['blocks'])
+        self.md_parts.append(f"\n\n---\n\n# 第 {page_num} 页\n\n{page_md}")
+        if self.drawer is not None:
+            try:
+                self.drawer.add_page(page_num, page_data['blocks'])
+            except Exception as e:
+                print(f"绘制第 {page_num} 页布局失败: {e}")
+    
+    def finish(self) -> str:
+        """定稿最后一页并返回完整Markdown"""
+        if self._prev is not None:
+            self._finalize(self._prev)
+            self._prev = None
+        return "".join(self.md_parts).strip()
+    
+    def save_layout(self, output_path: str) -> None:
+        if self.drawer is None:
+            return
+        try:
+            self.drawer.save(output_path)
+        except Exception as e:
+            print(f"保存布局可视化PDF失败: {e}")
+
+
+# 全局解析器实例，确保模型只加载一次（多个会话并发入库时加锁创建）
 _global_parser = None
+_global_parser_lock = threading.Lock()
 
 # 便捷函数
-def parse_pdf_to_markdown(pdf_path: str, output_dir: str):
+def parse_pdf_to_markdown(pdf_path: str, output_dir: str, start_page: Optional[int] = None,
+                          end_page: Optional[int] = None, pages: Optional[Iterable[int]] = None,
+                          formula_enable: Optional[bool] = None, table_enable: Optional[bool] = None,
+                          text_fast_path: Optional[bool] = None,
+                          route_report: Optional[Dict[str, Any]] = None) -> Tuple[str, Optional[str]]:
     """
     将PDF转换为Markdown格式的便捷函数
     
     Args:
         pdf_path: PDF文件路径
         output_dir: 输出目录
+        start_page: 起始页码（1-based，含）
+        end_page: 结束页码（1-based，含）
+        pages: 任意页码列表（1-based），指定时忽略 start_page/end_page
+        formula_enable: 是否用VLM识别公式
+        table_enable: 是否用VLM识别表格
+        text_fast_path: 文本层可靠的页是否跳过VLM
+        route_report: 传入字典时写入本次解析的通道统计（见 MinerUParser.parse_pdf_to_markdown）
         
     Returns:
-        生成的Markdown文件绝对路径, 布局可视化PDF文件绝对路径
+        (Markdown文件绝对路径, 布局可视化PDF文件绝对路径)
     """
     global _global_parser
     if _global_parser is None:
-        _global_parser = MinerUParser()
-    return _global_parser.parse_pdf_to_markdown(pdf_path, output_dir)
+        with _global_parser_lock:
+            if _global_parser is None:
+                _global_parser = MinerUParser()
+    return _global_parser.parse_pdf_to_markdown(pdf_path, output_dir, start_page, end_page, pages,
+                                                formula_enable, table_enable, text_fast_path, route_report)
 
 
 if __name__ == "__main__":
@@ -353,3 +706,4 @@ if __name__ == "__main__":
     md_path, layout_pdf_path = parse_pdf_to_markdown(pdf_path, output_dir)
     print(f"生成的Markdown文件: {md_path}")
     print(f"生成的布局PDF文件: {layout_pdf_path}")
+
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 页面流式渲染
+
+基于 pypdfium2 逐页渲染为内存中的 PIL 图片，渲染完一页即释放该页资源，
+避免 pdf2image.convert_from_path 一次性把整份文档光栅化到内存并落盘。
+"""
+
+from typing import Iterable, Iterator, Optional, Tuple
+
+import pypdfium2 as pdfium
+from PIL import Image
+
+
+def count_pages(pdf_path: str) -> int:
+    """返回PDF页数（不渲染）"""
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def iter_pdf_pages(pdf_path: str, dpi: int = 200, pages: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, Image.Image]]:
+    """逐页渲染PDF
+
+    Args:
+        pdf_path: PDF文件路径
+        dpi: 渲染分辨率
+        pages: 需要渲染的页码（1-based），为None时渲染全部页
+
+    Yields:
+        (页码, RGB 图片)，页码从1开始
+    """
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        page_nums = range(1, len(pdf) + 1) if pages is None else pages
+        for page_num in page_nums:
+            page = pdf[page_num - 1]
+            try:
+                bitmap = page.render(scale=dpi / 72)
+                image = bitmap.to_pil().convert("RGB")
+                bitmap.close()
+            finally:
+                page.close()
+            yield page_num, image
+    finally:
+        pdf.close()
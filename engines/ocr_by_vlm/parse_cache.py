@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MinerU 解析结果持久化缓存
+
+缓存键: PDF内容哈希 + MinerU模型路径 + 解析参数
+缓存内容:
+    pages/page_{n}.json  每页 two_step_extract 的 extracted_blocks（逐页写入，崩溃后可续跑）
+    document.md          渲染后的完整Markdown（仅解析部分页时为 document_{选页哈希}.md）
+    images/              Markdown 引用的裁剪图片（page_{n}_img_{k}.jpg）
+
+命中完整缓存时无需加载模型；部分命中时只对缺失页做VLM推理。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+CACHE_VERSION = 1
+DOCUMENT_FILE = "document.md"
+
+
+def file_sha256(file_path: str) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class ParseCache:
+    """单个 (PDF, 模型, 参数) 组合的解析缓存目录"""
+
+    def __init__(self, cache_root: str, pdf_path: str, model_name: str, settings: Dict[str, Any]):
+        """
+        Args:
+            cache_root: 缓存根目录
+            pdf_path: PDF文件路径
+            model_name: MinerU 模型名称或路径
+            settings: 影响解析结果的参数（如渲染DPI），任一变化都会得到新的缓存键
+        """
+        key_source = {
+            "version": CACHE_VERSION,
+            "pdf": file_sha256(pdf_path),
+            "model": str(model_name),
+            "settings": settings,
+        }
+        self.key = hashlib.sha256(json.dumps(key_source, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+        self.cache_dir = Path(cache_root) / self.key
+        self.pages_dir = self.cache_dir / "pages"
+        self.images_dir = self.cache_dir / "images"
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+        meta_path = self.cache_dir / "meta.json"
+        if not meta_path.exists():
+            key_source["source_file"] = os.path.basename(pdf_path)
+            _atomic_write_text(meta_path, json.dumps(key_source, ensure_ascii=False, indent=2))
+
+    def _page_path(self, page_num: int) -> Path:
+        return self.pages_dir / f"page_{page_num}.json"
+
+    def load_page(self, page_num: int) -> Optional[List[Dict]]:
+        """读取某页缓存的 extracted_blocks，未缓存返回None"""
+        page_path = self._page_path(page_num)
+        if not page_path.exists():
+            return None
+        try:
+            with open(page_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取页面缓存失败，将重新推理: {e}")
+            return None
+
+    def save_page(self, page_num: int, blocks: List[Dict]) -> None:
+        """写入某页的 extracted_blocks（推理完成后立即调用）"""
+        _atomic_write_text(self._page_path(page_num), json.dumps(blocks, ensure_ascii=False))
+
+    def has_pages(self, page_nums: List[int]) -> bool:
+        return all(self._page_path(page_num).exists() for page_num in page_nums)
+
+    def _document_path(self, pages: Optional[Sequence[int]]) -> Path:
+        """不同选页组合的Markdown分别缓存；pages为None表示全部页"""
+        if pages is None:
+            return self.cache_dir / DOCUMENT_FILE
+        digest = hashlib.sha256(",".join(str(p) for p in pages).encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / f"document_{digest}.md"
+
+    @staticmethod
+    def _image_in_pages(name: str, pages: Optional[Sequence[int]]) -> bool:
+        if pages is None:
+            return True
+        prefix = name.split("_img_", 1)[0]
+        return prefix.startswith("page_") and prefix[len("page_"):].isdigit() and int(prefix[len("page_"):]) in pages
+
+    def has_document(self, pages: Optional[Sequence[int]] = None) -> bool:
+        return self._document_path(pages).exists()
+
+    def save_document(self, md_content: str, output_images_dir: str, pages: Optional[Sequence[int]] = None) -> None:
+        """缓存Markdown及其引用的裁剪图片（不含整页渲染图）"""
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+        for name in os.listdir(output_images_dir):
+            if "_img_" in name:
+                shutil.copy2(os.path.join(output_images_dir, name), self.images_dir / name)
+        _atomic_write_text(self._document_path(pages), md_content)
+
+    def restore_document(self, output_dir: str, md_filename: str, pages: Optional[Sequence[int]] = None) -> str:
+        """
+        将缓存的Markdown与选中页的图片复制到输出目录
+
+        Returns:
+            输出目录中的Markdown文件路径
+        """
+        out_images_dir = os.path.join(output_dir, "images")
+        os.makedirs(out_images_dir, exist_ok=True)
+        if self.images_dir.exists():
+            for name in os.listdir(self.images_dir):
+                if self._image_in_pages(name, pages):
+                    shutil.copy2(self.images_dir / name, os.path.join(out_images_dir, name))
+        md_path = os.path.join(output_dir, md_filename)
+        shutil.copy2(self._document_path(pages), md_path)
+        return md_path
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解析流水线工具：生产者/消费者线程与分阶段耗时统计
+
+渲染(render) -> 推理(infer) -> 后处理(post: 裁图/Markdown/布局绘制) 三个阶段通过有界队列衔接，
+渲染在后台线程中提前进行，后处理在另一线程中与下一批页面的推理重叠。
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_SENTINEL = object()
+
+
+class StageStats:
+    """记录各阶段忙碌时间，用于计算利用率（忙碌时间 / 总墙钟时间）"""
+
+    def __init__(self):
+        self.busy: Dict[str, float] = {}
+        self.items: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._finished = None
+
+    def add(self, stage: str, elapsed: float, items: int = 1) -> None:
+        with self._lock:
+            self.busy[stage] = self.busy.get(stage, 0.0) + elapsed
+            self.items[stage] = self.items.get(stage, 0) + items
+
+    @contextmanager
+    def track(self, stage: str, items: int = 1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, items)
+
+    def finish(self) -> None:
+        self._finished = time.perf_counter()
+
+    @property
+    def wall(self) -> float:
+        return (self._finished or time.perf_counter()) - self._started
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        wall = self.wall or 1e-9
+        return {
+            stage: {
+                "busy_s": round(busy, 3),
+                "utilization": round(busy / wall, 3),
+                "items": self.items.get(stage, 0),
+            }
+            for stage, busy in self.busy.items()
+        }
+
+    def report(self) -> str:
+        parts = [f"{stage}: 忙碌 {info['busy_s']:.2f}s, 利用率 {info['utilization']:.0%}, 处理 {info['items']} 项"
+                 for stage, info in self.summary().items()]
+        return f"流水线总耗时 {self.wall:.2f}s | " + " | ".join(parts)
+
+
+def timed_iter(iterable: Iterable[T], stats: StageStats, stage: str) -> Iterator[T]:
+    """顺序模式下统计 iterable 产出每个元素的耗时"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        item = next(iterator, _SENTINEL)
+        stats.add(stage, time.perf_counter() - start, 0 if item is _SENTINEL else 1)
+        if item is _SENTINEL:
+            return
+        yield item
+
+
+def background_iter(iterable: Iterable[T], maxsize: int, stats: StageStats, stage: str) -> Iterator[T]:
+    """在后台线程中提前消费 iterable，通过有界队列向调用方产出元素"""
+    q: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    error = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            iterator = iter(iterable)
+            while True:
+                start = time.perf_counter()
+                item = next(iterator, _SENTINEL)
+                stats.add(stage, time.perf_counter() - start, 0 if item is _SENTINEL else 1)
+                if item is _SENTINEL or not put(item):
+                    break
+        except BaseException as e:  # 交给消费方线程抛出
+            error.append(e)
+        finally:
+            put(_SENTINEL)
+
+    thread = threading.Thread(target=produce, name=f"pipeline-{stage}", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _SENTINEL:
+                break
+            yield item
+    finally:
+        # 消费方提前退出（如推理异常）时通知生产者停止，避免线程阻塞在满队列上
+        stop.set()
+        thread.join()
+    if error:
+        raise error[0]
+
+
+class BackgroundWorker:
+    """在后台线程中按顺序处理提交的元素（后处理阶段）"""
+
+    def __init__(self, handler: Callable[[T], None], maxsize: int, stats: StageStats, stage: str):
+        self._handler = handler
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._stats = stats
+        self._stage = stage
+        self._error = []
+        self._thread = threading.Thread(target=self._run, name=f"pipeline-{stage}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _SENTINEL:
+                return
+            if self._error:
+                continue  # 已出错，丢弃剩余元素
+            try:
+                with self._stats.track(self._stage):
+                    self._handler(item)
+            except BaseException as e:
+                self._error.append(e)
+
+    def submit(self, item: T) -> None:
+        if self._error:
+            raise self._error[0]
+        self._queue.put(item)
+
+    def close(self) -> None:
+        """等待全部元素处理完毕，如有异常则抛出"""
+        self._queue.put(_SENTINEL)
+        self._thread.join()
+        if self._error:
+            raise self._error[0]
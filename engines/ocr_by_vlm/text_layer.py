@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 文本层读取（PyMuPDF）
+
+- 按版面块 bbox 取出原生文字，作为关闭表格/公式识别时的廉价回退；
+- 逐页判断文本层是否可靠（字体、文字密度、乱码比例、图片覆盖率、表格），
+  可靠的原生数字页直接用 PyMuPDF 结构化提取，只有扫描页/表格页才交给 VLM。
+扫描件没有文本层，此时文字提取返回空字符串。
+"""
+
+import statistics
+from dataclasses import dataclass
+from typing import Dict, List
+
+import fitz  # PyMuPDF
+
+
+@dataclass
+class PageRoute:
+    """单页分类结果"""
+
+    page_num: int
+    use_vlm: bool
+    reason: str
+    char_count: int = 0
+    image_coverage: float = 0.0
+    has_images: bool = False
+
+
+def _is_garbled(ch: str) -> bool:
+    """替换字符或私有区字符：通常意味着字体缺少 ToUnicode 映射"""
+    return ch == "\ufffd" or "\ue000" <= ch <= "\uf8ff"
+
+
+def _is_cjk(ch: str) -> bool:
+    return "\u4e00" <= ch <= "\u9fff" or "\u3000" <= ch <= "\u303f" or "\uff00" <= ch <= "\uffef"
+
+
+class TextLayer:
+    """按页读取 PDF 文本层，需在同一线程内使用"""
+
+    def __init__(self, pdf_path: str):
+        self.doc = fitz.open(pdf_path)
+
+    def _clip(self, page, bbox: List[float]):
+        rect = page.rect
+        x1, y1, x2, y2 = bbox
+        return fitz.Rect(
+            rect.x0 + x1 * rect.width,
+            rect.y0 + y1 * rect.height,
+            rect.x0 + x2 * rect.width,
+            rect.y0 + y2 * rect.height,
+        )
+
+    def text_in_bbox(self, page_num: int, bbox: List[float]) -> str:
+        """
+        提取某页 bbox 区域内的文字
+
+        Args:
+            page_num: 页码（1-based）
+            bbox: 归一化坐标 [x1, y1, x2, y2]（0-1）
+
+        Returns:
+            区域内文字，按行拼接
+        """
+        page = self.doc[page_num - 1]
+        lines = page.get_text("text", clip=self._clip(page, bbox)).splitlines()
+        return "\n".join(line.strip() for line in lines if line.strip())
+
+    def classify_page(self, page_num: int, min_chars: int, max_image_coverage: float,
+                      max_garbled_ratio: float, detect_tables: bool) -> PageRoute:
+        """
+        判断某页能否走文本层快速通道
+
+        Args:
+            page_num: 页码（1-based）
+            min_chars: 可靠文本层的最少非空白字符数
+            max_image_coverage: 图片覆盖页面面积的上限（超过视为扫描/图片页）
+            max_garbled_ratio: 乱码字符比例上限
+            detect_tables: 是否把含表格的页交给 VLM（表格识别开启时）
+
+        Returns:
+            PageRoute
+        """
+        page = self.doc[page_num - 1]
+        page_area = abs(page.rect) or 1.0
+        image_boxes = [fitz.Rect(info["bbox"]) & page.rect for info in page.get_image_info()]
+        coverage = min(1.0, sum(abs(box) for box in image_boxes) / page_area)
+        route = PageRoute(page_num, True, "", image_coverage=coverage, has_images=bool(image_boxes))
+
+        if not page.get_fonts():
+            route.reason = "无字体（扫描页）"
+            return route
+        chars = [ch for ch in page.get_text("text") if not ch.isspace()]
+        route.char_count = len(chars)
+        if len(chars) < min_chars:
+            route.reason = f"文字过少({len(chars)})"
+            return route
+        garbled = sum(1 for ch in chars if _is_garbled(ch)) / len(chars)
+        if garbled > max_garbled_ratio:
+            route.reason = f"文本层乱码({garbled:.0%})"
+            return route
+        if coverage > max_image_coverage:
+            route.reason = f"图片占比高({coverage:.0%})"
+            return route
+        if detect_tables:
+            try:
+                if page.find_tables().tables:
+                    route.reason = "含表格"
+                    return route
+            except Exception as e:  # 表格检测失败时保守地交给 VLM
+                route.reason = f"表格检测失败: {e}"
+                return route
+        route.use_vlm = False
+        route.reason = "文本层可靠"
+        return route
+
+    def page_blocks(self, page_num: int) -> List[Dict]:
+        """
+        用 PyMuPDF 结构化提取某页，输出与 two_step_extract 相同格式的块
+
+        字号明显大于本页正文或整块加粗的短块记为 title，图片块只给出 bbox（由解析器裁剪）。
+
+        Returns:
+            [{'type', 'bbox'(归一化), 'content', 'content_source': 'text_layer'}]
+        """
+        page = self.doc[page_num - 1]
+        rect = page.rect
+        width, height = rect.width or 1.0, rect.height or 1.0
+        data = page.get_text("dict", sort=True)
+
+        sizes = [span["size"] for block in data["blocks"] if block["type"] == 0
+                 for line in block["lines"] for span in line["spans"] if span["text"].strip()]
+        body_size = statistics.median(sizes) if sizes else 0.0
+
+        blocks = []
+        for block in data["blocks"]:
+            x0, y0, x1, y1 = block["bbox"]
+            bbox = [
+                max(0.0, (x0 - rect.x0) / width), max(0.0, (y0 - rect.y0) / height),
+                min(1.0, (x1 - rect.x0) / width), min(1.0, (y1 - rect.y0) / height),
+            ]
+            if block["type"] == 1:
+                blocks.append({"type": "image", "bbox": bbox, "content": None, "content_source": "text_layer"})
+                continue
+
+            content = ""
+            spans = []
+            for line in block["lines"]:
+                line_text = "".join(span["text"] for span in line["spans"]).strip()
+                if not line_text:
+                    continue
+                spans.extend(span for span in line["spans"] if span["text"].strip())
+                # 中文折行直接拼接，西文折行补空格
+                if content and not (_is_cjk(content[-1]) or _is_cjk(line_text[0])):
+                    content += " "
+                content += line_text
+            if not content:
+                continue
+
+            max_size = max(span["size"] for span in spans)
+            all_bold = all(span["flags"] & 16 for span in spans)
+            is_title = len(block["lines"]) <= 2 and len(content) <= 40 and (
+                (body_size and max_size >= 1.2 * body_size) or all_bold)
+            blocks.append({
+                "type": "title" if is_title else "text",
+                "bbox": bbox,
+                "content": content,
+                "content_source": "text_layer",
+            })
+        return blocks
+
+    def close(self) -> None:
+        self.doc.close()
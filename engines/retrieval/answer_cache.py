@@ -0,0 +1,118 @@
+"""
+语义答案缓存：以查询向量为键，余弦相似度超过阈值即复用历史答案与引用。
+
+- LRU + TTL 淘汰；索引内容变化时由 rag_engine 调用 clear() 整体失效。
+- scope 区分检索范围（见 engines.retrieval.filters），只在同一范围内复用答案。
+- 统计命中率与节省的生成耗时，供界面展示。
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("autosafety")
+
+
+@dataclass
+class CachedAnswer:
+    """缓存条目：原始问题、答案、溯源信息与生成该答案的耗时。"""
+
+    query: str
+    answer: str
+    sources: List[Dict[str, Any]]
+    latency: float
+    embedding: np.ndarray = field(repr=False)
+    created_at: float = field(default_factory=time.time)
+    similarity: float = 1.0
+    scope: str = ""
+
+
+class SemanticAnswerCache:
+    """基于查询向量余弦相似度的答案缓存（线程安全）。"""
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 256, ttl_seconds: float = 86400.0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, embedding: Sequence[float], scope: str = "") -> Optional[CachedAnswer]:
+        """查找同一检索范围内最相似且未过期的答案；未命中返回 None。"""
+        vec = self._normalize(embedding)
+        with self._lock:
+            self._evict_expired(time.time())
+            best_key, best_sim = None, -1.0
+            for key, entry in self._entries.items():
+                if entry.scope != scope:
+                    continue
+                sim = float(np.dot(vec, entry.embedding))
+                if sim > best_sim:
+                    best_key, best_sim = key, sim
+            if best_key is None or best_sim < self.threshold:
+                self.misses += 1
+                return None
+            entry = self._entries[best_key]
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            self.saved_seconds += entry.latency
+        logger.info("答案缓存命中: 相似度=%.4f, 原问题=%s", best_sim, entry.query)
+        return replace(entry, similarity=best_sim)
+
+    def put(
+        self,
+        query: str,
+        embedding: Sequence[float],
+        answer: str,
+        sources: List[Dict[str, Any]],
+        latency: float,
+        scope: str = "",
+    ) -> None:
+        """写入新答案，超过容量时淘汰最久未使用的条目。"""
+        entry = CachedAnswer(
+            query=query,
+            answer=answer,
+            sources=list(sources),
+            latency=latency,
+            embedding=self._normalize(embedding),
+            scope=scope,
+        )
+        with self._lock:
+            self._entries[self._next_key] = entry
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
@@ -0,0 +1,395 @@
+"""
+持久化 BM25 倒排索引。
+
+- 中文分词（优先 jieba 搜索模式，缺失时回退为汉字二元组），英文/条款号按词切分。
+- 倒排表随 `build_or_refresh_index` 增量更新，进程启动时只加载一次，
+  查询阶段只需对问题分词，不再对全量语料重新分词建索引。
+- 落盘分两部分：快照 bm25.pkl 与追加日志 bm25.log。每次增删只把本批节点（含词频）追加到日志，
+  写入开销与批大小成正比；日志超过快照大小的一定比例时合并为新快照（compact）。
+  加载时先读快照再按序重放日志，重放是幂等的（同 id 先删后加），合并中途崩溃也不会丢数据。
+- 应用与 bulk_ingest.py 等进程可同时持有同一索引：写入在文件锁 bm25.lock 内进行，写前先合并其他进程
+  已落盘的变更（快照被替换则重新加载，否则只重放新增日志），不会用内存中的旧副本覆盖别人的写入；
+  只读进程可调用 refresh() 追上磁盘状态。
+- `PersistentBM25Retriever` 实现 LlamaIndex 的 BaseRetriever 接口，可直接放入 QueryFusionRetriever。
+"""
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from filelock import FileLock
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import BaseNode, MetadataMode, NodeWithScore, QueryBundle, TextNode
+
+try:
+    import jieba
+
+    jieba.setLogLevel(logging.WARNING)
+except ImportError:  # 未安装 jieba 时回退为二元组切分
+    jieba = None
+
+logger = logging.getLogger("autosafety")
+
+INDEX_FILE_NAME = "bm25.pkl"
+LOG_FILE_NAME = "bm25.log"
+LOCK_FILE_NAME = "bm25.lock"
+LOCK_TIMEOUT_SECONDS = 600  # 其他进程合并大快照时可能持锁较久
+FORMAT_VERSION = 1
+# 日志超过 max(快照大小 × 比例, 下限) 时合并为新快照
+COMPACT_RATIO = 0.5
+COMPACT_MIN_BYTES = 4 * 1024 * 1024
+
+# 英文单词/数字/条款号（如 5.2.1、N.1.3）整体保留，汉字单独处理
+_ASCII_RE = re.compile(r"[A-Za-z0-9]+(?:[._\-][A-Za-z0-9]+)*")
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]+")
+_WORD_RE = re.compile(r"\w")
+_STOPWORDS = {"的", "了", "和", "与", "及", "或", "是", "在", "对", "为", "应", "等", "其", "中", "时", "吗", "呢", "什么", "哪些", "如何"}
+
+
+def tokenize(text: str) -> List[str]:
+    """中文感知分词，返回小写 token 列表（保留重复，用于词频统计）。"""
+    if not text:
+        return []
+    if jieba is not None:
+        tokens = (tok.strip().lower() for tok in jieba.lcut_for_search(text))
+        return [tok for tok in tokens if tok and _WORD_RE.search(tok) and tok not in _STOPWORDS]
+
+    tokens = [tok.lower() for tok in _ASCII_RE.findall(text)]
+    for seg in _CJK_RE.findall(text):
+        if len(seg) == 1:
+            tokens.append(seg)
+            continue
+        tokens.extend(seg[i : i + 2] for i in range(len(seg) - 1))
+    return [tok for tok in tokens if tok not in _STOPWORDS]
+
+
+class BM25Store:
+    """磁盘持久化的 BM25 倒排索引，支持按节点增量增删；多个进程可共用同一索引目录。"""
+
+    def __init__(self, index_dir: Path, k1: float = 1.5, b: float = 0.75):
+        self.index_dir = Path(index_dir)
+        self.index_path = self.index_dir / INDEX_FILE_NAME
+        self.log_path = self.index_dir / LOG_FILE_NAME
+        self.k1 = k1
+        self.b = b
+        # node_id -> {"text", "metadata", "length"}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        # term -> {node_id: tf}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_len = 0
+        # node_id -> k1 * (1 - b + b * dl / avgdl)，首次查询时计算，索引变化后失效
+        self._norms: Optional[Dict[str, float]] = None
+        # persist=False 写入、尚未落盘的记录；合并其他进程的写入后重新应用
+        self._pending: List[Tuple[str, Any]] = []
+        # 已同步到内存的磁盘状态：快照签名与已重放到的日志偏移
+        self._snapshot_sig: Optional[Tuple[int, int, int]] = None
+        self._log_offset = 0
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(str(self.index_dir / LOCK_FILE_NAME), timeout=LOCK_TIMEOUT_SECONDS)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ---------- 持久化 ----------
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """进程内线程锁 + 跨进程文件锁（应用与 bulk_ingest.py 等命令行脚本共用同一索引目录）。"""
+        with self._lock:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            with self._file_lock:
+                yield
+
+    def load(self) -> "BM25Store":
+        """从磁盘加载快照并重放追加日志；快照损坏或版本不符时保持空索引（由调用方回填）。"""
+        if not self.index_path.exists() and not self.log_path.exists():
+            logger.info("BM25 索引文件不存在，将使用空索引: %s", self.index_path)
+            return self
+        with self._locked():
+            replayed = self._reload()
+            for op, payload in self._pending:
+                self._apply(op, payload)
+        logger.info(
+            "BM25 索引加载完成，节点数=%s，词项数=%s，重放日志记录=%s", len(self._docs), len(self._postings), replayed
+        )
+        return self
+
+    def refresh(self) -> bool:
+        """
+        合并其他进程写入磁盘的变更，返回内存索引是否变化。
+
+        无变化时只比较快照与日志的文件状态，可在每次查询前调用。
+        """
+        if self._snapshot_stat() == self._snapshot_sig and self._log_size() == self._log_offset:
+            return False
+        with self._locked():
+            changed = self._sync()
+        if changed:
+            logger.info("BM25 索引已合并其他进程的写入，当前节点数=%s", len(self._docs))
+        return changed
+
+    def save(self) -> None:
+        """合并其他进程的写入后，把完整索引（含未落盘的修改）写为新快照并清空日志。"""
+        with self._locked():
+            self._sync()
+            self._compact()
+            self._pending.clear()
+
+    def _snapshot_stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.index_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _log_size(self) -> int:
+        try:
+            return self.log_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _sync(self) -> bool:
+        """
+        在文件锁内追上磁盘状态，返回是否有变化。
+
+        快照被替换（其他进程合并了日志）或日志被截断时整体重新加载，否则只重放新增的日志记录；
+        随后重新应用本进程尚未落盘的记录。
+        """
+        log_size = self._log_size()
+        if self._snapshot_stat() != self._snapshot_sig or log_size < self._log_offset:
+            self._reload()
+        elif log_size > self._log_offset:
+            self._replay_log()
+        else:
+            return False
+        for op, payload in self._pending:
+            self._apply(op, payload)
+        return True
+
+    def _reload(self) -> int:
+        """丢弃内存索引，重新读取快照并重放整个日志，返回重放的记录数。"""
+        self.clear()
+        self._snapshot_sig = self._snapshot_stat()
+        self._log_offset = 0
+        if self._snapshot_sig is not None:
+            try:
+                with self.index_path.open("rb") as f:
+                    payload = pickle.load(f)
+            except Exception as exc:
+                logger.warning("BM25 索引加载失败，将重建: %s", exc)
+                payload = None
+            if payload is not None and payload.get("version") != FORMAT_VERSION:
+                logger.warning("BM25 索引版本不匹配(%s)，将重建", payload.get("version"))
+                payload = None
+            if payload is None:
+                # 日志只记录快照之后的增量，快照不可用时一并丢弃，等待回填后写新快照
+                self._log_offset = self._log_size()
+                return 0
+            self._docs = payload["docs"]
+            self._postings = payload["postings"]
+            self._total_len = payload["total_len"]
+        return self._replay_log()
+
+    def _replay_log(self) -> int:
+        """从已同步的偏移起按序重放追加日志，返回记录数；末尾写了一半的记录（进程中途崩溃）被截掉。"""
+        if not self.log_path.exists():
+            return 0
+        replayed = 0
+        with self.log_path.open("rb") as f:
+            f.seek(self._log_offset)
+            while True:
+                try:
+                    op, payload = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception as exc:
+                    logger.warning("BM25 日志末尾记录损坏，已忽略: %s", exc)
+                    break
+                self._apply(op, payload)
+                self._log_offset = f.tell()
+                replayed += 1
+            torn = f.seek(0, os.SEEK_END) > self._log_offset
+        if torn:
+            with self.log_path.open("r+b") as f:
+                f.truncate(self._log_offset)
+        return replayed
+
+    def _append_log(self, op: str, payload: Any) -> None:
+        """追加一条日志记录并刷盘（须持有文件锁且已同步）；日志过大时合并为新快照。"""
+        with self.log_path.open("ab") as f:
+            pickle.dump((op, payload), f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+            self._log_offset = f.tell()
+        snapshot_size = self._snapshot_sig[1] if self._snapshot_sig else 0
+        if self._log_offset > max(snapshot_size * COMPACT_RATIO, COMPACT_MIN_BYTES):
+            self._compact()
+
+    def _compact(self) -> None:
+        """原子写入新快照（先写临时文件再替换）并清空日志；截断前崩溃时重放日志是幂等的。"""
+        payload = {
+            "version": FORMAT_VERSION,
+            "docs": self._docs,
+            "postings": self._postings,
+            "total_len": self._total_len,
+        }
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with tmp_path.open("wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+        self.log_path.write_bytes(b"")
+        self._snapshot_sig = self._snapshot_stat()
+        self._log_offset = 0
+
+    # ---------- 增删 ----------
+    def add_nodes(self, nodes: Iterable[BaseNode], persist: bool = True) -> int:
+        """
+        增量写入节点（同 id 节点先删后加），返回写入数量。
+
+        persist=True 时先合并其他进程的写入，再把本批节点追加到日志；
+        persist=False 时只改内存，需随后调用 save() 落盘。
+        """
+        records = []
+        for node in nodes:
+            text = node.get_content(metadata_mode=MetadataMode.NONE)
+            tf = dict(Counter(tokenize(text)))
+            records.append((node.node_id, {"text": text, "metadata": dict(node.metadata), "length": sum(tf.values())}, tf))
+        if not records:
+            return 0
+        self._write("add", records, persist)
+        logger.info("BM25 索引增量写入节点数=%s，当前总数=%s", len(records), len(self._docs))
+        return len(records)
+
+    def delete_nodes(self, node_ids: Iterable[str], persist: bool = True) -> int:
+        """按节点 id 删除，返回删除数量。"""
+        node_ids = list(node_ids)
+        with self._lock:
+            if persist:
+                self.refresh()
+            removed = [node_id for node_id in node_ids if node_id in self._docs]
+            if removed:
+                self._write("delete", removed, persist)
+        return len(removed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._total_len = 0
+            self._norms = None
+
+    def _write(self, op: str, payload: Any, persist: bool) -> None:
+        if not persist:
+            with self._lock:
+                self._apply(op, payload)
+                self._pending.append((op, payload))
+            return
+        with self._locked():
+            self._sync()
+            self._apply(op, payload)
+            self._append_log(op, payload)
+
+    def _apply(self, op: str, payload: Any) -> None:
+        """把一条日志记录应用到内存索引：add 为 [(node_id, doc, tf)]，delete 为 [node_id]。"""
+        self._norms = None
+        if op == "delete":
+            for node_id in payload:
+                self._remove(node_id)
+            return
+        for node_id, doc, tf in payload:
+            self._remove(node_id)
+            self._docs[node_id] = doc
+            for term, count in tf.items():
+                self._postings.setdefault(term, {})[node_id] = count
+            self._total_len += doc["length"]
+
+    def _remove(self, node_id: str) -> bool:
+        doc = self._docs.pop(node_id, None)
+        if doc is None:
+            return False
+        # 重新分词以定位倒排项，删除频率远低于查询，可接受
+        for term in set(tokenize(doc["text"])):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(node_id, None)
+            if not posting:
+                del self._postings[term]
+        self._total_len -= doc["length"]
+        return True
+
+    # ---------- 查询 ----------
+    def select(self, predicate: Callable[[Dict[str, Any]], bool]) -> Set[str]:
+        """按节点元数据筛选，返回满足条件的节点 id 集合。"""
+        with self._lock:
+            return {node_id for node_id, doc in self._docs.items() if predicate(doc["metadata"])}
+
+    def search(self, query: str, top_k: int = 4, candidates: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """返回 (node_id, bm25 分数) 列表，按分数降序；传入 candidates 时只对其中的节点计分（IDF 仍按全库统计）。"""
+        query_tf = Counter(tokenize(query))
+        with self._lock:
+            n_docs = len(self._docs)
+            if n_docs == 0 or not query_tf:
+                return []
+            norms = self._norms
+            if norms is None:
+                avgdl = self._total_len / n_docs or 1.0
+                norms = self._norms = {
+                    node_id: self.k1 * (1.0 - self.b + self.b * doc["length"] / avgdl) for node_id, doc in self._docs.items()
+                }
+            scores: Dict[str, float] = {}
+            for term, qf in query_tf.items():
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                weight = qf * math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5)) * (self.k1 + 1.0)
+                if candidates is not None:
+                    posting = {node_id: tf for node_id, tf in posting.items() if node_id in candidates}
+                get = scores.get
+                for node_id, tf in posting.items():
+                    scores[node_id] = get(node_id, 0.0) + weight * tf / (tf + norms[node_id])
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def get_node(self, node_id: str) -> Optional[TextNode]:
+        doc = self._docs.get(node_id)
+        if doc is None:
+            return None
+        return TextNode(id_=node_id, text=doc["text"], metadata=dict(doc["metadata"]))
+
+
+class PersistentBM25Retriever(BaseRetriever):
+    """基于 BM25Store 的检索器，可与向量检索器一同放入 QueryFusionRetriever。"""
+
+    def __init__(
+        self,
+        store: BM25Store,
+        similarity_top_k: int = 4,
+        metadata_filter: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        **kwargs: Any,
+    ):
+        self._store = store
+        self._similarity_top_k = similarity_top_k
+        self._metadata_filter = metadata_filter
+        # 候选集在首次查询时计算一次；写入/删除节点后查询引擎随索引代数重建，不会用到过期候选集
+        self._candidates: Optional[Set[str]] = None
+        super().__init__(**kwargs)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if self._metadata_filter is not None and self._candidates is None:
+            self._candidates = self._store.select(self._metadata_filter)
+        if self._candidates is not None and not self._candidates:
+            return []
+        results = []
+        for node_id, score in self._store.search(query_bundle.query_str, self._similarity_top_k, self._candidates):
+            node = self._store.get_node(node_id)
+            if node is not None:
+                results.append(NodeWithScore(node=node, score=score))
+        return results
@@ -0,0 +1,170 @@
+"""
+查询向量缓存：相同问题（规范化后文本 + 嵌入模型名）直接复用查询向量，跳过 bge-m3 前向。
+
+- 进程内 LRU，跨会话共享；可选 SQLite 持久化，重启后仍可命中；
+- 与答案缓存相互独立：答案需要重新生成时，检索阶段仍可省去向量化；
+- 查询向量只依赖模型与文本，索引内容变化时无需失效；
+- 磁盘条目超过上限的 10% 后才按 used_at（有索引）成批淘汰最久未用的条目，单次写入不做全表排序。
+"""
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("autosafety")
+
+EVICT_SLACK = 0.1  # 磁盘条目超过 disk_max_entries × (1 + EVICT_SLACK) 时淘汰到 disk_max_entries
+
+
+def normalize_query(text: str) -> str:
+    """NFKC 归一化（全角转半角）并折叠空白。"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class QueryEmbeddingCache:
+    """查询向量 LRU 缓存（线程安全），db_path 不为空时同时写入 SQLite。"""
+
+    def __init__(self, model_name: str, max_entries: int = 1024, db_path: Optional[Path] = None,
+                 disk_max_entries: int = 100_000):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.embed_seconds = 0.0  # 未命中时实际计算耗时，用于估算节省时间
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_count = 0
+        if db_path is not None:
+            db_path = Path(db_path)
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=30)
+            with self._lock, self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS query_embeddings (
+                        key TEXT PRIMARY KEY,
+                        embedding BLOB NOT NULL,
+                        used_at REAL NOT NULL
+                    )
+                    """
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS query_embeddings_used_at ON query_embeddings (used_at)"
+                )
+                self._disk_count = self._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+    def _key(self, query: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x1f{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[np.ndarray]:
+        if self._conn is None:
+            return None
+        with self._conn:
+            row = self._conn.execute("SELECT embedding FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE query_embeddings SET used_at = ? WHERE key = ?", (time.time(), key))
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def _store(self, key: str, vector: np.ndarray) -> None:
+        if self._conn is None:
+            return
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, embedding, used_at) VALUES (?, ?, ?)",
+                (key, vector.tobytes(), time.time()),
+            )
+            self._disk_count += 1
+            if self._disk_count > self.disk_max_entries * (1 + EVICT_SLACK):
+                self._evict()
+
+    def _evict(self) -> None:
+        """按 used_at 淘汰最久未用的条目，直到不超过 disk_max_entries（在写事务内调用）。"""
+        count = self._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+        excess = count - self.disk_max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM query_embeddings WHERE key IN ("
+                "SELECT key FROM query_embeddings ORDER BY used_at LIMIT ?)",
+                (excess,),
+            )
+            logger.info("查询向量缓存淘汰 %s 条最久未用的条目", excess)
+        self._disk_count = count - max(excess, 0)
+
+    def get(self, query: str) -> Optional[List[float]]:
+        """命中返回查询向量，未命中返回 None。"""
+        key = self._key(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector.tolist()
+            vector = self._load(key)
+            if vector is not None:
+                self._remember(key, vector)
+                self.hits += 1
+                self.disk_hits += 1
+                return vector.tolist()
+            self.misses += 1
+        return None
+
+    def put(self, query: str, embedding: List[float]) -> None:
+        key = self._key(query)
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            self._store(key, vector)
+
+    def get_or_compute(self, query: str, embed_fn: Callable[[str], List[float]]) -> List[float]:
+        """命中直接返回；未命中调用 embed_fn 计算并写入缓存。"""
+        embedding = self.get(query)
+        if embedding is not None:
+            return embedding
+        start = time.perf_counter()
+        embedding = embed_fn(query)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.embed_seconds += elapsed
+        self.put(query, embedding)
+        return embedding
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM query_embeddings")
+                self._disk_count = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            avg_embed = self.embed_seconds / self.misses if self.misses else 0.0
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "avg_embed_seconds": avg_embed,
+                "saved_seconds": self.hits * avg_embed,
+            }
@@ -0,0 +1,136 @@
+"""
+检索范围筛选：按文件名、法规系列、版本与页码范围缩小混合检索的候选集。
+
+节点元数据只有 file_name / page_number，法规系列与版本由文件名解析（parse_regulation_name），
+因此先在已索引文件名上解析出满足条件的文件集合，再统一下推为：
+- Chroma：where {"file_name": {"$in": [...]}} 与 page_number 的 $gte/$lte（经 LlamaIndex MetadataFilters）；
+- BM25：只对候选节点 id 计分（PersistentBM25Retriever 的 metadata_filter）。
+已入库数据无需重建即可筛选。
+"""
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Match, Optional, Pattern, Set, Tuple
+
+from llama_index.core.vector_stores.types import FilterOperator, MetadataFilter, MetadataFilters
+
+# 标准号/评价规程前缀：GB 11551-2014、GB∕T 31498（文件名中不能出现 "/"）、ECE R94、FMVSS 208、C-NCAP、C-IASI、Euro NCAP。
+# 中文字符也属于 \w，边界用 ASCII 环视而不是 \b（"C-NCAP管理规则" 中 P 与"管"之间没有 \b）
+_A = r"(?<![A-Za-z0-9])"
+_Z = r"(?![A-Za-z0-9])"
+_STANDARD = r"(GB|QC|JT)\s*[/∕_\-]?\s*(T)?"
+# (模式, 规范化写法)：同一系列的不同写法（GBT31498、GB∕T 31498）归为同一个名称
+_FAMILY_PATTERNS: List[Tuple[Pattern[str], Callable[[Match[str]], str]]] = [
+    (
+        re.compile(_A + _STANDARD + r"\s*(\d+(?:\.\d+)*)", re.I),
+        lambda m: f"{m.group(1).upper()}{'/T' if m.group(2) else ''} {m.group(3)}",
+    ),
+    (re.compile(_A + r"(ECE|UN)\s*[-_]?\s*R\s*(\d+)" + _Z, re.I), lambda m: f"{m.group(1).upper()} R{m.group(2)}"),
+    (re.compile(_A + r"FMVSS\s*(\d+)", re.I), lambda m: f"FMVSS {m.group(1)}"),
+    (re.compile(_A + r"Euro\s*NCAP" + _Z, re.I), lambda m: "Euro NCAP"),
+    (re.compile(_A + r"([A-Z]{1,4}-[A-Z]{3,5})" + _Z), lambda m: m.group(1)),
+]
+_YEAR_VERSION_RE = re.compile(r"(?<!\d)((?:19|20)\d{2})\s*年?\s*版")
+_STANDARD_YEAR_RE = re.compile(_A + _STANDARD + r"\s*\d+(?:\.\d+)*\s*[-—–]\s*((?:19|20)\d{2})(?!\d)", re.I)
+_BRACKET_YEAR_RE = re.compile(r"[（(]\s*((?:19|20)\d{2})\s*[)）]")
+_V_VERSION_RE = re.compile(_A + r"[Vv]\s*(\d+(?:\.\d+)*)" + _Z)
+_BARE_YEAR_RE = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+
+
+def parse_regulation_name(file_name: str) -> Tuple[str, str]:
+    """
+    从文件名解析 (法规系列, 版本)；识别不到标准号/规程前缀时系列取去掉版本后的文件名，版本缺失时为空串。
+
+    Args:
+        file_name: 文件名，如 "C-NCAP管理规则（2024年版）.pdf"、"GB 11551-2014 乘员保护.pdf"
+
+    Returns:
+        (family, version)，如 ("C-NCAP", "2024")、("GB 11551", "2014")
+    """
+    stem = Path(file_name).stem
+    version = ""
+    for pattern in (_YEAR_VERSION_RE, _STANDARD_YEAR_RE, _BRACKET_YEAR_RE, _V_VERSION_RE, _BARE_YEAR_RE):
+        match = pattern.search(stem)
+        if match:
+            version = f"V{match.group(1)}" if pattern is _V_VERSION_RE else match.group(match.lastindex)
+            break
+
+    for pattern, normalize in _FAMILY_PATTERNS:
+        match = pattern.search(stem)
+        if match:
+            return normalize(match), version
+    family = stem
+    for pattern in (_YEAR_VERSION_RE, _BRACKET_YEAR_RE, _V_VERSION_RE, _BARE_YEAR_RE):
+        family = pattern.sub("", family)
+    return re.sub(r"[\s_\-（）()]+$", "", family.strip()) or stem, version
+
+
+@dataclass(frozen=True)
+class RetrievalFilters:
+    """检索范围（不可变，可作为查询引擎缓存键）；各字段为空表示不限。"""
+
+    file_names: Tuple[str, ...] = ()
+    families: Tuple[str, ...] = ()
+    versions: Tuple[str, ...] = ()
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
+    def is_empty(self) -> bool:
+        return not (self.file_names or self.families or self.versions) and self.page_start is None and self.page_end is None
+
+    def has_file_constraints(self) -> bool:
+        return bool(self.file_names or self.families or self.versions)
+
+    def describe(self) -> str:
+        """简短描述，同时用作答案缓存的作用域键。"""
+        parts = []
+        if self.families:
+            parts.append("系列=" + "|".join(self.families))
+        if self.versions:
+            parts.append("版本=" + "|".join(self.versions))
+        if self.file_names:
+            parts.append("文件=" + "|".join(self.file_names))
+        if self.page_start is not None or self.page_end is not None:
+            parts.append(f"页={self.page_start or 1}-{self.page_end or ''}")
+        return "；".join(parts)
+
+    def resolve_files(self, file_names: Iterable[str]) -> Optional[Set[str]]:
+        """在已索引文件名中选出满足 文件名/系列/版本 条件的文件；没有文件级条件时返回 None（不限）。"""
+        if not self.has_file_constraints():
+            return None
+        selected = set()
+        for name in file_names:
+            family, version = parse_regulation_name(name)
+            if self.file_names and name not in self.file_names:
+                continue
+            if self.families and family not in self.families:
+                continue
+            if self.versions and version not in self.versions:
+                continue
+            selected.add(name)
+        return selected
+
+    def to_metadata_filters(self, files: Optional[Set[str]]) -> Optional[MetadataFilters]:
+        """转换为 LlamaIndex MetadataFilters（ChromaVectorStore 翻译为 where 子句）。"""
+        filters = []
+        if files is not None:
+            filters.append(MetadataFilter(key="file_name", value=sorted(files), operator=FilterOperator.IN))
+        if self.page_start is not None:
+            filters.append(MetadataFilter(key="page_number", value=self.page_start, operator=FilterOperator.GTE))
+        if self.page_end is not None:
+            filters.append(MetadataFilter(key="page_number", value=self.page_end, operator=FilterOperator.LTE))
+        return MetadataFilters(filters=filters) if filters else None
+
+    def matches(self, metadata: Dict[str, Any], files: Optional[Set[str]]) -> bool:
+        """与 to_metadata_filters 等价的内存判断（BM25 候选集与临时文档使用）。"""
+        if files is not None and metadata.get("file_name") not in files:
+            return False
+        page = metadata.get("page_number")
+        if self.page_start is not None or self.page_end is not None:
+            if not isinstance(page, int):
+                return False
+            if self.page_start is not None and page < self.page_start:
+                return False
+            if self.page_end is not None and page > self.page_end:
+                return False
+        return True
@@ -0,0 +1,142 @@
+"""
+并行混合检索：BM25 检索与「查询向量化 -> Chroma 向量检索」同时进行，结果按到达顺序做倒数排名融合 (RRF)。
+
+QueryFusionRetriever(use_async=False) 会依次执行各检索器；这里将同步的 BM25 / 嵌入模型 / Chroma 调用
+分别放入线程，由 asyncio 并发等待。各阶段耗时记录在 RetrievalTimings 中，用于确认重叠效果。
+"""
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from llama_index.core.async_utils import asyncio_run
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+logger = logging.getLogger("autosafety")
+
+_current_timings: ContextVar[Optional["RetrievalTimings"]] = ContextVar("retrieval_timings", default=None)
+
+
+@dataclass
+class RetrievalTimings:
+    """检索阶段耗时（秒）。"""
+
+    bm25: float = 0.0
+    embed: float = 0.0
+    vector: float = 0.0
+    fusion: float = 0.0
+    parallel: float = 0.0  # BM25 与 向量化+向量检索 并发阶段的墙钟时间
+    rerank: float = 0.0
+    total: float = 0.0
+    embedding_reused: bool = False  # 复用了答案缓存查找时算好的查询向量
+
+    @property
+    def overlap_saved(self) -> float:
+        """相对串行执行节省的时间。"""
+        return max(0.0, self.bm25 + self.embed + self.vector - self.parallel)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "bm25_s": round(self.bm25, 3),
+            "embed_s": round(self.embed, 3),
+            "vector_s": round(self.vector, 3),
+            "parallel_s": round(self.parallel, 3),
+            "fusion_s": round(self.fusion, 3),
+            "rerank_s": round(self.rerank, 3),
+            "total_s": round(self.total, 3),
+            "overlap_saved_s": round(self.overlap_saved, 3),
+            "embedding_reused": self.embedding_reused,
+        }
+
+    def report(self) -> str:
+        embed = "复用" if self.embedding_reused else f"{self.embed:.2f}s"
+        return (
+            f"检索 {self.total:.2f}s | BM25 {self.bm25:.2f}s ‖ 向量化 {embed} + Chroma {self.vector:.2f}s"
+            f" = 并发 {self.parallel:.2f}s（节省 {self.overlap_saved:.2f}s） | 融合 {self.fusion:.3f}s"
+            f" | 重排 {self.rerank:.2f}s"
+        )
+
+
+def track_retrieval_timings() -> RetrievalTimings:
+    """为当前上下文创建耗时记录；之后在同一上下文中执行的 ParallelHybridRetriever 会写入该对象。"""
+    timings = RetrievalTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+class ParallelHybridRetriever(BaseRetriever):
+    """BM25 与向量检索并发执行的混合检索器，融合方式与 QueryFusionRetriever 的 reciprocal_rerank 一致。"""
+
+    def __init__(
+        self,
+        bm25_retriever: BaseRetriever,
+        vector_retriever: BaseRetriever,
+        embed_fn: Callable[[str], List[float]],
+        similarity_top_k: int = 4,
+        rrf_k: float = 60.0,
+        **kwargs: Any,
+    ):
+        self._bm25_retriever = bm25_retriever
+        self._vector_retriever = vector_retriever
+        self._embed_fn = embed_fn  # 查询文本 -> 查询向量（可带缓存）
+        self._similarity_top_k = similarity_top_k
+        self._rrf_k = rrf_k
+        super().__init__(**kwargs)
+
+    async def _bm25(self, query_bundle: QueryBundle, timings: RetrievalTimings) -> List[NodeWithScore]:
+        start = time.perf_counter()
+        nodes = await asyncio.to_thread(self._bm25_retriever.retrieve, query_bundle)
+        timings.bm25 = time.perf_counter() - start
+        return nodes
+
+    async def _vector(self, query_bundle: QueryBundle, timings: RetrievalTimings) -> List[NodeWithScore]:
+        embedding = query_bundle.embedding
+        timings.embedding_reused = embedding is not None
+        if embedding is None:
+            start = time.perf_counter()
+            embedding = await asyncio.to_thread(self._embed_fn, query_bundle.query_str)
+            timings.embed = time.perf_counter() - start
+        bundle = QueryBundle(query_str=query_bundle.query_str, embedding=embedding)
+        start = time.perf_counter()
+        nodes = await asyncio.to_thread(self._vector_retriever.retrieve, bundle)
+        timings.vector = time.perf_counter() - start
+        return nodes
+
+    async def aretrieve_timed(
+        self, query_bundle: QueryBundle, timings: Optional[RetrievalTimings] = None
+    ) -> Tuple[List[NodeWithScore], RetrievalTimings]:
+        """并发检索并融合，返回结果与耗时（传入 timings 时写入该对象）。"""
+        timings = timings or RetrievalTimings()
+        started = time.perf_counter()
+        scores: Dict[str, float] = {}
+        nodes_by_id: Dict[str, NodeWithScore] = {}
+        fusion = 0.0
+        tasks = [self._bm25(query_bundle, timings), self._vector(query_bundle, timings)]
+        for finished in asyncio.as_completed(tasks):
+            results = await finished
+            # 先到先融合：RRF 得分与到达顺序无关
+            start = time.perf_counter()
+            for rank, node in enumerate(sorted(results, key=lambda n: n.score or 0.0, reverse=True)):
+                node_id = node.node.node_id
+                scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (rank + self._rrf_k)
+                nodes_by_id.setdefault(node_id, node)
+            fusion += time.perf_counter() - start
+        timings.parallel = time.perf_counter() - started
+
+        start = time.perf_counter()
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[: self._similarity_top_k]
+        fused = [NodeWithScore(node=nodes_by_id[node_id].node, score=score) for node_id, score in ranked]
+        timings.fusion = fusion + time.perf_counter() - start
+        timings.total = time.perf_counter() - started
+        logger.info("并行混合检索: %s", timings.report())
+        return fused, timings
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        nodes, _ = await self.aretrieve_timed(query_bundle, _current_timings.get())
+        return nodes
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return asyncio_run(self._aretrieve(query_bundle))
@@ -0,0 +1,121 @@
+"""
+交叉编码器重排：对混合检索召回的候选池逐一打分，只把得分最高的少量片段交给 LLM。
+
+- 模型（如 bge-reranker）从本地 models/ 目录加载，CPU 可用；
+- 未命中缓存的 (query, 文本) 对成批送入模型打分；
+- (query, node_id) 得分缓存为 LRU，索引内容变化时由 rag_engine 调用 clear() 整体失效。
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+logger = logging.getLogger("autosafety")
+
+
+class RerankScoreCache:
+    """(query, node_id) -> 得分 的 LRU 缓存（线程安全）。"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._scores: "OrderedDict[tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, query: str, node_ids: List[str]) -> Dict[str, float]:
+        """返回已缓存的得分；未命中的 node_id 不在结果中。"""
+        found = {}
+        with self._lock:
+            for node_id in node_ids:
+                key = (query, node_id)
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    found[node_id] = self._scores[key]
+            self.hits += len(found)
+            self.misses += len(node_ids) - len(found)
+        return found
+
+    def put_many(self, query: str, scores: Dict[str, float]) -> None:
+        with self._lock:
+            for node_id, score in scores.items():
+                self._scores[(query, node_id)] = score
+                self._scores.move_to_end((query, node_id))
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scores.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._scores),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class CrossEncoderReranker(BaseNodePostprocessor):
+    """基于 sentence-transformers CrossEncoder 的重排后处理器，可直接放入 node_postprocessors。"""
+
+    model_name: str = Field(description="本地模型目录或 HuggingFace 模型名")
+    top_n: int = Field(default=3, description="重排后保留的片段数")
+    batch_size: int = Field(default=16, description="单次前向的 (query, 文本) 对数")
+    device: str = Field(default="cpu")
+    max_length: int = Field(default=512, description="query + 文本的最大 token 数")
+
+    _model: Any = PrivateAttr()
+    _cache: Optional[RerankScoreCache] = PrivateAttr()
+
+    def __init__(self, cache: Optional[RerankScoreCache] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        from sentence_transformers import CrossEncoder
+
+        logger.info("加载重排模型: %s, device=%s", self.model_name, self.device)
+        self._model = CrossEncoder(self.model_name, device=self.device, max_length=self.max_length)
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CrossEncoderReranker"
+
+    def score(self, query: str, nodes: List[NodeWithScore]) -> List[float]:
+        """返回每个候选片段的相关性得分，缓存未命中的部分成批打分。"""
+        node_ids = [n.node.node_id for n in nodes]
+        cached = self._cache.get_many(query, node_ids) if self._cache is not None else {}
+        missing = [n for n in nodes if n.node.node_id not in cached]
+        if missing:
+            pairs = [(query, n.node.get_content(metadata_mode=MetadataMode.EMBED)) for n in missing]
+            scores = self._model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            fresh = {n.node.node_id: float(s) for n, s in zip(missing, scores)}
+            if self._cache is not None:
+                self._cache.put_many(query, fresh)
+            cached = {**cached, **fresh}
+        return [cached[node_id] for node_id in node_ids]
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if query_bundle is None or not nodes:
+            return nodes[: self.top_n]
+        start = time.perf_counter()
+        scores = self.score(query_bundle.query_str, nodes)
+        ranked = sorted(zip(nodes, scores), key=lambda item: item[1], reverse=True)[: self.top_n]
+        logger.info(
+            "重排: 候选 %s -> 保留 %s, 耗时 %.3fs",
+            len(nodes),
+            len(ranked),
+            time.perf_counter() - start,
+        )
+        return [NodeWithScore(node=n.node, score=score) for n, score in ranked]
@@ -0,0 +1,124 @@
+"""
+入库流程：解析单个文件并写入 Chroma + BM25。
+
+上传文件由 app.py 提交到后台任务队列（engines/ingest），由工作线程调用 ingest_file，
+Streamlit 脚本只负责落地文件与展示任务进度。
+"""
+import logging
+import threading
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import streamlit as st
+from llama_index.core import Document
+
+import config
+import rag_engine
+import utils
+from engines.ingest.job_queue import IngestJob, JobQueue
+from engines.ingest.worker import IngestWorker, ProgressFn
+
+logger = logging.getLogger("autosafety")
+
+# 修订版的删除/更新与新节点写入需串行，避免并发任务交错修改索引
+_index_lock = threading.Lock()
+# PDF 解析会占用 VLM（GPU），并发数单独受限
+_vlm_slot = threading.BoundedSemaphore(max(1, config.model_config.ingest_vlm_slots))
+
+
+def prepare_documents(
+    file_path: Path,
+    report: Optional[ProgressFn] = None,
+    indexed_names: Optional[Set[str]] = None,
+) -> Tuple[List[Document], Optional[Dict[str, Any]]]:
+    """
+    解析文件（不写索引），返回 (文档列表, 修订计划)。
+    同名文件已在库中时按修订版处理：只重新解析内容变化的页，修订计划见 rag_engine.plan_file_revision。
+    indexed_names 为已索引文件名集合，批量入库时传入以避免逐文件全量扫描 Chroma。
+    """
+    report = report or (lambda progress, message: None)
+    if indexed_names is None:
+        indexed_names = rag_engine.get_exist_file_names()
+    pages = None
+    revision = None
+    if file_path.name in indexed_names:
+        revision = rag_engine.plan_file_revision(file_path.name, utils.page_hashes(file_path))
+        pages = revision["changed_pages"]
+        report(0.05, f"修订版，变化页数：{len(pages)}")
+
+    docs: List[Document] = []
+    if pages is None or pages:
+        report(0.1, "解析中")
+        docs = _parse_pages(file_path, pages)
+    return docs, revision
+
+
+def _parse_pages(file_path: Path, pages: Optional[List[int]]) -> List[Document]:
+    slot = _vlm_slot if file_path.suffix.lower() == ".pdf" else nullcontext()
+    with slot:
+        return utils.file_to_documents(file_path, pages)
+
+
+def revalidate_revision(
+    file_path: Path,
+    docs: List[Document],
+    revision: Optional[Dict[str, Any]],
+) -> Tuple[List[Document], Optional[Dict[str, Any]]]:
+    """
+    在 _index_lock 内调用：解析期间同名文件可能已被其他任务改动，按索引当前状态重新生成修订计划。
+    新计划中多出的变化页补充解析，已不再变化的页丢弃；库中已无同名节点时按新文件处理。
+    """
+    page_hashes = revision["page_hashes"] if revision is not None else utils.page_hashes(file_path)
+    fresh = rag_engine.plan_file_revision(file_path.name, page_hashes)
+    if not fresh["stale_node_ids"] and not fresh["kept_node_ids"]:
+        if revision is None:
+            return docs, None
+        # 计划时的旧版本已被删除，整份文件都需要写入
+        fresh = None
+    changed = set(fresh["changed_pages"]) if fresh is not None else set(page_hashes)
+    parsed = {doc.metadata.get("page_number") for doc in docs}
+    missing = sorted(changed - parsed)
+    docs = [doc for doc in docs if doc.metadata.get("page_number") in changed]
+    if missing:
+        logger.info("修订计划已变化，补充解析: %s, 页=%s", file_path.name, missing)
+        docs.extend(_parse_pages(file_path, missing))
+    return docs, fresh
+
+
+def ingest_file(file_path: Path, file_hash: str, report: Optional[ProgressFn] = None) -> int:
+    """
+    解析文件并写入索引，返回入库页数。
+    修订版先写入变化页的新节点，成功后才更新保留节点并删除失效节点；写入失败时回滚，
+    库中仍是完整的旧版本，注册表也不会记录新版本哈希，重新上传不会被当作“内容相同”跳过。
+    """
+    report = report or (lambda progress, message: None)
+    file_name = file_path.name
+    docs, revision = prepare_documents(file_path, report)
+
+    report(0.7, f"写入索引（{len(docs)} 页）")
+    with _index_lock:
+        docs, revision = revalidate_revision(file_path, docs, revision)
+        try:
+            if docs:
+                rag_engine.build_or_refresh_index(docs)
+            if revision is not None:
+                rag_engine.apply_file_revision(file_hash, revision)
+        except Exception:
+            logger.exception("写入索引失败，回滚: %s", file_name)
+            rag_engine.rollback_file_revision(file_hash, revision)
+            raise
+    logger.info("入库完成: %s, 页数=%s", file_name, len(docs))
+    return len(docs)
+
+
+def _handle_job(job: IngestJob, report: ProgressFn) -> int:
+    return ingest_file(Path(job.file_path), job.file_hash, report)
+
+
+@st.cache_resource(show_spinner=False)
+def get_ingest_worker() -> IngestWorker:
+    """进程内唯一的后台入库线程池；启动时恢复上次未完成的任务。"""
+    config.ensure_dirs()
+    queue = JobQueue(config.INGEST_DB_PATH)
+    return IngestWorker(queue, _handle_job, max_workers=config.model_config.ingest_max_workers).start()
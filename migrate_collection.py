@@ -0,0 +1,69 @@
+"""
+按新的 HNSW 参数（距离度量、M、ef_construction、ef_search）重建 Chroma 集合，复用集合中已存的向量，不重新嵌入。
+
+参数默认取 config.model_config 的 hnsw_*；命令行覆盖时请同步修改 config.py，否则下次启动会提示参数不一致。
+只修改 ef_search 时无需重建，启动时会直接应用到已有集合。重建期间请勿运行应用或入库脚本；
+在删除旧集合与改名之间中断时，重跑本命令会直接完成改名。重建完成后需重启 Streamlit 应用。
+
+运行（项目根目录）：
+    python migrate_collection.py                 # 按 config.py 中的 hnsw_* 重建
+    python migrate_collection.py --space cosine --m 32 --construction-ef 200
+    python migrate_collection.py --dry-run       # 只比较当前参数与目标参数
+"""
+import argparse
+import time
+
+import chromadb
+
+import config
+from engines.ingest.collection import HnswParams, current_params, rebuild_collection, set_search_ef
+
+
+def main() -> None:
+    cfg = config.model_config
+    parser = argparse.ArgumentParser(description="按新的 HNSW 参数重建 Chroma 集合")
+    parser.add_argument("--collection", default=cfg.chroma_collection)
+    parser.add_argument("--space", default=cfg.hnsw_space, choices=["l2", "cosine", "ip"])
+    parser.add_argument("--m", type=int, default=cfg.hnsw_m)
+    parser.add_argument("--construction-ef", type=int, default=cfg.hnsw_construction_ef)
+    parser.add_argument("--search-ef", type=int, default=cfg.hnsw_search_ef)
+    parser.add_argument("--batch-size", type=int, default=cfg.index_upsert_batch, help="每次读写条数")
+    parser.add_argument("--force", action="store_true", help="参数相同也重建（例如整理删除较多的索引）")
+    parser.add_argument("--dry-run", action="store_true", help="只比较参数，不重建")
+    args = parser.parse_args()
+
+    config.setup_logging()
+    target = HnswParams(space=args.space, m=args.m, construction_ef=args.construction_ef, search_ef=args.search_ef)
+    client = chromadb.PersistentClient(path=str(config.CHROMA_PATH))
+    names = {getattr(item, "name", item) for item in client.list_collections()}
+    if args.collection in names:
+        collection = client.get_collection(args.collection)
+        actual = current_params(collection)
+        print(f"集合 {args.collection}: {collection.count()} 条")
+        print(f"  当前: {actual.describe()}")
+        print(f"  目标: {target.describe()}")
+        if args.dry_run:
+            return
+        if not actual.needs_rebuild(target) and not args.force:
+            if actual.search_ef != target.search_ef and set_search_ef(collection, target.search_ef):
+                print(f"索引结构参数未变，ef_search 已直接修改为 {target.search_ef}（重启应用后生效），无需重建")
+            else:
+                print("参数未变，无需重建（--force 强制重建）")
+            return
+    elif args.dry_run:
+        print(f"集合 {args.collection} 不存在")
+        return
+
+    start = time.perf_counter()
+
+    def progress(copied: int, total: int) -> None:
+        print(f"\r  已复制 {copied}/{total}", end="", flush=True)
+
+    collection = rebuild_collection(client, args.collection, target, args.batch_size, progress)
+    print(f"\n重建完成: {collection.count()} 条，用时 {time.perf_counter() - start:.1f}s；{current_params(collection).describe()}")
+    if target != HnswParams.from_config(cfg):
+        print("提示：目标参数与 config.py 中的 hnsw_* 不同，请同步修改配置")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,26 +2,46 @@
 LlamaIndex 核心封装：混合检索 (BM25 + 向量)、索引管理、查询引擎。
 显存提示：BAAI/bge-m3 在 CUDA 上约占用 4~6GB，A4000(16GB) 需预留显存给 Ollama。
 """
-from typing import List, Dict, Any, Set
+from pathlib import Path
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Set, Tuple
 
 import chromadb
 import logging
+import threading
+import time
 import streamlit as st
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.llms.ollama import Ollama
 from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.core import (
     Document,
     VectorStoreIndex,
-    StorageContext,
     get_response_synthesizer,
     Settings,
 )
+from llama_index.core.ingestion import run_transformations
 from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.response.schema import RESPONSE_TYPE
+from llama_index.core.schema import BaseNode, MetadataMode, QueryBundle
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
 from llama_index.retrievers.bm25 import BM25Retriever
 from llama_index.core.retrievers import QueryFusionRetriever
 
 import config
+from engines.embedding.backends import create_embedding_model
+from engines.embedding.batching import DynamicBatchingEmbedding
+from engines.embedding.store import EmbeddingStore
+from engines.ingest.chunker import RegulationNodeParser
+from engines.ingest.collection import HnswParams, current_params, open_collection
+from engines.ingest.registry import DocumentRegistry
+from engines.ingest.writer import BulkIndexWriter, upsert_chroma
+from engines.ocr_by_vlm.pipeline import StageStats
+from engines.retrieval.answer_cache import CachedAnswer, SemanticAnswerCache
+from engines.retrieval.bm25_store import BM25Store, PersistentBM25Retriever
+from engines.retrieval.embedding_cache import QueryEmbeddingCache
+from engines.retrieval.filters import RetrievalFilters, parse_regulation_name
+from engines.retrieval.hybrid import ParallelHybridRetriever, RetrievalTimings, track_retrieval_timings
+from engines.retrieval.reranker import CrossEncoderReranker, RerankScoreCache
 
 import os
 
@@ -34,16 +54,30 @@ logger = logging.getLogger("autosafety")
 
 # @st.cache_resource作用是缓存资源，避免每次都重新创建，提高性能
 @st.cache_resource(show_spinner=False)
-def get_embedding_model() -> HuggingFaceEmbedding:
-    """加载 HuggingFace 向量模型到指定设备。"""
+def get_embedding_model() -> BaseEmbedding:
+    """按 embedding_backend 加载向量模型（HuggingFace fp32 / PyTorch int8 / ONNX Runtime），默认外包一层按 token 数的动态批处理。"""
+    backend = config.model_config.embedding_backend
     device = config.model_config.embedding_device
-    logger.info("加载嵌入模型: %s, device=%s", config.model_config.embedding_model_name, device)
-    return HuggingFaceEmbedding(
+    logger.info(
+        "加载嵌入模型: %s, backend=%s, device=%s", config.model_config.embedding_model_name, backend, device
+    )
+    model = create_embedding_model(
+        backend,
         model_name=config.model_config.embedding_model_name,
         device=device,
         embed_batch_size=config.model_config.embedding_batch_size,
-        # 强制使用 Safetensors，避开 PyTorch 2.6 版本检查
-        model_kwargs={"use_safetensors": True},
+        onnx_dir=config.model_config.embedding_onnx_dir,
+        onnx_quantized=config.model_config.embedding_onnx_quantized,
+        max_length=config.model_config.embedding_max_length,
+        num_threads=config.model_config.embedding_num_threads,
+    )
+    if not config.model_config.embedding_dynamic_batching:
+        return model
+    return DynamicBatchingEmbedding(
+        model,
+        max_batch_tokens=config.model_config.embedding_max_batch_tokens,
+        max_batch_items=config.model_config.embedding_max_batch_items,
+        baseline_batch_size=config.model_config.embedding_batch_size,
     )
 
 
@@ -62,59 +96,242 @@ def get_llm() -> Ollama:
 
 @st.cache_resource(show_spinner=False)
 def get_vector_store() -> ChromaVectorStore:
-    """初始化或连接本地 Chroma 持久化集合。"""
+    """初始化或连接本地 Chroma 持久化集合；新建集合时按配置写入 HNSW 参数。"""
     config.ensure_dirs()
     client = chromadb.PersistentClient(path=str(config.CHROMA_PATH))
-    collection = client.get_or_create_collection("autosafety_rag")
-    logger.info("连接 Chroma collection=autosafety_rag, path=%s", config.CHROMA_PATH)
+    name = config.model_config.chroma_collection
+    collection = open_collection(client, name, HnswParams.from_config(config.model_config))
+    logger.info(
+        "连接 Chroma collection=%s, path=%s, %s", name, config.CHROMA_PATH, current_params(collection).describe()
+    )
     return ChromaVectorStore(chroma_collection=collection)
 
 
-def get_collection_count() -> int:
-    """返回 Chroma 当前已存节点数量。"""
-    vector_store = get_vector_store()
-    collection = getattr(vector_store, "_collection", None)
+def iter_stored_nodes(batch_size: int = 1000) -> Iterator[BaseNode]:
+    """分页遍历 Chroma 中已存的全部节点（用于 BM25 回填与基准测试）。"""
+    collection = getattr(get_vector_store(), "_collection", None)
     if collection is None:
-        return 0
-    try:
-        count = collection.count()
-        logger.info("Chroma collection 当前节点数: %s", count)
-        return count
-    except Exception:
-        return 0
+        return
+    offset = 0
+    while True:
+        res = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+        ids = res.get("ids") or []
+        if not ids:
+            break
+        for text, meta in zip(res.get("documents") or [], res.get("metadatas") or []):
+            yield metadata_dict_to_node(meta or {}, text=text)
+        offset += len(ids)
+
+
+@st.cache_resource(show_spinner=False)
+def get_bm25_store() -> BM25Store:
+    """启动时加载一次持久化 BM25 索引；若为空而 Chroma 已有数据，则从 Chroma 回填一次。"""
+    config.ensure_dirs()
+    store = BM25Store(
+        config.BM25_PATH,
+        k1=config.model_config.bm25_k1,
+        b=config.model_config.bm25_b,
+    ).load()
+    collection = getattr(get_vector_store(), "_collection", None)
+    if len(store) == 0 and collection is not None and collection.count() > 0:
+        logger.info("BM25 索引为空，从 Chroma 回填")
+        store.add_nodes(iter_stored_nodes(), persist=False)
+        store.save()  # 全量回填直接写快照，不经追加日志
+    return store
+
+
+def _summarize_metadatas(metadatas: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Tuple[int, int]]]:
+    """
+    按 文件名 -> 文件哈希 汇总节点元数据，得到每个文件版本的 (页数, 块数)。
+    页数取入库时记录的文件总页数 page_count；旧数据没有该字段时退回到节点覆盖的最大页码。
+    """
+    summary: Dict[str, Dict[str, Tuple[int, int]]] = {}
+    for meta in metadatas:
+        if not isinstance(meta, dict) or not meta.get("file_name"):
+            continue
+        versions = summary.setdefault(meta["file_name"], {})
+        page_count, chunks = versions.get(meta.get("file_hash", ""), (0, 0))
+        last_page = meta.get("page_count") or meta.get("page_end") or meta.get("page_number") or 0
+        versions[meta.get("file_hash", "")] = (max(page_count, int(last_page)), chunks + 1)
+    return summary
+
+
+def _iter_stored_metadatas(batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+    """分页遍历 Chroma 中全部节点的元数据（仅用于登记表首次回填）。"""
+    collection = getattr(get_vector_store(), "_collection", None)
+    if collection is None:
+        return
+    offset = 0
+    while True:
+        res = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        ids = res.get("ids") or []
+        if not ids:
+            break
+        yield from (meta or {} for meta in res.get("metadatas") or [])
+        offset += len(ids)
+
+
+def _replace_registry_entries(registry: DocumentRegistry, summary: Dict[str, Dict[str, Tuple[int, int]]]) -> None:
+    for file_name, versions in summary.items():
+        registry.replace_file(
+            file_name,
+            [(file_hash, page_count, chunks) for file_hash, (page_count, chunks) in versions.items()],
+        )
+
+
+@st.cache_resource(show_spinner=False)
+def get_doc_registry() -> DocumentRegistry:
+    """已索引文档登记表；为空而 Chroma 已有数据时（旧版本数据）全量扫描回填一次。"""
+    config.ensure_dirs()
+    registry = DocumentRegistry(config.DOC_REGISTRY_PATH)
+    collection = getattr(get_vector_store(), "_collection", None)
+    if len(registry) == 0 and collection is not None and collection.count() > 0:
+        logger.info("文档登记表为空，从 Chroma 回填")
+        _replace_registry_entries(registry, _summarize_metadatas(_iter_stored_metadatas()))
+    return registry
+
+
+def sync_registry(file_names: Iterable[str]) -> None:
+    """写入/删除节点后按文件名同步登记表：只读取这些文件自身的节点元数据（O(文件块数)）。"""
+    collection = getattr(get_vector_store(), "_collection", None)
+    if collection is None:
+        return
+    registry = get_doc_registry()
+    for file_name in {name for name in file_names if name}:
+        res = collection.get(where={"file_name": file_name}, include=["metadatas"])
+        versions = _summarize_metadatas(res.get("metadatas") or []).get(file_name, {})
+        registry.replace_file(
+            file_name,
+            [(file_hash, page_count, chunks) for file_hash, (page_count, chunks) in versions.items()],
+        )
+
+
+def get_collection_count() -> int:
+    """返回已存节点数量（登记表汇总，不访问 Chroma）。"""
+    return get_doc_registry().chunk_total()
 
 
 def get_exist_file_names() -> Set[str]:
+    """从文档登记表读取已索引的文件名集合。"""
+    names = get_doc_registry().file_names()
+    logger.info("已索引文件数: %s", len(names))
+    return names
+
+
+def get_exist_file_hashes() -> Dict[str, str]:
+    """
+    从文档登记表读取已索引文件的内容哈希，返回 {file_hash: file_name}。
+    用于按内容去重：同名修订版与改名副本都能被正确识别。
     """
-    从持久化 Chroma 中读取已索引的文件名集合。
-    说明：当前场景数据量有限，直接全量获取 metadatas。
+    hashes = get_doc_registry().hashes()
+    logger.info("已索引文件哈希数: %s", len(hashes))
+    return hashes
+
+
+def plan_file_revision(file_name: str, page_hashes: Dict[int, str]) -> Dict[str, Any]:
     """
-    vector_store = get_vector_store()
-    collection = getattr(vector_store, "_collection", None)
+    对比同名文件新旧版本的逐页哈希，返回增量更新计划：
+        changed_pages: 需重新解析/向量化的页码（新增或内容变化）
+        stale_node_ids: 旧版本中已失效的节点（页内容变化或页已删除）
+        kept_node_ids: 内容未变、可直接保留的节点
+        kept_metadata: 保留节点原来的 file_hash/page_count，回滚时恢复
+        page_hashes: 新版本的逐页哈希，写入前可据此重新生成计划
+    """
+    collection = getattr(get_vector_store(), "_collection", None)
+    stored: Dict[str, Tuple[Any, Any]] = {}
+    previous: Dict[str, Dict[str, Any]] = {}
+    if collection is not None:
+        res = collection.get(where={"file_name": file_name}, include=["metadatas"])
+        for node_id, meta in zip(res.get("ids") or [], res.get("metadatas") or []):
+            meta = meta or {}
+            stored[node_id] = (meta.get("page_number"), meta.get("page_hash"))
+            previous[node_id] = {key: meta[key] for key in ("file_hash", "page_count") if key in meta}
+
+    current = {(page, page_hash) for page, page_hash in page_hashes.items()}
+    kept_node_ids = [node_id for node_id, key in stored.items() if key in current]
+    stale_node_ids = [node_id for node_id, key in stored.items() if key not in current]
+    unchanged = {stored[node_id] for node_id in kept_node_ids}
+    changed_pages = sorted(page for page, page_hash in page_hashes.items() if (page, page_hash) not in unchanged)
+    logger.info(
+        "修订版增量计划: %s, 变化页=%s, 失效节点=%s, 保留节点=%s",
+        file_name,
+        len(changed_pages),
+        len(stale_node_ids),
+        len(kept_node_ids),
+    )
+    return {
+        "changed_pages": changed_pages,
+        "stale_node_ids": stale_node_ids,
+        "kept_node_ids": kept_node_ids,
+        "kept_metadata": {node_id: previous[node_id] for node_id in kept_node_ids},
+        "page_hashes": dict(page_hashes),
+    }
+
+
+def delete_nodes(node_ids: List[str]) -> None:
+    """从 Chroma 与 BM25 中删除节点，并使查询缓存失效。"""
+    if not node_ids:
+        return
+    collection = getattr(get_vector_store(), "_collection", None)
+    file_names: Set[str] = set()
+    if collection is not None:
+        res = collection.get(ids=list(node_ids), include=["metadatas"])
+        file_names = {meta.get("file_name") for meta in res.get("metadatas") or [] if meta}
+        collection.delete(ids=list(node_ids))
+    get_bm25_store().delete_nodes(node_ids)
+    sync_registry(file_names)
+    bump_index_generation()
+    logger.info("已删除失效节点数: %s", len(node_ids))
+
+
+def delete_file_nodes(file_hash: str) -> int:
+    """删除某个文件版本（按 file_hash）的全部节点，用于清理中断的批量入库。"""
+    collection = getattr(get_vector_store(), "_collection", None)
     if collection is None:
-        return set()
-    try:
-        res = collection.get(include=["metadatas"])
-        metadatas = res.get("metadatas") or []
-        names: Set[str] = set()
-        for meta in metadatas:
-            if not meta:
-                continue
-            # chroma 返回可能是列表（batched），也可能是字典
-            if isinstance(meta, list):
-                metas = meta
-            else:
-                metas = [meta]
-            for m in metas:
-                if isinstance(m, dict):
-                    name = m.get("file_name")
-                    if name:
-                        names.add(name)
-        logger.info("已索引文件数: %s", len(names))
-        return names
-    except Exception as exc:
-        logger.warning("读取已索引文件名失败: %s", exc)
-        return set()
+        return 0
+    node_ids = collection.get(where={"file_hash": file_hash}, include=[]).get("ids") or []
+    delete_nodes(node_ids)
+    return len(node_ids)
+
+
+def _restamp_nodes(updates: Dict[str, Dict[str, Any]]) -> None:
+    """批量改写节点元数据中的版本字段，{node_id: {file_hash, page_count}}。"""
+    collection = getattr(get_vector_store(), "_collection", None)
+    if collection is None or not updates:
+        return
+    res = collection.get(ids=list(updates), include=["metadatas"])
+    ids = res.get("ids") or []
+    metadatas = [dict(meta or {}, **updates[node_id]) for node_id, meta in zip(ids, res.get("metadatas") or [])]
+    if ids:
+        collection.update(ids=ids, metadatas=metadatas)
+        sync_registry(meta.get("file_name") for meta in metadatas)
+
+
+def apply_file_revision(file_hash: str, revision: Dict[str, Any]) -> None:
+    """
+    修订版新节点写入成功后调用：先把保留节点的 file_hash/page_count 更新为新版本，使新版本完整，再删除失效节点。
+    revision 为 plan_file_revision 的返回值。
+    """
+    version = {"file_hash": file_hash, "page_count": len(revision["page_hashes"])}
+    _restamp_nodes({node_id: version for node_id in revision["kept_node_ids"]})
+    stale_node_ids = revision["stale_node_ids"]
+    collection = getattr(get_vector_store(), "_collection", None)
+    if collection is not None and stale_node_ids:
+        # 节点 id 由文件名、页码与切片文本决定，变化页中文本未变的切片已被新版本同 id 覆盖，不能再删除
+        res = collection.get(ids=list(stale_node_ids), include=["metadatas"])
+        stale_node_ids = [
+            node_id
+            for node_id, meta in zip(res.get("ids") or [], res.get("metadatas") or [])
+            if (meta or {}).get("file_hash") != file_hash
+        ]
+    delete_nodes(stale_node_ids)
+
+
+def rollback_file_revision(file_hash: str, revision: Optional[Dict[str, Any]] = None) -> None:
+    """写入失败时回滚某个文件版本：保留节点恢复原 file_hash/page_count，再删除已写入的新版本节点。"""
+    if revision is not None:
+        _restamp_nodes(revision.get("kept_metadata") or {})
+    delete_file_nodes(file_hash)
 
 
 @st.cache_resource(show_spinner=False)
@@ -122,20 +339,251 @@ def init_global_settings() -> None:
     """统一配置全局 Settings，避免每次重复设定。"""
     Settings.llm = get_llm()
     Settings.embed_model = get_embedding_model()
-    Settings.chunk_size = 1024
-    Settings.chunk_overlap = 100
+    if config.model_config.chunk_strategy == "structure":
+        # 结构化切分器按字符上限切分，没有 chunk_size/chunk_overlap 属性，不能再设置这两项
+        Settings.node_parser = RegulationNodeParser(
+            max_chars=config.model_config.chunk_max_chars,
+            min_chars=config.model_config.chunk_min_chars,
+        )
+        Settings.transformations = [Settings.node_parser]
+    else:
+        Settings.chunk_size = 1024
+        Settings.chunk_overlap = 100
+
+
+MAX_CACHED_ENGINES = 32  # 不同检索范围各占一个查询引擎，超出后淘汰最早创建的
+
+
+class _QueryEngineCache:
+    """进程级查询引擎缓存：按 (索引代数, top-k 参数) 复用检索器与合成器，入库后整体失效。"""
+
+    def __init__(self) -> None:
+        self.generation = 0
+        self.index: VectorStoreIndex | None = None
+        self.engines: Dict[Tuple[int, int, int, bool, RetrievalFilters], RetrieverQueryEngine] = {}
+        self.lock = threading.Lock()
+
+
+@st.cache_resource(show_spinner=False)
+def _get_query_engine_cache() -> _QueryEngineCache:
+    return _QueryEngineCache()
+
+
+def refresh_external_changes() -> bool:
+    """
+    其他进程（如 bulk_ingest.py）写入索引后，把 BM25 变更合并到本进程并递增索引代数，
+    使查询引擎、答案缓存与重排缓存失效；无变化时只做文件状态比较。
+    """
+    if not get_bm25_store().refresh():
+        return False
+    bump_index_generation()
+    return True
+
+
+def get_index_generation() -> int:
+    """返回当前索引代数；每次入库后递增。"""
+    return _get_query_engine_cache().generation
+
+
+def bump_index_generation() -> int:
+    """索引内容变化后调用：递增代数并丢弃已缓存的索引与查询引擎。"""
+    cache = _get_query_engine_cache()
+    with cache.lock:
+        cache.generation += 1
+        cache.index = None
+        cache.engines.clear()
+        generation = cache.generation
+    get_answer_cache().clear()
+    get_rerank_cache().clear()
+    logger.info("索引代数递增为 %s，查询引擎、答案缓存与重排缓存已清空", generation)
+    return generation
+
+
+@st.cache_resource(show_spinner=False)
+def get_answer_cache() -> SemanticAnswerCache:
+    """跨会话共享的语义答案缓存。"""
+    return SemanticAnswerCache(
+        threshold=config.model_config.answer_cache_threshold,
+        max_entries=config.model_config.answer_cache_max_entries,
+        ttl_seconds=config.model_config.answer_cache_ttl_seconds,
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_rerank_cache() -> RerankScoreCache:
+    """跨会话共享的 (query, node_id) 重排得分缓存。"""
+    return RerankScoreCache(max_entries=config.model_config.rerank_cache_max_entries)
+
+
+@st.cache_resource(show_spinner=False)
+def get_reranker() -> CrossEncoderReranker:
+    """加载交叉编码器重排模型（默认 CPU）。"""
+    return CrossEncoderReranker(
+        model_name=config.model_config.rerank_model_name,
+        top_n=config.model_config.rerank_top_n,
+        batch_size=config.model_config.rerank_batch_size,
+        device=config.model_config.rerank_device,
+        cache=get_rerank_cache(),
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """跨会话共享的查询向量缓存（键含模型标识：后端 + 模型，换模型或切换后端自动失效）。"""
+    return QueryEmbeddingCache(
+        model_name=embedding_model_id(),
+        max_entries=config.model_config.query_embedding_cache_max_entries,
+        db_path=config.QUERY_EMBED_CACHE_PATH if config.model_config.query_embedding_cache_persist else None,
+        disk_max_entries=config.model_config.query_embedding_cache_disk_max_entries,
+    )
+
+
+def embed_query(query: str) -> List[float]:
+    """计算查询向量；开启查询向量缓存时相同问题直接复用。"""
+    if not config.model_config.query_embedding_cache_enabled:
+        return get_embedding_model().get_query_embedding(query)
+    return get_query_embedding_cache().get_or_compute(query, get_embedding_model().get_query_embedding)
+
+
+def lookup_cached_answer(
+    query: str, filters: Optional[RetrievalFilters] = None
+) -> Tuple[Optional[CachedAnswer], Optional[List[float]]]:
+    """
+    查询语义答案缓存（只匹配相同检索范围下的答案），返回 (命中条目或 None, 查询向量)。
+    查询向量可在未命中时传给 cache_answer，避免重复计算。
+    """
+    if not config.model_config.answer_cache_enabled:
+        return None, None
+    refresh_external_changes()  # 其他进程入库后旧答案可能已过期
+    embedding = embed_query(query)
+    return get_answer_cache().lookup(embedding, scope=filters.describe() if filters else ""), embedding
+
+
+def cache_answer(
+    query: str,
+    answer: str,
+    sources: List[Dict[str, Any]],
+    latency: float,
+    embedding: Optional[List[float]] = None,
+    filters: Optional[RetrievalFilters] = None,
+) -> None:
+    """将新生成的答案写入语义缓存（空答案不缓存），按检索范围区分。"""
+    if not config.model_config.answer_cache_enabled or not answer:
+        return
+    if embedding is None:
+        embedding = embed_query(query)
+    get_answer_cache().put(query, embedding, answer, sources, latency, scope=filters.describe() if filters else "")
+
+
+def split_documents(documents: List[Document], show_progress: bool = True) -> List[BaseNode]:
+    """按全局切分配置把文档切成节点；Chroma 与 BM25 写入同一批节点（相同 node_id），融合时可正确去重。"""
+    init_global_settings()
+    return run_transformations(documents, Settings.transformations, show_progress=show_progress)
+
+
+def embedding_model_id() -> str:
+    """切片向量库的模型标识：后端 + 模型目录名（ONNX 另含是否量化），同一标识下的向量可互换。"""
+    cfg = config.model_config
+    if cfg.embedding_backend == "onnx":
+        return f"onnx:{Path(cfg.embedding_onnx_dir).name}:{'int8' if cfg.embedding_onnx_quantized else 'fp32'}"
+    return f"{cfg.embedding_backend}:{Path(cfg.embedding_model_name).name}"
+
+
+@st.cache_resource(show_spinner=False)
+def get_embedding_store() -> EmbeddingStore:
+    """内容寻址的切片向量库（float16 memmap），按模型标识分目录。"""
+    store = EmbeddingStore(config.EMBED_STORE_DIR, embedding_model_id())
+    logger.info("切片向量库: %s, 已有向量 %s 条", store.dir, len(store))
+    return store
+
+
+def embed_texts(texts: List[str], embed_model: Optional[BaseEmbedding] = None) -> List[List[float]]:
+    """
+    入库向量化：先查切片向量库，只对未命中的文本调用嵌入模型，并把新向量写回向量库。
+    embed_model 缺省为共享的 get_embedding_model()；须与其为同一模型（切片向量库按模型标识分目录）。
+    """
+    embed_model = embed_model or get_embedding_model()
+    if not config.model_config.embedding_store_enabled:
+        return embed_model.get_text_embedding_batch(texts)
+    store = get_embedding_store()
+    embeddings = store.get_many(texts)
+    missing = [idx for idx, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        computed = embed_model.get_text_embedding_batch([texts[idx] for idx in missing])
+        store.put_many([texts[idx] for idx in missing], computed)
+        for idx, embedding in zip(missing, computed):
+            embeddings[idx] = embedding
+    logger.debug("切片向量库: 命中 %s, 计算 %s", len(texts) - len(missing), len(missing))
+    return embeddings
+
+
+def embed_nodes(nodes: List[BaseNode]) -> None:
+    """成批计算节点向量（与 VectorStoreIndex 一致，使用 EMBED 元数据模式），优先复用切片向量库。"""
+    if not nodes:
+        return
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+    for node, embedding in zip(nodes, embed_texts(texts)):
+        node.embedding = embedding
+
+
+def _after_nodes_written(nodes: List[BaseNode], bm25_store: BM25Store) -> None:
+    bm25_store.add_nodes(nodes)
+    sync_registry(node.metadata.get("file_name") for node in nodes)
+    bump_index_generation()
+
+
+def upsert_nodes(nodes: List[BaseNode], batch_size: int = 1000) -> None:
+    """将已向量化的节点批量 upsert 到 Chroma（同 id 覆盖，重跑幂等），并写入 BM25 索引。"""
+    if not nodes:
+        return
+    # 先取 BM25 存储：首次加载时若为空会从 Chroma 回填，须在写入 Chroma 之前完成
+    bm25_store = get_bm25_store()
+    upsert_chroma(get_vector_store()._collection, nodes, batch_size)
+    _after_nodes_written(nodes, bm25_store)
+
+
+def index_nodes(
+    nodes: List[BaseNode],
+    upsert_batch: Optional[int] = None,
+    embed_batch_chars: Optional[int] = None,
+    embed_model: Optional[BaseEmbedding] = None,
+) -> StageStats:
+    """
+    向量化并写入节点（Chroma + BM25）：按长度排序自适应成批向量化，同时把已完成的批 upsert 到 Chroma。
+    返回 embed / write 两阶段的耗时统计。
+
+    Args:
+        upsert_batch: 单次 Chroma upsert 的块数，缺省取 model_config.index_upsert_batch
+        embed_batch_chars: 每次向量化调用的字符预算，缺省取 model_config.index_embed_batch_chars
+        embed_model: 本次写入使用的嵌入模型（如批量入库按命令行参数单独构造），缺省为共享模型
+    """
+    stats = StageStats()
+    if not nodes:
+        return stats
+    bm25_store = get_bm25_store()  # 须在写入 Chroma 之前加载（为空时从 Chroma 回填）
+    collection = get_vector_store()._collection
+    upsert_batch = upsert_batch or config.model_config.index_upsert_batch
+    writer = BulkIndexWriter(
+        embed_fn=lambda texts: embed_texts(texts, embed_model),
+        write_fn=lambda chunk: upsert_chroma(collection, chunk, upsert_batch),
+        max_batch_items=config.model_config.index_embed_batch_items,
+        max_batch_chars=embed_batch_chars or config.model_config.index_embed_batch_chars,
+        write_batch=upsert_batch,
+    )
+    stats = writer.write(nodes)
+    _after_nodes_written(nodes, bm25_store)
+    if config.model_config.embedding_store_enabled:
+        logger.info("切片向量库统计: %s", get_embedding_store().stats())
+    return stats
 
 
 def build_or_refresh_index(documents: List[Document]) -> VectorStoreIndex:
-    """向量化文档并写入 Chroma，返回索引实例。"""
+    """切分文档，向量化写入 Chroma，并将同一批节点增量写入 BM25 索引，返回索引实例。"""
     init_global_settings()
     logger.info("开始构建/刷新索引，文档数: %s", len(documents))
-    storage_context = StorageContext.from_defaults(vector_store=get_vector_store())
-    return VectorStoreIndex.from_documents(
-        documents,
-        storage_context=storage_context,
-        show_progress=True,
-    )
+    nodes = split_documents(documents)
+    index_nodes(nodes)
+    return VectorStoreIndex.from_vector_store(vector_store=get_vector_store(), embed_model=get_embedding_model())
 
 
 def load_index() -> VectorStoreIndex:
@@ -147,16 +595,57 @@ def load_index() -> VectorStoreIndex:
     )
 
 
+def get_regulation_catalog() -> List[Dict[str, Any]]:
+    """已索引文件的检索范围选项：文件名、由文件名解析的法规系列与版本、页数（同名多版本取最大）。"""
+    catalog: Dict[str, Dict[str, Any]] = {}
+    for doc in get_doc_registry().documents():
+        entry = catalog.get(doc.file_name)
+        if entry is None:
+            family, version = parse_regulation_name(doc.file_name)
+            catalog[doc.file_name] = {
+                "file_name": doc.file_name,
+                "family": family,
+                "version": version,
+                "page_count": doc.page_count,
+            }
+        else:
+            entry["page_count"] = max(entry["page_count"], doc.page_count)
+    return sorted(catalog.values(), key=lambda item: (item["family"], item["version"], item["file_name"]))
+
+
+def resolve_filter_files(filters: Optional[RetrievalFilters]) -> Optional[Set[str]]:
+    """按 文件名/系列/版本 条件选出已索引文件；没有文件级条件时返回 None（不限）。"""
+    if filters is None:
+        return None
+    return filters.resolve_files(get_exist_file_names())
+
+
 def get_hybrid_retriever(
     index: VectorStoreIndex,
     documents: List[Document],
     bm25_top_k: int = 4,
     vector_top_k: int = 4,
+    filters: Optional[RetrievalFilters] = None,
 ) -> QueryFusionRetriever | Any:
     """
     构造 BM25 + 向量的混合检索。
-    BM25 使用原始文档（适合专有名词），向量检索来自 Chroma。
+    BM25 默认使用持久化倒排索引（适合专有名词）；显式传入 documents 时临时基于这些文档构建。
+    向量检索来自 Chroma。
+    filters 限定检索范围：向量检索下推为 Chroma where 子句，BM25 只对范围内的节点计分。
     """
+    files: Optional[Set[str]] = None
+    if filters is not None and not filters.is_empty():
+        if documents:
+            files = filters.resolve_files({doc.metadata.get("file_name") for doc in documents})
+            documents = [doc for doc in documents if filters.matches(doc.metadata, files)]
+        else:
+            files = resolve_filter_files(filters)
+        if files is not None and not files:
+            raise ValueError(f"没有符合检索范围的已索引文件：{filters.describe()}")
+        logger.info("检索范围: %s（%s 个文件）", filters.describe(), "不限" if files is None else len(files))
+    else:
+        filters = None
+
     retrievers = []
     if documents:
         bm25 = BM25Retriever.from_defaults(
@@ -165,14 +654,34 @@ def get_hybrid_retriever(
             language="zh",
         )
         retrievers.append(bm25)
-
-    vector_retriever = index.as_retriever(similarity_top_k=vector_top_k)
+    else:
+        bm25_store = get_bm25_store()
+        if len(bm25_store) > 0:
+            metadata_filter = None
+            if filters is not None:
+                metadata_filter = lambda metadata: filters.matches(metadata, files)
+            retrievers.append(
+                PersistentBM25Retriever(bm25_store, similarity_top_k=bm25_top_k, metadata_filter=metadata_filter)
+            )
+
+    vector_retriever = index.as_retriever(
+        similarity_top_k=vector_top_k,
+        filters=filters.to_metadata_filters(files) if filters is not None else None,
+    )
     retrievers.append(vector_retriever)
 
     if len(retrievers) == 1:
-        # 仅向量检索（无 BM25 文档时）
+        # 仅向量检索（BM25 索引为空时）
         return vector_retriever
 
+    if config.model_config.parallel_retrieval:
+        return ParallelHybridRetriever(
+            retrievers[0],
+            vector_retriever,
+            embed_fn=embed_query,
+            similarity_top_k=max(bm25_top_k, vector_top_k),
+        )
+
     return QueryFusionRetriever(
         retrievers=retrievers,
         similarity_top_k=max(bm25_top_k, vector_top_k),
@@ -182,18 +691,116 @@ def get_hybrid_retriever(
     )
 
 
-def as_query_engine(
+def _build_query_engine(
+    index: VectorStoreIndex,
     documents: List[Document],
-    bm25_top_k: int = 4,
-    vector_top_k: int = 4,
+    bm25_top_k: int,
+    vector_top_k: int,
+    streaming: bool,
+    filters: Optional[RetrievalFilters] = None,
 ) -> RetrieverQueryEngine:
-    """构建带混合检索的 QueryEngine。"""
-    index = load_index()
-    retriever = get_hybrid_retriever(index, documents, bm25_top_k, vector_top_k)
-    response_synthesizer = get_response_synthesizer(streaming=False)
+    node_postprocessors = []
+    if config.model_config.rerank_enabled:
+        # 扩大召回候选池，由交叉编码器挑出最相关的少量片段
+        candidate_k = config.model_config.rerank_candidate_k
+        bm25_top_k, vector_top_k = max(bm25_top_k, candidate_k), max(vector_top_k, candidate_k)
+        node_postprocessors.append(get_reranker())
+    retriever = get_hybrid_retriever(index, documents, bm25_top_k, vector_top_k, filters)
+    response_synthesizer = get_response_synthesizer(streaming=streaming)
     return RetrieverQueryEngine(
         retriever=retriever,
         response_synthesizer=response_synthesizer,
+        node_postprocessors=node_postprocessors,
+    )
+
+
+def as_query_engine(
+    documents: List[Document],
+    bm25_top_k: int = 4,
+    vector_top_k: int = 4,
+    streaming: bool = False,
+    filters: Optional[RetrievalFilters] = None,
+) -> RetrieverQueryEngine:
+    """
+    构建带混合检索的 QueryEngine。
+    使用持久化 BM25（documents 为空）时返回缓存的长生命周期实例，仅在入库后重建；
+    显式传入 documents 时按需临时构建，不进入缓存。
+    streaming=True 时 query() 在检索完成后立即返回 StreamingResponse，答案 token 边生成边产出。
+    开启 rerank_enabled 时召回 rerank_candidate_k 个候选，经交叉编码器重排后只保留 rerank_top_n 个。
+    filters 限定检索范围（文件名/法规系列/版本/页码），每种范围各缓存一个查询引擎。
+    """
+    filters = filters or RetrievalFilters()
+    if documents:
+        return _build_query_engine(load_index(), documents, bm25_top_k, vector_top_k, streaming, filters)
+
+    refresh_external_changes()
+    cache = _get_query_engine_cache()
+    with cache.lock:
+        key = (cache.generation, bm25_top_k, vector_top_k, streaming, filters)
+        engine = cache.engines.get(key)
+        if engine is None:
+            if cache.index is None:
+                cache.index = load_index()
+            engine = _build_query_engine(cache.index, [], bm25_top_k, vector_top_k, streaming, filters)
+            while len(cache.engines) >= MAX_CACHED_ENGINES:
+                cache.engines.pop(next(iter(cache.engines)))  # 丢弃最早创建的检索范围
+            cache.engines[key] = engine
+            logger.info(
+                "新建查询引擎: generation=%s, bm25_top_k=%s, vector_top_k=%s, streaming=%s, 范围=%s",
+                *key[:4],
+                filters.describe() or "全部",
+            )
+    return engine
+
+
+async def aquery(
+    query: str,
+    streaming: bool = False,
+    query_embedding: Optional[List[float]] = None,
+    filters: Optional[RetrievalFilters] = None,
+) -> Tuple[RESPONSE_TYPE, RetrievalTimings]:
+    """
+    异步查询：BM25 与 向量化+Chroma 检索并发执行，返回 (响应, 检索阶段耗时)。
+    query_embedding 为答案缓存查找时已算好的查询向量，传入时跳过重复向量化。
+    streaming=True 时检索完成即返回 StreamingResponse，token 仍由 iter_response_tokens 同步产出。
+    filters 限定检索范围，见 get_hybrid_retriever。
+    """
+    engine = as_query_engine([], streaming=streaming, filters=filters)
+    if query_embedding is None and not isinstance(engine.retriever, ParallelHybridRetriever):
+        # 其他检索器内部直接调用嵌入模型；先经缓存取得查询向量（并行检索器在线程中自行取用）
+        query_embedding = embed_query(query)
+    query_bundle = QueryBundle(query_str=query, embedding=query_embedding)
+    timings = track_retrieval_timings()
+    started = time.perf_counter()
+    nodes = await engine.aretrieve(query_bundle)
+    timings.total = time.perf_counter() - started
+    # 检索器以外的耗时即重排（node_postprocessors）耗时
+    timings.rerank = max(0.0, timings.total - timings.parallel - timings.fusion) if timings.parallel else 0.0
+    logger.info("检索阶段耗时: %s", timings.as_dict())
+    if streaming:
+        response = engine.synthesize(query_bundle, nodes)
+    else:
+        response = await engine.asynthesize(query_bundle, nodes)
+    return response, timings
+
+
+def iter_response_tokens(response, started_at: float) -> Iterator[str]:
+    """
+    逐个产出流式响应的 token，并记录首 token 耗时(TTFT)与总耗时。
+    started_at 为提交查询时的 time.perf_counter()。
+    """
+    first_token_at = None
+    token_count = 0
+    for token in response.response_gen:
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+            logger.info("首 token 耗时(TTFT): %.2fs", first_token_at - started_at)
+        token_count += 1
+        yield token
+    logger.info(
+        "流式生成完成: token 数=%s, 总耗时=%.2fs",
+        token_count,
+        time.perf_counter() - started_at,
     )
 
 
@@ -0,0 +1,53 @@
+"""语义答案缓存：相似度阈值、TTL 过期、LRU 淘汰与检索范围隔离。"""
+import time
+
+from engines.retrieval import answer_cache
+from engines.retrieval.answer_cache import SemanticAnswerCache
+
+
+def _put(cache, query, embedding, scope=""):
+    cache.put(query, embedding, f"答案:{query}", [{"file": "a.pdf", "page": 1}], latency=2.0, scope=scope)
+
+
+def test_lookup_respects_similarity_threshold():
+    cache = SemanticAnswerCache(threshold=0.95)
+    _put(cache, "假人如何摆放", [1.0, 0.0])
+    hit = cache.lookup([0.99, 0.05])
+    assert hit is not None and hit.answer == "答案:假人如何摆放"
+    assert 0.95 <= hit.similarity <= 1.0
+    assert cache.lookup([0.7, 0.7]) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert cache.stats()["saved_seconds"] == 2.0
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    _put(cache, "q", [1.0, 0.0])
+    now = [time.time() + 59]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    assert cache.lookup([1.0, 0.0]) is not None
+    now[0] += 2
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = SemanticAnswerCache(max_entries=2)
+    _put(cache, "a", [1.0, 0.0, 0.0])
+    _put(cache, "b", [0.0, 1.0, 0.0])
+    assert cache.lookup([1.0, 0.0, 0.0]).query == "a"  # a 变为最近使用
+    _put(cache, "c", [0.0, 0.0, 1.0])
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0, 0.0]).query == "a"
+    assert cache.lookup([0.0, 0.0, 1.0]).query == "c"
+
+
+def test_answers_are_isolated_by_scope():
+    cache = SemanticAnswerCache()
+    _put(cache, "全库", [1.0, 0.0])
+    _put(cache, "仅 GB", [1.0, 0.0], scope="family=GB")
+    assert cache.lookup([1.0, 0.0]).query == "全库"
+    assert cache.lookup([1.0, 0.0], scope="family=GB").query == "仅 GB"
+    assert cache.lookup([1.0, 0.0], scope="family=ECE") is None
+    cache.clear()
+    assert cache.lookup([1.0, 0.0]) is None
@@ -0,0 +1,44 @@
+"""公式/表格开关：关闭的块类型不做 VLM 内容识别，改从文本层按 bbox 取文字或直接丢弃。"""
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from engines.ocr_by_vlm.local_parser import MinerUParser
+from engines.ocr_by_vlm.text_layer import TextLayer
+
+
+def test_skipped_block_types_follow_toggles():
+    parser = MinerUParser(use_cache=False)
+    assert parser._skipped_block_types(table_enable=True, formula_enable=True) == []
+    assert parser._skipped_block_types(table_enable=False, formula_enable=False) == ["table", "equation"]
+    settings = parser._cache_settings(["table"])
+    assert settings["not_extract"] == ["table"]
+    # 开关不同的解析结果不共用缓存
+    assert settings != parser._cache_settings([])
+
+
+def test_fill_skipped_blocks_from_text_layer(tmp_path):
+    pdf_path = tmp_path / "table.pdf"
+    doc = fitz.open()
+    page = doc.new_page(width=200, height=200)
+    page.insert_text((20, 50), "M1 category", fontsize=10)
+    doc.save(str(pdf_path))
+    doc.close()
+
+    parser = MinerUParser(use_cache=False)
+    blocks = [
+        {"type": "text", "bbox": [0.0, 0.0, 1.0, 0.1], "content": "正文"},
+        {"type": "table", "bbox": [0.0, 0.1, 1.0, 0.4], "content": None},
+        {"type": "equation", "bbox": [0.0, 0.6, 1.0, 0.9], "content": None},
+    ]
+    layer = TextLayer(str(pdf_path))
+    try:
+        filled = parser._fill_skipped_blocks([dict(b) for b in blocks], 1, ["table", "equation"], layer)
+    finally:
+        layer.close()
+    # 表格区域有文本层文字，保留并标记来源；公式区域为空白，丢弃
+    assert [block["type"] for block in filled] == ["text", "table"]
+    assert filled[1]["content"] == "M1 category" and filled[1]["content_source"] == "text_layer"
+
+    dropped = parser._fill_skipped_blocks([dict(b) for b in blocks], 1, ["table", "equation"], None)
+    assert [block["type"] for block in dropped] == ["text"]
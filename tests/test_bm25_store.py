@@ -0,0 +1,74 @@
+"""BM25 持久化：追加日志、快照合并与崩溃后的日志恢复。"""
+from llama_index.core.schema import TextNode
+
+from engines.retrieval import bm25_store
+from engines.retrieval.bm25_store import BM25Store
+
+
+def _node(node_id: str, text: str) -> TextNode:
+    return TextNode(id_=node_id, text=text, metadata={"file_name": "a.pdf", "page_number": 1})
+
+
+def test_add_appends_log_without_rewriting_snapshot(tmp_path):
+    store = BM25Store(tmp_path)
+    store.add_nodes([_node("n1", "正面碰撞试验速度"), _node("n2", "儿童约束系统")], persist=False)
+    store.save()
+    snapshot = store.index_path.read_bytes()
+
+    store.add_nodes([_node("n3", "侧面碰撞 评分")])
+    store.delete_nodes(["n1"])
+    assert store.index_path.read_bytes() == snapshot
+    assert store.log_path.stat().st_size > 0
+
+    reloaded = BM25Store(tmp_path).load()
+    assert len(reloaded) == 2
+    assert reloaded.get_node("n1") is None
+    assert reloaded.search("侧面碰撞", top_k=1)[0][0] == "n3"
+
+
+def test_large_log_is_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(bm25_store, "COMPACT_MIN_BYTES", 0)
+    store = BM25Store(tmp_path)
+    store.add_nodes([_node("n1", "正面碰撞试验速度")])
+    store.add_nodes([_node("n2", "儿童约束系统")])
+    assert store.log_path.stat().st_size == 0
+    assert len(BM25Store(tmp_path).load()) == 2
+
+
+def test_torn_log_tail_is_ignored(tmp_path):
+    store = BM25Store(tmp_path)
+    store.add_nodes([_node("n1", "正面碰撞试验速度")])
+    with store.log_path.open("ab") as f:
+        f.write(b"\x80\x05\x95garbage")
+
+    reloaded = BM25Store(tmp_path).load()
+    assert len(reloaded) == 1
+    reloaded.add_nodes([_node("n2", "儿童约束系统")])
+    assert len(BM25Store(tmp_path).load()) == 2
+
+
+def test_writers_sharing_a_directory_do_not_lose_updates(tmp_path, monkeypatch):
+    monkeypatch.setattr(bm25_store, "COMPACT_MIN_BYTES", 0)
+    app = BM25Store(tmp_path).load()
+    app.add_nodes([_node("n1", "正面碰撞试验速度")])
+    cli = BM25Store(tmp_path).load()
+    cli.add_nodes([_node("n2", "儿童约束系统")])
+
+    # 应用持有的旧副本写入前先合并 CLI 的写入（CLI 已合并快照，应用须整体重新加载）
+    app.add_nodes([_node("n3", "侧面碰撞 评分")])
+    assert len(BM25Store(tmp_path).load()) == 3
+    assert cli.refresh()
+    assert len(cli) == 3
+    assert not cli.refresh()
+
+
+def test_refresh_replays_only_new_log_records(tmp_path):
+    app = BM25Store(tmp_path).load()
+    app.add_nodes([_node("n1", "正面碰撞试验速度")])
+    cli = BM25Store(tmp_path).load()
+    cli.add_nodes([_node("n2", "儿童约束系统")])
+    cli.delete_nodes(["n1"])
+
+    assert app.refresh()
+    assert app.get_node("n1") is None
+    assert app.search("儿童约束", top_k=1)[0][0] == "n2"
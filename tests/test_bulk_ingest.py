@@ -0,0 +1,51 @@
+"""批量入库：单个文件失败不中断整批，命令行批大小不改动共享嵌入模型。"""
+from concurrent.futures import Future
+
+from llama_index.core import Document
+from llama_index.core.embeddings import MockEmbedding
+
+import bulk_ingest
+import rag_engine
+from engines.embedding.batching import DynamicBatchingEmbedding
+from engines.ingest.checkpoint import IngestCheckpoint
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def test_collect_marks_failed_file_and_keeps_going(tmp_path, monkeypatch):
+    def split(docs, show_progress=True):
+        if docs[0].metadata["file_name"] == "bad.pdf":
+            raise ValueError("boom")
+        return [object()] * len(docs)
+
+    monkeypatch.setattr(rag_engine, "split_documents", split)
+    checkpoint = IngestCheckpoint(tmp_path / "checkpoint.json")
+    ingestor = bulk_ingest.BulkIngestor(checkpoint, workers=1, write_batch=100, upsert_batch=10)
+
+    bad = [Document(text="x", metadata={"file_name": "bad.pdf", "page_number": 1})]
+    good = [Document(text="y", metadata={"file_name": "good.pdf", "page_number": 1})]
+    ingestor._collect(_done((bad, None, 0.1)), tmp_path / "bad.pdf", "hash-bad")
+    ingestor._collect(_done((good, None, 0.1)), tmp_path / "good.pdf", "hash-good")
+
+    assert "hash-bad" in checkpoint.failed and "hash-bad" not in checkpoint.in_progress
+    assert "hash-good" in checkpoint.in_progress
+    assert ingestor.stats.failed == 1
+    assert [entry[0] for entry in ingestor._buffer_files] == ["hash-good"]
+
+
+def test_build_embedding_model_leaves_shared_model_untouched(monkeypatch):
+    shared = DynamicBatchingEmbedding(MockEmbedding(embed_dim=4), max_batch_items=64)
+    monkeypatch.setattr(rag_engine, "get_embedding_model", lambda: shared)
+    run_model = bulk_ingest.build_embedding_model(8)
+    assert run_model is not shared
+    assert run_model.max_batch_items == 8 and shared.max_batch_items == 64
+    assert run_model.inner is shared.inner
+
+    plain = MockEmbedding(embed_dim=4, embed_batch_size=10)
+    monkeypatch.setattr(rag_engine, "get_embedding_model", lambda: plain)
+    assert bulk_ingest.build_embedding_model(8).embed_batch_size == 8
+    assert plain.embed_batch_size == 10
@@ -0,0 +1,25 @@
+"""条款切分：短前文并入超长条款时的条款号与长度上限。"""
+from engines.ingest.chunker import split_regulation_markdown
+
+BODY = "车辆应按本条款要求进行试验，试验速度应为五十公里每小时" * 17 + "。"
+MARKDOWN = "\n".join([
+    "# 第 3 页",
+    "4 技术要求",
+    "4.1 一般要求",
+    "车辆应满足本章要求。" * 8,
+    "4.2 正面碰撞试验要求",
+    BODY,
+    BODY,
+])
+
+
+def test_folded_prefix_keeps_first_clause_and_respects_max_chars():
+    chunks = split_regulation_markdown(MARKDOWN, max_chars=500, min_chars=200)
+
+    assert all(len(chunk.text) <= 500 for chunk in chunks)
+    first = chunks[0]
+    assert first.text.startswith("4 技术要求\n4.1 一般要求")
+    assert (first.clause_id, first.clause_title, first.page_start) == ("4", "技术要求", 3)
+    assert all(chunk.clause_id == "4.2" for chunk in chunks[1:])
+    assert all(chunk.text.startswith("（续）4.2 正面碰撞试验要求") for chunk in chunks[1:])
+    assert "".join(chunk.text.split("\n", 1)[1] for chunk in chunks[1:]).endswith(BODY)
@@ -0,0 +1,57 @@
+"""HNSW 集合参数：新建集合写入参数，结构参数变化时重建集合并保留 ids、向量与元数据。"""
+from uuid import uuid4
+
+import chromadb
+import pytest
+
+from engines.ingest.collection import (
+    REBUILD_SUFFIX,
+    HnswParams,
+    current_params,
+    open_collection,
+    rebuild_collection,
+)
+
+
+@pytest.fixture
+def client():
+    client = chromadb.EphemeralClient()
+    yield client
+    for item in client.list_collections():
+        client.delete_collection(getattr(item, "name", item))
+
+
+def test_params_validation_and_rebuild_decision():
+    with pytest.raises(ValueError):
+        HnswParams(space="dot")
+    base = HnswParams()
+    assert not base.needs_rebuild(HnswParams(search_ef=200))
+    assert base.needs_rebuild(HnswParams(m=32))
+    assert base.needs_rebuild(HnswParams(space="cosine"))
+
+
+def test_open_collection_applies_params(client):
+    name = f"docs-{uuid4().hex[:8]}"
+    params = HnswParams(space="cosine", m=24, construction_ef=120, search_ef=80)
+    collection = open_collection(client, name, params)
+    actual = current_params(collection)
+    assert (actual.space, actual.m, actual.construction_ef) == ("cosine", 24, 120)
+
+
+def test_rebuild_keeps_vectors_and_metadata(client):
+    name = f"docs-{uuid4().hex[:8]}"
+    source = open_collection(client, name, HnswParams())
+    source.add(
+        ids=["a", "b", "c"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]],
+        metadatas=[{"file_name": "a.pdf"}, {"file_name": "b.pdf"}, {"file_name": "c.pdf"}],
+        documents=["甲", "乙", "丙"],
+    )
+    rebuilt = rebuild_collection(client, name, HnswParams(space="cosine", m=32), batch_size=2)
+    assert (current_params(rebuilt).space, current_params(rebuilt).m) == ("cosine", 32)
+    res = rebuilt.get(ids=["b"], include=["embeddings", "metadatas", "documents"])
+    assert list(res["embeddings"][0]) == [0.0, 1.0]
+    assert res["metadatas"][0] == {"file_name": "b.pdf"} and res["documents"][0] == "乙"
+    assert rebuilt.count() == 3
+    names = {getattr(item, "name", item) for item in client.list_collections()}
+    assert f"{name}{REBUILD_SUFFIX}" not in names
@@ -0,0 +1,75 @@
+"""CPU 嵌入后端：ONNX 输出 CLS 池化 + L2 归一化向量，int8 量化替换 Linear 层，模型标识区分后端。"""
+import sys
+from types import ModuleType, SimpleNamespace
+
+import numpy as np
+import pytest
+
+import config
+import rag_engine
+from engines.embedding import backends
+from engines.embedding.backends import OnnxEmbedding, create_embedding_model, quantize_int8
+
+
+class _FakeTokenizer:
+    @classmethod
+    def from_pretrained(cls, model_dir):
+        return cls()
+
+    def __call__(self, texts, padding, truncation, max_length, return_tensors):
+        ids = np.array([[len(text), 1] for text in texts], dtype=np.int32)
+        return {"input_ids": ids, "attention_mask": np.ones_like(ids), "token_type_ids": np.zeros_like(ids)}
+
+
+class _FakeSession:
+    """隐藏状态第 0 个 token 为 [len, 0, 3]，其余 token 为噪声。"""
+
+    def __init__(self, model_file, options, providers):
+        self.model_file = model_file
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, output_names, feeds):
+        assert set(feeds) == {"input_ids", "attention_mask"}  # 模型没有的输入不传
+        assert all(value.dtype == np.int64 for value in feeds.values())
+        lengths = feeds["input_ids"][:, 0].astype(np.float32)
+        cls = np.stack([lengths, np.zeros_like(lengths), np.full_like(lengths, 3.0)], axis=1)
+        return [np.stack([cls, np.full_like(cls, 9.0)], axis=1)]
+
+
+def test_onnx_embedding_uses_normalized_cls_vector(monkeypatch):
+    ort = pytest.importorskip("onnxruntime")
+    transformers = ModuleType("transformers")
+    transformers.AutoTokenizer = _FakeTokenizer
+    monkeypatch.setitem(sys.modules, "transformers", transformers)
+    monkeypatch.setattr(ort, "InferenceSession", _FakeSession)
+
+    model = OnnxEmbedding(model_dir="models/bge-m3-onnx", quantized=True)
+    assert model._session.model_file.endswith(backends.ONNX_QUANTIZED_MODEL_FILE)
+    vectors = model.get_text_embedding_batch(["abcd", "a"])
+    assert np.allclose(vectors[0], [0.8, 0.0, 0.6])
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert np.allclose(model.get_query_embedding("abcd"), vectors[0])
+
+
+def test_quantize_int8_replaces_linear_layers():
+    torch = pytest.importorskip("torch")
+    embedding = SimpleNamespace(_model=torch.nn.Sequential(torch.nn.Linear(4, 4), torch.nn.ReLU()))
+    quantize_int8(embedding)
+    assert type(embedding._model[0]).__module__.startswith("torch.ao.nn.quantized")
+    assert embedding._model(torch.ones(1, 4)).shape == (1, 4)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_embedding_model("tensorrt", model_name="models/bge-m3")
+
+
+def test_model_id_distinguishes_backends(monkeypatch):
+    ids = set()
+    for backend, quantized in (("hf", True), ("torch_int8", True), ("onnx", True), ("onnx", False)):
+        monkeypatch.setattr(config.model_config, "embedding_backend", backend)
+        monkeypatch.setattr(config.model_config, "embedding_onnx_quantized", quantized)
+        ids.add(rag_engine.embedding_model_id())
+    assert len(ids) == 4
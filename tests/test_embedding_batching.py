@@ -0,0 +1,60 @@
+"""按 token 长度动态分批：批内补齐后 token 与条数不超上限，向量按输入顺序返回。"""
+from typing import List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from engines.embedding.batching import DynamicBatchingEmbedding, padded_tokens, padding_report, plan_token_batches
+
+
+class _LengthEmbedding(BaseEmbedding):
+    """向量为 [文本长度]，记录每次前向的批。"""
+
+    calls: List[List[str]] = []
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return [float(len(query))]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return [float(len(text))]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def test_plan_token_batches_respects_token_and_item_caps():
+    lengths = [50, 3, 8, 200, 5, 7, 9, 60]
+    batches = plan_token_batches(lengths, max_batch_tokens=64, max_batch_items=3)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= 3
+        # 超长的单条独占一批，其余批补齐后不超过 token 上限
+        assert len(batch) == 1 or len(batch) * max(lengths[i] for i in batch) <= 64
+    assert [3] in batches
+    # 按长度升序分批
+    flat = [lengths[i] for batch in batches for i in batch]
+    assert flat == sorted(lengths)
+
+
+def test_dynamic_batching_wastes_less_padding_than_fixed():
+    lengths = [10, 500, 12, 480, 11, 490, 9, 510]
+    report = padding_report(lengths, batch_size=2, max_batch_tokens=1024, max_batch_items=8)
+    assert report["dynamic_waste"] < report["fixed_waste"]
+    assert report["dynamic_padded_tokens"] == padded_tokens(lengths, plan_token_batches(lengths, 1024, 8))
+
+
+def test_dynamic_batching_embedding_keeps_input_order():
+    inner = _LengthEmbedding(model_name="len")
+    inner.calls = []
+    model = DynamicBatchingEmbedding(inner, max_batch_tokens=12, max_batch_items=2, baseline_batch_size=4)
+    texts = ["aaaaaa", "b", "cccc", "dd", "eeeee"]
+    vectors = model.get_text_embedding_batch(texts)
+    assert vectors == [[6.0], [1.0], [4.0], [2.0], [5.0]]
+    # 无分词器时按字符数近似 token 数：短文本先成批，单批条数与补齐 token 受限
+    assert inner.calls == [["b", "dd"], ["cccc", "eeeee"], ["aaaaaa"]]
+    stats = model.padding_stats()
+    assert stats["texts"] == 5 and stats["batches"] == 3 and stats["real_tokens"] == 18
+    assert model.get_query_embedding("查询") == [2.0]
@@ -0,0 +1,19 @@
+"""查询向量缓存：磁盘条目超过上限一定比例后才成批淘汰最久未用的条目。"""
+from engines.retrieval.embedding_cache import QueryEmbeddingCache
+
+
+def _count(cache: QueryEmbeddingCache) -> int:
+    return cache._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+
+def test_disk_entries_are_evicted_in_batches(tmp_path):
+    cache = QueryEmbeddingCache("model-a", max_entries=4, db_path=tmp_path / "q.sqlite3", disk_max_entries=10)
+    for i in range(11):
+        cache.put(f"问题{i}", [float(i), 1.0])
+    assert _count(cache) == 11  # 未超过 10 × 1.1，不淘汰
+
+    cache.put("问题11", [11.0, 1.0])
+    assert _count(cache) == 10
+    reopened = QueryEmbeddingCache("model-a", db_path=tmp_path / "q.sqlite3", disk_max_entries=10)
+    assert reopened.get("问题0") is None
+    assert reopened.get("问题11") == [11.0, 1.0]
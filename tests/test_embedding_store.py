@@ -0,0 +1,39 @@
+"""切片向量库：多个写入方（应用与 bulk_ingest.py）共用同一目录时行号不冲突。"""
+import numpy as np
+
+from engines.embedding.store import INITIAL_CAPACITY, EmbeddingStore
+
+
+def _vectors(seed: int, count: int, dim: int = 8) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+
+def test_stale_writers_allocate_distinct_rows(tmp_path):
+    app = EmbeddingStore(tmp_path, "model-a")
+    cli = EmbeddingStore(tmp_path, "model-a")  # 打开时两者都看不到对方后续写入的行
+    app_texts = [f"app-{i}" for i in range(5)]
+    cli_texts = [f"cli-{i}" for i in range(INITIAL_CAPACITY + 10)]  # 迫使 cli 扩展文件
+    app.put_many(app_texts[:2], _vectors(0, 5)[:2])
+    cli.put_many(cli_texts, _vectors(1, len(cli_texts)))
+    app.put_many(app_texts, _vectors(0, 5))
+
+    reader = EmbeddingStore(tmp_path, "model-a")
+    assert len(reader) == len(app_texts) + len(cli_texts)
+    np.testing.assert_allclose(reader.get_many(app_texts), _vectors(0, 5), atol=1e-2)
+    np.testing.assert_allclose(reader.get_many(cli_texts), _vectors(1, len(cli_texts)), atol=1e-2)
+    assert len(set(reader._rows.values())) == len(reader)
+    # 旧实例写入时已同步对方的行，可直接读到
+    np.testing.assert_allclose(app.get_many(cli_texts[-1:]), _vectors(1, len(cli_texts))[-1:], atol=1e-2)
+
+
+def test_dimension_mismatch_rolls_back(tmp_path):
+    store = EmbeddingStore(tmp_path, "model-a")
+    store.put_many(["a"], _vectors(0, 1))
+    try:
+        store.put_many(["b"], _vectors(0, 1, dim=4))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("维度不一致应报错")
+    store.put_many(["c"], _vectors(2, 1))
+    assert len(EmbeddingStore(tmp_path, "model-a")) == 2
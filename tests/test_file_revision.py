@@ -0,0 +1,118 @@
+"""修订版增量入库：逐页哈希、修订计划与写入失败回滚。"""
+from types import SimpleNamespace
+from uuid import uuid4
+
+import chromadb
+import fitz
+import pytest
+from llama_index.core import Document
+
+import ingest
+import rag_engine
+import utils
+
+
+def _make_pdf(path, texts):
+    pdf = fitz.open()
+    for text in texts:
+        pdf.new_page().insert_text((72, 72), text)
+    pdf.save(path)
+    pdf.close()
+    return path
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = chromadb.EphemeralClient().create_collection(f"nodes-{uuid4().hex}")
+    monkeypatch.setattr(rag_engine, "get_vector_store", lambda: SimpleNamespace(_collection=collection))
+    monkeypatch.setattr(rag_engine, "get_bm25_store", lambda: SimpleNamespace(delete_nodes=lambda ids: None))
+    monkeypatch.setattr(rag_engine, "sync_registry", lambda names: None)
+    monkeypatch.setattr(rag_engine, "bump_index_generation", lambda: None)
+    return collection
+
+
+def _index_version(collection, file_name, file_hash, hashes, page_count=None):
+    """每页写入两个节点，模拟旧版本已入库。"""
+    ids, metadatas = [], []
+    for page, page_hash in hashes.items():
+        for part in range(2):
+            ids.append(f"{file_hash}-{page}-{part}")
+            metadatas.append(
+                {
+                    "file_name": file_name,
+                    "file_hash": file_hash,
+                    "page_number": page,
+                    "page_hash": page_hash,
+                    "page_count": page_count or len(hashes),
+                }
+            )
+    collection.add(ids=ids, metadatas=metadatas, embeddings=[[0.0, 1.0]] * len(ids))
+
+
+def test_plan_file_revision_only_touches_modified_page(tmp_path, collection):
+    v1 = utils.page_hashes(_make_pdf(tmp_path / "v1.pdf", ["one", "two", "three"]))
+    v2 = utils.page_hashes(_make_pdf(tmp_path / "v2.pdf", ["one", "TWO", "three"]))
+    assert v1[1] == v2[1] and v1[3] == v2[3] and v1[2] != v2[2]
+
+    _index_version(collection, "reg.pdf", "old", v1)
+    plan = rag_engine.plan_file_revision("reg.pdf", v2)
+    assert plan["changed_pages"] == [2]
+    assert sorted(plan["stale_node_ids"]) == ["old-2-0", "old-2-1"]
+    assert sorted(plan["kept_node_ids"]) == ["old-1-0", "old-1-1", "old-3-0", "old-3-1"]
+    assert {meta["file_hash"] for meta in plan["kept_metadata"].values()} == {"old"}
+
+
+def test_revalidate_revision_parses_pages_changed_after_planning(tmp_path, collection, monkeypatch):
+    v1 = utils.page_hashes(_make_pdf(tmp_path / "v1.pdf", ["one", "two", "three"]))
+    path = _make_pdf(tmp_path / "reg.pdf", ["one", "TWO", "three"])
+    plan = {"changed_pages": [1, 2, 3], "stale_node_ids": [], "kept_node_ids": [], "page_hashes": utils.page_hashes(path)}
+    docs = [Document(text=f"p{page}", metadata={"page_number": page}) for page in (1, 2, 3)]
+    # 解析期间另一个任务写入了旧版本：只有第 2 页仍需写入
+    _index_version(collection, "reg.pdf", "old", v1)
+    monkeypatch.setattr(ingest, "_parse_pages", lambda file_path, pages: pytest.fail("不应重新解析"))
+    docs, revision = ingest.revalidate_revision(path, docs, plan)
+    assert [doc.metadata["page_number"] for doc in docs] == [2]
+    assert revision["changed_pages"] == [2]
+
+    # 已计划的旧版本被删除：整份文件按新文件写入，缺失的页补充解析
+    collection.delete(ids=collection.get()["ids"])
+    monkeypatch.setattr(
+        ingest,
+        "_parse_pages",
+        lambda file_path, pages: [Document(text=f"p{page}", metadata={"page_number": page}) for page in pages],
+    )
+    docs, revision = ingest.revalidate_revision(path, docs, plan)
+    assert revision is None
+    assert sorted(doc.metadata["page_number"] for doc in docs) == [1, 2, 3]
+
+
+def test_rollback_restores_kept_nodes_and_removes_new_version(tmp_path, collection):
+    v1 = utils.page_hashes(_make_pdf(tmp_path / "v1.pdf", ["one", "two", "three"]))
+    v2 = utils.page_hashes(_make_pdf(tmp_path / "v2.pdf", ["one", "TWO", "three", "four"]))
+    _index_version(collection, "reg.pdf", "old", v1)
+    plan = rag_engine.plan_file_revision("reg.pdf", v2)
+    _index_version(collection, "reg.pdf", "new", {2: v2[2], 4: v2[4]}, page_count=4)
+    rag_engine.apply_file_revision("new", plan)
+    metadatas = collection.get()["metadatas"]
+    assert {(meta["file_hash"], meta["page_count"]) for meta in metadatas} == {("new", 4)}
+    assert collection.count() == 8
+
+    rag_engine.rollback_file_revision("new", plan)
+    remaining = collection.get()
+    assert {(meta["file_hash"], meta["page_count"]) for meta in remaining["metadatas"]} == {("old", 3)}
+    assert sorted(remaining["ids"]) == ["old-1-0", "old-1-1", "old-3-0", "old-3-1"]
+
+
+def test_apply_keeps_stale_ids_overwritten_by_new_version(tmp_path, collection):
+    v1 = utils.page_hashes(_make_pdf(tmp_path / "v1.pdf", ["one", "two", "three"]))
+    v2 = utils.page_hashes(_make_pdf(tmp_path / "v2.pdf", ["one", "TWO", "three"]))
+    _index_version(collection, "reg.pdf", "old", v1)
+    plan = rag_engine.plan_file_revision("reg.pdf", v2)
+    # 第 2 页的第一个切片文本未变：新版本以相同 id 覆盖写入
+    collection.upsert(
+        ids=["old-2-0"],
+        metadatas=[{"file_name": "reg.pdf", "file_hash": "new", "page_number": 2, "page_hash": v2[2]}],
+        embeddings=[[1.0, 0.0]],
+    )
+    rag_engine.apply_file_revision("new", plan)
+    assert sorted(collection.get()["ids"]) == ["old-1-0", "old-1-1", "old-2-0", "old-3-0", "old-3-1"]
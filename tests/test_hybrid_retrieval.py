@@ -0,0 +1,52 @@
+"""并行混合检索：RRF 融合排序、跨检索器去重，复用已算好的查询向量。"""
+import asyncio
+from typing import List
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from engines.retrieval.hybrid import ParallelHybridRetriever, RetrievalTimings
+
+
+class _Fixed(BaseRetriever):
+    def __init__(self, ranked_ids: List[str]):
+        self.ranked_ids = ranked_ids
+        self.bundles: List[QueryBundle] = []
+        super().__init__()
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        self.bundles.append(query_bundle)
+        count = len(self.ranked_ids)
+        return [
+            NodeWithScore(node=TextNode(text=node_id, id_=node_id), score=float(count - rank))
+            for rank, node_id in enumerate(self.ranked_ids)
+        ]
+
+
+def test_rrf_fusion_order_and_dedupe():
+    bm25 = _Fixed(["a", "b", "c"])
+    vector = _Fixed(["b", "d", "a"])
+    embedded = []
+    retriever = ParallelHybridRetriever(
+        bm25, vector, embed_fn=lambda q: embedded.append(q) or [0.1, 0.2], similarity_top_k=3, rrf_k=60.0
+    )
+    nodes, timings = asyncio.run(retriever.aretrieve_timed(QueryBundle("假人摆放")))
+
+    # b: 1/61 + 1/60，a: 1/60 + 1/62，c: 1/62，d: 1/61
+    assert [n.node.node_id for n in nodes] == ["b", "a", "d"]
+    assert nodes[0].score == 1 / 61 + 1 / 60
+    assert len({n.node.node_id for n in nodes}) == len(nodes)
+    assert embedded == ["假人摆放"] and vector.bundles[0].embedding == [0.1, 0.2]
+    assert not timings.embedding_reused
+
+
+def test_precomputed_embedding_is_reused():
+    vector = _Fixed(["a"])
+    retriever = ParallelHybridRetriever(
+        _Fixed(["a"]), vector, embed_fn=lambda q: (_ for _ in ()).throw(AssertionError("不应重新向量化"))
+    )
+    timings = RetrievalTimings()
+    nodes, _ = asyncio.run(retriever.aretrieve_timed(QueryBundle("q", embedding=[1.0, 0.0]), timings))
+    assert [n.node.node_id for n in nodes] == ["a"]
+    assert timings.embedding_reused and vector.bundles[0].embedding == [1.0, 0.0]
+    assert retriever.retrieve(QueryBundle("q", embedding=[1.0, 0.0]))[0].node.node_id == "a"
@@ -0,0 +1,54 @@
+"""入库任务队列：重启后中断任务重新排队，同内容任务去重，工作线程按状态流转。"""
+import time
+
+from engines.ingest.job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue
+from engines.ingest.worker import IngestWorker
+
+
+def test_requeue_interrupted_and_find_active(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    first = queue.submit("a.pdf", "/up/a.pdf", "hash-a")
+    queue.submit("b.pdf", "/up/b.pdf", "hash-b")
+    assert queue.find_active("hash-a").id == first
+
+    claimed = queue.claim_next()
+    assert claimed.id == first and claimed.status == RUNNING
+    assert queue.find_active("hash-a").status == RUNNING
+
+    # 模拟进程退出：重新打开同一数据库，running 任务重新排队
+    reopened = JobQueue(tmp_path / "jobs.sqlite3")
+    assert reopened.requeue_interrupted() == 1
+    assert reopened.counts() == {QUEUED: 2}
+    assert reopened.claim_next().id == first
+
+    reopened.update(first, status=DONE, progress=1.0, doc_count=3)
+    assert reopened.find_active("hash-a") is None
+    assert reopened.find_active("missing") is None
+    assert reopened.recent(1)[0].file_name == "b.pdf"
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> None:
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.02)
+
+
+def test_worker_marks_done_and_failed(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+
+    def handler(job, report):
+        report(0.5, "解析中")
+        if job.file_name == "bad.pdf":
+            raise ValueError("解析失败")
+        return 7
+
+    worker = IngestWorker(queue, handler, max_workers=2).start()
+    try:
+        good = worker.submit("good.pdf", "/up/good.pdf", "hash-good")
+        bad = worker.submit("bad.pdf", "/up/bad.pdf", "hash-bad")
+        _wait_until(lambda: worker.finished_count == 2)
+    finally:
+        worker.stop(timeout=5)
+    jobs = {job.id: job for job in queue.recent()}
+    assert jobs[good].status == DONE and jobs[good].doc_count == 7 and jobs[good].progress == 1.0
+    assert jobs[bad].status == FAILED and "解析失败" in jobs[bad].message
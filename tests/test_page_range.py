@@ -0,0 +1,41 @@
+"""页码范围：解析器只渲染、识别并输出选中的页。"""
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from engines.ocr_by_vlm.local_parser import MinerUParser
+
+
+def test_resolve_pages():
+    resolve = MinerUParser._resolve_pages
+    assert resolve(10, None, None, None) is None
+    assert resolve(10, 3, 5, None) == [3, 4, 5]
+    assert resolve(10, None, 2, None) == [1, 2]
+    assert resolve(10, 8, 99, None) == [8, 9, 10]
+    # 显式页码列表优先，去重排序并丢弃越界页
+    assert resolve(10, 1, 2, [7, 3, 3, 11, 0]) == [3, 7]
+    with pytest.raises(ValueError):
+        resolve(10, 11, 12, None)
+
+
+def test_parse_only_selected_pages(tmp_path):
+    pdf_path = tmp_path / "reg.pdf"
+    doc = fitz.open()
+    for page_num in range(1, 4):
+        page = doc.new_page()
+        for row in range(12):
+            page.insert_text((50, 60 + row * 20), f"第{page_num}页正文：车辆碰撞试验应按本规程进行。",
+                             fontname="china-s", fontsize=10)
+    doc.save(str(pdf_path))
+    doc.close()
+
+    parser = MinerUParser(use_cache=False)
+    parser.pipelined = False
+    parser.load_model = lambda: pytest.fail("文本层页不应加载 VLM")
+    route_report = {}
+    md_path, _ = parser.parse_pdf_to_markdown(str(pdf_path), str(tmp_path / "out"), pages=[2],
+                                              text_fast_path=True, route_report=route_report)
+    markdown = open(md_path, encoding="utf-8").read()
+    assert "第2页正文" in markdown
+    assert "第1页正文" not in markdown and "第3页正文" not in markdown
+    assert route_report["text_pages"] == 1
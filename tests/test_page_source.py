@@ -0,0 +1,33 @@
+"""PDF 流式渲染：逐页产出指定 DPI 的 RGB 图片，可只渲染选中页。"""
+import pytest
+
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("pypdfium2")
+
+from engines.ocr_by_vlm.page_source import count_pages, iter_pdf_pages
+
+
+def _make_pdf(path, pages: int) -> None:
+    doc = fitz.open()
+    for idx in range(pages):
+        doc.new_page(width=144, height=72).insert_text((10, 40), f"page {idx + 1}")
+    doc.save(str(path))
+    doc.close()
+
+
+def test_iter_pdf_pages_renders_lazily_at_dpi(tmp_path):
+    pdf_path = tmp_path / "doc.pdf"
+    _make_pdf(pdf_path, 3)
+    assert count_pages(str(pdf_path)) == 3
+
+    pages = iter_pdf_pages(str(pdf_path), dpi=144)
+    page_num, image = next(pages)  # 生成器按需渲染，取第一页时不必渲染全部
+    assert page_num == 1
+    assert image.mode == "RGB" and image.size == (288, 144)
+    assert [num for num, _ in pages] == [2, 3]
+
+
+def test_iter_pdf_pages_only_renders_selected_pages(tmp_path):
+    pdf_path = tmp_path / "doc.pdf"
+    _make_pdf(pdf_path, 4)
+    assert [num for num, _ in iter_pdf_pages(str(pdf_path), dpi=72, pages=[2, 4])] == [2, 4]
@@ -0,0 +1,40 @@
+"""MinerU 解析缓存：缓存键随文件内容与参数变化，页块与 Markdown 可按选页恢复。"""
+from engines.ocr_by_vlm.parse_cache import ParseCache
+
+
+def _pdf(tmp_path, content: bytes):
+    path = tmp_path / "reg.pdf"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_key_changes_with_content_model_and_settings(tmp_path):
+    root = tmp_path / "cache"
+    pdf = _pdf(tmp_path, b"%PDF-1.4 v1")
+    base = ParseCache(str(root), pdf, "mineru", {"dpi": 200}).key
+    assert ParseCache(str(root), pdf, "mineru", {"dpi": 200}).key == base
+    assert ParseCache(str(root), pdf, "mineru", {"dpi": 144}).key != base
+    assert ParseCache(str(root), pdf, "other-model", {"dpi": 200}).key != base
+    assert ParseCache(str(root), _pdf(tmp_path, b"%PDF-1.4 v2"), "mineru", {"dpi": 200}).key != base
+
+
+def test_pages_and_documents_round_trip(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache"), _pdf(tmp_path, b"%PDF"), "mineru", {})
+    assert cache.load_page(1) is None
+    cache.save_page(1, [{"type": "text", "content": "第一页"}])
+    assert cache.load_page(1) == [{"type": "text", "content": "第一页"}]
+    assert cache.has_pages([1]) and not cache.has_pages([1, 2])
+
+    images = tmp_path / "out_images"
+    images.mkdir()
+    for name in ("page_1_img_1.jpg", "page_2_img_1.jpg", "page_1.png"):
+        (images / name).write_bytes(b"img")
+    cache.save_document("# 全文", str(images))
+    cache.save_document("# 第 2 页", str(images), pages=[2])
+    assert cache.has_document() and cache.has_document([2]) and not cache.has_document([1])
+
+    out = tmp_path / "restored"
+    md_path = cache.restore_document(str(out), "reg.md", pages=[2])
+    assert open(md_path, encoding="utf-8").read() == "# 第 2 页"
+    # 只恢复选中页的裁剪图，整页渲染图不进缓存
+    assert sorted(p.name for p in (out / "images").iterdir()) == ["page_2_img_1.jpg"]
@@ -0,0 +1,69 @@
+"""解析流水线：后台预取与后处理线程保持顺序、统计各阶段耗时，并把异常交回调用方。"""
+import threading
+import time
+
+import pytest
+
+from engines.ocr_by_vlm.pipeline import BackgroundWorker, StageStats, background_iter, timed_iter
+
+
+def test_background_iter_prefetches_in_order_and_records_stats():
+    stats = StageStats()
+
+    def slow_pages():
+        for page in range(1, 6):
+            time.sleep(0.01)
+            yield page
+
+    assert list(background_iter(slow_pages(), maxsize=2, stats=stats, stage="render")) == [1, 2, 3, 4, 5]
+    assert stats.summary()["render"]["items"] == 5
+    assert list(timed_iter([1, 2], stats, "infer")) == [1, 2]
+    assert stats.summary()["infer"]["items"] == 2
+
+
+def test_background_iter_reraises_producer_error():
+    def broken():
+        yield 1
+        raise ValueError("渲染失败")
+
+    consumed = []
+    with pytest.raises(ValueError, match="渲染失败"):
+        for item in background_iter(broken(), maxsize=1, stats=StageStats(), stage="render"):
+            consumed.append(item)
+    assert consumed == [1]
+
+
+def test_background_iter_stops_producer_when_consumer_exits_early():
+    produced = []
+
+    def endless():
+        page = 0
+        while True:
+            page += 1
+            produced.append(page)
+            yield page
+
+    for item in background_iter(endless(), maxsize=1, stats=StageStats(), stage="render"):
+        if item == 2:
+            break
+    assert not any(thread.name == "pipeline-render" for thread in threading.enumerate())
+    assert len(produced) <= 5
+
+
+def test_background_worker_handles_items_in_order_and_surfaces_errors():
+    stats = StageStats()
+    handled = []
+    worker = BackgroundWorker(handled.append, maxsize=2, stats=stats, stage="post")
+    for item in range(4):
+        worker.submit(item)
+    worker.close()
+    assert handled == [0, 1, 2, 3]
+    assert stats.summary()["post"]["items"] == 4
+
+    def fail(item):
+        raise RuntimeError(f"后处理失败 {item}")
+
+    failing = BackgroundWorker(fail, maxsize=2, stats=StageStats(), stage="post")
+    failing.submit(1)
+    with pytest.raises(RuntimeError, match="后处理失败 1"):
+        failing.close()
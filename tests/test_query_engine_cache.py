@@ -0,0 +1,61 @@
+"""查询引擎缓存：同一索引代数与参数复用同一实例，入库后整体重建。"""
+from types import SimpleNamespace
+
+import pytest
+
+import rag_engine
+from engines.retrieval.filters import RetrievalFilters
+
+
+@pytest.fixture
+def built(monkeypatch):
+    cache = rag_engine._QueryEngineCache()
+    built = {"index": 0, "engine": 0}
+
+    def load_index():
+        built["index"] += 1
+        return object()
+
+    def build_engine(*args):
+        built["engine"] += 1
+        return object()
+
+    monkeypatch.setattr(rag_engine, "_get_query_engine_cache", lambda: cache)
+    monkeypatch.setattr(rag_engine, "refresh_external_changes", lambda: False)
+    monkeypatch.setattr(rag_engine, "load_index", load_index)
+    monkeypatch.setattr(rag_engine, "_build_query_engine", build_engine)
+    monkeypatch.setattr(rag_engine, "get_answer_cache", lambda: SimpleNamespace(clear=lambda: None))
+    monkeypatch.setattr(rag_engine, "get_rerank_cache", lambda: SimpleNamespace(clear=lambda: None))
+    return built
+
+
+def test_engine_is_reused_until_index_generation_changes(built):
+    first = rag_engine.as_query_engine([], bm25_top_k=4, vector_top_k=4)
+    assert rag_engine.as_query_engine([], bm25_top_k=4, vector_top_k=4) is first
+    assert built == {"index": 1, "engine": 1}
+
+    other = rag_engine.as_query_engine([], bm25_top_k=8, vector_top_k=4)
+    scoped = rag_engine.as_query_engine([], filters=RetrievalFilters(file_names=("a.pdf",)))
+    assert len({id(first), id(other), id(scoped)}) == 3
+    assert built == {"index": 1, "engine": 3}
+
+    generation = rag_engine.get_index_generation()
+    assert rag_engine.bump_index_generation() == generation + 1
+    rebuilt = rag_engine.as_query_engine([], bm25_top_k=4, vector_top_k=4)
+    assert rebuilt is not first
+    assert built == {"index": 2, "engine": 4}
+
+
+def test_explicit_documents_bypass_the_cache(built):
+    rag_engine.as_query_engine(["doc"])
+    rag_engine.as_query_engine(["doc"])
+    assert built["engine"] == 2
+    assert not rag_engine._get_query_engine_cache().engines
+
+
+def test_cache_drops_oldest_scope_when_full(built, monkeypatch):
+    monkeypatch.setattr(rag_engine, "MAX_CACHED_ENGINES", 2)
+    for top_k in (1, 2, 3):
+        rag_engine.as_query_engine([], bm25_top_k=top_k)
+    keys = list(rag_engine._get_query_engine_cache().engines)
+    assert [key[1] for key in keys] == [2, 3]
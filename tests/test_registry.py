@@ -0,0 +1,31 @@
+"""文档登记表：同步文件版本时保留未变化版本的入库时间。"""
+import time
+
+from engines.ingest.registry import DocumentRegistry
+
+
+def test_replace_file_keeps_ingested_at_of_unchanged_versions(tmp_path):
+    registry = DocumentRegistry(tmp_path / "registry.sqlite3")
+    registry.replace_file("a.pdf", [("hash-v1", 10, 40)])
+    first = {doc.file_hash: doc.ingested_at for doc in registry.documents()}
+    time.sleep(0.01)
+
+    registry.replace_file("a.pdf", [("hash-v1", 10, 38), ("hash-v2", 3, 12)])
+    docs = {doc.file_hash: doc for doc in registry.documents()}
+    assert docs["hash-v1"].ingested_at == first["hash-v1"]
+    assert docs["hash-v1"].chunk_count == 38
+    assert docs["hash-v2"].ingested_at > first["hash-v1"]
+
+
+def test_summary_page_count_is_file_length_not_chunk_start_pages():
+    from rag_engine import _summarize_metadatas
+
+    metadatas = [
+        {"file_name": "a.pdf", "file_hash": "v1", "page_number": 1, "page_end": 4, "page_count": 6},
+        {"file_name": "a.pdf", "file_hash": "v1", "page_number": 5, "page_end": 5, "page_count": 6},
+        {"file_name": "old.pdf", "file_hash": "v0", "page_number": 2, "page_end": 7},
+    ]
+    summary = _summarize_metadatas(metadatas)
+    assert summary["a.pdf"]["v1"] == (6, 2)
+    # 旧数据没有 page_count：退回到节点覆盖的最大页码
+    assert summary["old.pdf"]["v0"] == (7, 1)
@@ -0,0 +1,66 @@
+"""交叉编码器重排：按得分截断到 top_n，缓存命中的 (query, node_id) 不再送入模型。"""
+import sys
+from types import ModuleType
+
+import pytest
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from engines.retrieval.reranker import CrossEncoderReranker, RerankScoreCache
+
+
+class _FakeCrossEncoder:
+    """得分取文本中的数字，记录每次前向的 (query, 文本) 对。"""
+
+    calls = []
+
+    def __init__(self, model_name, device="cpu", max_length=512):
+        pass
+
+    def predict(self, pairs, batch_size=16, show_progress_bar=False):
+        _FakeCrossEncoder.calls.append(list(pairs))
+        return [float(text.split("#")[1]) for _, text in pairs]
+
+
+@pytest.fixture
+def reranker(monkeypatch):
+    module = ModuleType("sentence_transformers")
+    module.CrossEncoder = _FakeCrossEncoder
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    _FakeCrossEncoder.calls = []
+    return CrossEncoderReranker(cache=RerankScoreCache(max_entries=8), model_name="fake", top_n=2)
+
+
+def _nodes(*scores):
+    return [NodeWithScore(node=TextNode(text=f"片段#{score}", id_=f"n{score}"), score=0.0) for score in scores]
+
+
+def test_rerank_truncates_to_top_n_by_score(reranker):
+    ranked = reranker.postprocess_nodes(_nodes(1, 5, 3), QueryBundle("假人摆放"))
+    assert [n.node.node_id for n in ranked] == ["n5", "n3"]
+    assert [n.score for n in ranked] == [5.0, 3.0]
+    # 没有查询时不打分，只按原顺序截断
+    assert [n.node.node_id for n in reranker.postprocess_nodes(_nodes(1, 5, 3))] == ["n1", "n5"]
+
+
+def test_cached_scores_skip_the_model(reranker):
+    reranker.postprocess_nodes(_nodes(1, 5), QueryBundle("假人摆放"))
+    assert len(_FakeCrossEncoder.calls) == 1
+
+    ranked = reranker.postprocess_nodes(_nodes(1, 5, 4), QueryBundle("假人摆放"))
+    assert [n.node.node_id for n in ranked] == ["n5", "n4"]
+    # 第二次只有 n4 未命中缓存
+    assert [text for _, text in _FakeCrossEncoder.calls[1]] == ["片段#4"]
+    assert reranker._cache.stats()["hits"] == 2
+
+    reranker.postprocess_nodes(_nodes(1), QueryBundle("另一个问题"))
+    assert len(_FakeCrossEncoder.calls) == 3  # 缓存按 query 区分
+
+
+def test_score_cache_is_lru():
+    cache = RerankScoreCache(max_entries=2)
+    cache.put_many("q", {"a": 1.0, "b": 2.0})
+    assert cache.get_many("q", ["a"]) == {"a": 1.0}
+    cache.put_many("q", {"c": 3.0})
+    assert cache.get_many("q", ["a", "b", "c"]) == {"a": 1.0, "c": 3.0}
+    cache.clear()
+    assert cache.get_many("q", ["a"]) == {}
@@ -0,0 +1,38 @@
+"""流式生成：streaming 查询引擎返回 StreamingResponse，token 按生成顺序逐个产出。"""
+import time
+from typing import List
+
+from llama_index.core import Settings
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.base.response.schema import StreamingResponse
+from llama_index.core.llms import MockLLM
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+import config
+import rag_engine
+
+
+class _FixedRetriever(BaseRetriever):
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return [NodeWithScore(node=TextNode(text="座椅调节应符合附录要求。", id_="n1"), score=1.0)]
+
+
+def test_iter_response_tokens_yields_tokens_in_order():
+    response = StreamingResponse(response_gen=iter(["车辆", "正面", "碰撞"]))
+    assert list(rag_engine.iter_response_tokens(response, time.perf_counter())) == ["车辆", "正面", "碰撞"]
+
+
+def test_streaming_engine_returns_token_generator(monkeypatch):
+    monkeypatch.setattr(Settings, "_llm", MockLLM(max_tokens=5))
+    monkeypatch.setattr(config.model_config, "rerank_enabled", False)
+    monkeypatch.setattr(rag_engine, "get_hybrid_retriever", lambda *args: _FixedRetriever())
+
+    engine = rag_engine._build_query_engine(None, [], 4, 4, streaming=True)
+    response = engine.query("假人如何摆放？")
+    assert isinstance(response, StreamingResponse)
+    tokens = list(rag_engine.iter_response_tokens(response, time.perf_counter()))
+    assert len(tokens) > 1
+    assert [source["file"] for source in rag_engine.extract_sources(response)] == ["unknown"]
+
+    blocking = rag_engine._build_query_engine(None, [], 4, 4, streaming=False)
+    assert not isinstance(blocking.query("假人如何摆放？"), StreamingResponse)
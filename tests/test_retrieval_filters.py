@@ -0,0 +1,58 @@
+"""检索范围筛选：从文件名解析法规系列与版本，筛选条件下推为 Chroma 过滤与内存判断且两者一致。"""
+import pytest
+from llama_index.core.vector_stores.types import FilterOperator
+
+from engines.retrieval.filters import RetrievalFilters, parse_regulation_name
+
+
+@pytest.mark.parametrize(
+    "file_name, expected",
+    [
+        ("GB 11551-2014 乘员保护.pdf", ("GB 11551", "2014")),
+        ("GB∕T 31498-2021 电动汽车碰撞后安全要求.pdf", ("GB/T 31498", "2021")),
+        ("GBT31498.pdf", ("GB/T 31498", "")),
+        ("ECE R94 frontal.pdf", ("ECE R94", "")),
+        ("UN-R137.pdf", ("UN R137", "")),
+        ("FMVSS 208 Occupant crash protection.pdf", ("FMVSS 208", "")),
+        ("C-NCAP管理规则（2024年版）.pdf", ("C-NCAP", "2024")),
+        ("Euro NCAP Assessment Protocol v10.2.pdf", ("Euro NCAP", "V10.2")),
+        ("某评价规程（2021）.pdf", ("某评价规程", "2021")),
+    ],
+)
+def test_parse_regulation_name(file_name, expected):
+    assert parse_regulation_name(file_name) == expected
+
+
+def test_resolve_files_by_family_and_version():
+    names = ["GB 11551-2014 乘员保护.pdf", "GB 11551-2003 乘员保护.pdf", "C-NCAP管理规则（2024年版）.pdf"]
+    assert RetrievalFilters().resolve_files(names) is None
+    assert RetrievalFilters(families=("GB 11551",)).resolve_files(names) == set(names[:2])
+    assert RetrievalFilters(families=("GB 11551",), versions=("2014",)).resolve_files(names) == {names[0]}
+    assert RetrievalFilters(file_names=(names[2],), versions=("2014",)).resolve_files(names) == set()
+
+
+def test_metadata_filters_and_matches_agree_on_page_range():
+    filters = RetrievalFilters(page_start=3, page_end=5)
+    metadata_filters = filters.to_metadata_filters({"a.pdf"})
+    assert [(f.key, f.operator, f.value) for f in metadata_filters.filters] == [
+        ("file_name", FilterOperator.IN, ["a.pdf"]),
+        ("page_number", FilterOperator.GTE, 3),
+        ("page_number", FilterOperator.LTE, 5),
+    ]
+    assert RetrievalFilters().to_metadata_filters(None) is None
+
+    assert filters.matches({"file_name": "a.pdf", "page_number": 3}, {"a.pdf"})
+    assert filters.matches({"file_name": "a.pdf", "page_number": 5}, {"a.pdf"})
+    assert not filters.matches({"file_name": "a.pdf", "page_number": 6}, {"a.pdf"})
+    assert not filters.matches({"file_name": "a.pdf", "page_number": 2}, None)
+    assert not filters.matches({"file_name": "b.pdf", "page_number": 4}, {"a.pdf"})
+    # 有页码条件时，缺页码的节点不在范围内
+    assert not filters.matches({"file_name": "a.pdf"}, None)
+    assert RetrievalFilters().matches({"file_name": "b.pdf"}, None)
+
+
+def test_filters_are_hashable_cache_keys():
+    a = RetrievalFilters(families=("GB 11551",), page_start=2)
+    b = RetrievalFilters(families=("GB 11551",), page_start=2)
+    assert a == b and hash(a) == hash(b) and a.describe() == b.describe()
+    assert a.describe() != RetrievalFilters().describe()
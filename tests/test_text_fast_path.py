@@ -0,0 +1,93 @@
+"""文本层快速通道：原生数字页的分类、结构化提取与 Markdown 组装（不加载 VLM 依赖）。"""
+import io
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+from PIL import Image
+
+from engines.ocr_by_vlm.local_parser import MinerUParser
+from engines.ocr_by_vlm.text_layer import TextLayer
+
+
+def _make_pdf(path) -> None:
+    doc = fitz.open()
+    page = doc.new_page()
+    text = "车辆正面碰撞试验应按本规程进行，假人摆放位置与座椅调节应符合附录要求。"
+    for row in range(8):
+        page.insert_text((50, 60 + row * 20), text, fontname="china-s", fontsize=10)
+    buffer = io.BytesIO()
+    Image.new("RGB", (120, 80), (200, 30, 30)).save(buffer, format="PNG")
+    page.insert_image(fitz.Rect(60, 300, 180, 380), stream=buffer.getvalue())
+    doc.save(str(path))
+    doc.close()
+
+
+def test_fast_path_page_keeps_image_reference(tmp_path):
+    pdf_path = tmp_path / "fast_path.pdf"
+    _make_pdf(pdf_path)
+    parser = MinerUParser(use_cache=False)
+    parser.pipelined = False
+
+    def no_vlm(*args, **kwargs):
+        raise AssertionError("快速通道页不应加载 VLM")
+
+    parser.load_model = no_vlm
+    route_report = {}
+    md_path, _ = parser.parse_pdf_to_markdown(str(pdf_path), str(tmp_path / "out"), text_fast_path=True,
+                                              route_report=route_report)
+
+    markdown = open(md_path, encoding="utf-8").read()
+    assert route_report["text_pages"] == 1
+    assert "车辆正面碰撞试验" in markdown
+    assert "![图片](images/" in markdown
+    image_name = markdown.split("![图片](images/")[1].split(")")[0]
+    assert (tmp_path / "out" / "images" / image_name).exists()
+
+
+def test_classify_page_and_page_blocks(tmp_path):
+    _make_pdf(tmp_path / "native.pdf")
+    pdf_path = tmp_path / "mixed.pdf"
+    doc = fitz.open(str(tmp_path / "native.pdf"))
+    doc.new_page()  # 无文本层的空白页，视同扫描页
+    doc.save(str(pdf_path))
+    doc.close()
+
+    layer = TextLayer(str(pdf_path))
+    try:
+        native = layer.classify_page(1, min_chars=50, max_image_coverage=0.5, max_garbled_ratio=0.05, detect_tables=False)
+        assert not native.use_vlm and native.has_images and native.char_count >= 50
+        scanned = layer.classify_page(2, min_chars=50, max_image_coverage=0.5, max_garbled_ratio=0.05, detect_tables=False)
+        assert scanned.use_vlm
+
+        blocks = layer.page_blocks(1)
+        assert {block["content_source"] for block in blocks} == {"text_layer"}
+        assert any(block["type"] == "image" for block in blocks)
+        text = "".join(block["content"] or "" for block in blocks if block["type"] != "image")
+        assert "车辆正面碰撞试验" in text
+        assert all(0.0 <= value <= 1.0 for block in blocks for value in block["bbox"])
+    finally:
+        layer.close()
+
+
+def test_blocks_to_markdown():
+    parser = MinerUParser(use_cache=False)
+    markdown = parser._blocks_to_markdown([
+        {"type": "title", "content": "5 技术要求"},
+        {"type": "text", "content": "5.1 正文"},
+        {"type": "image", "content": None, "image_name": "page1_img1.png"},
+        {"type": "image", "content": None},
+        {"type": "table", "content": "<table></table>"},
+        {"type": "equation", "content": "E=mc^2"},
+        {"type": "equation", "content": "a+b", "content_source": "text_layer"},
+    ])
+    assert markdown.splitlines() == [
+        "5 技术要求",
+        "5.1 正文",
+        "![图片](images/page1_img1.png)",
+        "<table></table>",
+        "$$",
+        "E=mc^2",
+        "$$",
+        "a+b",
+    ]
@@ -0,0 +1,49 @@
+"""多页批量 VLM 推理：按 batch_size 成批前向，缓存命中页不送入模型，产出保持页序。"""
+from engines.ocr_by_vlm.local_parser import MinerUParser
+from engines.ocr_by_vlm.parse_cache import ParseCache
+from engines.ocr_by_vlm.pipeline import StageStats
+
+
+class _FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def two_step_extract(self, image, **kwargs):
+        self.calls.append([image])
+        return [{"type": "text", "content": image}]
+
+    def batch_two_step_extract(self, images, **kwargs):
+        self.calls.append(list(images))
+        return [[{"type": "text", "content": image}] for image in images]
+
+
+def _parser(batch_size: int) -> MinerUParser:
+    parser = MinerUParser(use_cache=False)
+    parser.batch_size = batch_size
+    parser.client = _FakeClient()
+    parser.load_model = lambda: None
+    return parser
+
+
+def test_extract_blocks_batched_splits_by_batch_size():
+    parser = _parser(3)
+    images = [f"p{i}" for i in range(1, 8)]
+    results = parser.extract_blocks_batched(images)
+    assert parser.client.calls == [["p1", "p2", "p3"], ["p4", "p5", "p6"], ["p7"]]
+    assert [blocks[0]["content"] for blocks in results] == images
+
+
+def test_infer_pages_skips_cached_pages_and_keeps_page_order(tmp_path):
+    pdf = tmp_path / "reg.pdf"
+    pdf.write_bytes(b"%PDF")
+    cache = ParseCache(str(tmp_path / "cache"), str(pdf), "mineru", {})
+    cache.save_page(2, [{"type": "text", "content": "cached"}])
+
+    parser = _parser(2)
+    pages = [(n, f"p{n}") for n in range(1, 6)]
+    produced = list(parser._infer_pages(iter(pages), cache, 5, StageStats()))
+
+    assert [page_data["page_num"] for page_data, _ in produced] == [1, 2, 3, 4, 5]
+    assert produced[1][0]["blocks"] == [{"type": "text", "content": "cached"}]
+    assert parser.client.calls == [["p1", "p3"], ["p4", "p5"]]
+    assert cache.load_page(5) == [{"type": "text", "content": "p5"}]
@@ -7,7 +7,9 @@
     pip install transformers torch pdf2image pillow markdown-it-py beautifulsoup4
 """
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional, Sequence, Union
+import hashlib
+import logging
 import tempfile
 
 import fitz  # PyMuPDF
@@ -20,6 +22,8 @@ import config
 from engines.ocr_by_vlm.local_parser  import parse_pdf_to_markdown
 from md_processor import process_markdown
 
+logger = logging.getLogger("autosafety")
+
 
 def save_uploaded_file(uploaded_file: UploadedFile, upload_dir: Path) -> Path:
     """将 Streamlit 上传文件落地到本地目录。"""
@@ -30,19 +34,83 @@ def save_uploaded_file(uploaded_file: UploadedFile, upload_dir: Path) -> Path:
     return target_path
 
 
+# 哈希与文件总页数仅用于去重/增量/登记表，不参与向量化与 LLM 提示
+HASH_METADATA_KEYS = ["file_hash", "page_hash", "page_count"]
+
+
+def content_hash(data: Union[bytes, memoryview, Path]) -> str:
+    """计算文件内容的 SHA-256（可传入字节或文件路径）。"""
+    digest = hashlib.sha256()
+    if isinstance(data, Path):
+        with data.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    else:
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def page_hashes(file_path: Path) -> Dict[int, str]:
+    """
+    计算逐页内容哈希 {页码: hash}，无需解析即可判断修订版中哪些页发生变化。
+    PDF 使用页面内容流与所引用图片数据；PPTX 使用幻灯片 XML。
+    """
+    suffix = file_path.suffix.lower()
+    hashes: Dict[int, str] = {}
+    if suffix == ".pdf":
+        with fitz.open(file_path) as pdf:
+            for page_idx, page in enumerate(pdf, start=1):
+                digest = hashlib.sha256(page.read_contents())
+                for img in page.get_images(full=True):
+                    digest.update(pdf.xref_stream_raw(img[0]) or b"")
+                hashes[page_idx] = digest.hexdigest()
+    elif suffix == ".pptx":
+        prs = Presentation(file_path)
+        for slide_idx, slide in enumerate(prs.slides, start=1):
+            hashes[slide_idx] = hashlib.sha256(slide.part.blob).hexdigest()
+    else:
+        raise ValueError(f"暂不支持的文件类型: {suffix}")
+    return hashes
+
+
+def _attach_hash_metadata(docs: List[Document], file_path: Path) -> None:
+    """为 Document 写入 file_hash/page_hash/page_count（文件总页数）元数据，并排除其参与嵌入与提示。"""
+    file_hash = content_hash(file_path)
+    hashes = page_hashes(file_path)
+    for doc in docs:
+        doc.metadata["file_hash"] = file_hash
+        doc.metadata["page_count"] = len(hashes)
+        page_hash = hashes.get(doc.metadata.get("page_number"))
+        if page_hash:
+            doc.metadata["page_hash"] = page_hash
+        for key in HASH_METADATA_KEYS:
+            if key not in doc.excluded_embed_metadata_keys:
+                doc.excluded_embed_metadata_keys.append(key)
+            if key not in doc.excluded_llm_metadata_keys:
+                doc.excluded_llm_metadata_keys.append(key)
+
+
 def clean_text(text: str) -> str:
     """基础清洗，移除多余空行。"""
     return "\n".join(line.strip() for line in text.splitlines() if line.strip())
 
 
-def pdf_to_documents(file_path: Path) -> List[Document]:
-    """将 PDF 转为结构化的 Document 列表，使用 MinerU 2.5 模型进行解析。"""
+def pdf_to_documents(file_path: Path, pages: Optional[Sequence[int]] = None) -> List[Document]:
+    """
+    将 PDF 转为结构化的 Document 列表，使用 MinerU 2.5 模型进行解析。
+    pages 指定时只解析这些页（1-based），用于修订版的增量重新解析。
+    """
     # 创建临时输出目录
     with tempfile.TemporaryDirectory() as tmp_dir:
         try:
-            # 1. 使用 MinerU 2.5 将 PDF 转换为 Markdown
-            md_path = parse_pdf_to_markdown(str(file_path), tmp_dir)
-            
+            # 1. 将 PDF 转换为 Markdown：文本层可靠的页用 PyMuPDF 直接提取，其余页用 MinerU 2.5
+            #    （只处理选中的页，页码保持原文件编号）
+            route_report: Dict[str, Any] = {}
+            md_path, _ = parse_pdf_to_markdown(str(file_path), tmp_dir, pages=pages, route_report=route_report)
+            if route_report.get("text_pages"):
+                logger.info("%s: 文本层快速通道 %s 页, VLM %s 页, 估计节省 %ss", file_path.name,
+                            route_report["text_pages"], route_report["vlm_pages"], route_report["estimated_saved_seconds"])
+
             # 2. 处理 Markdown 生成结构化的 Document 对象
             docs = process_markdown(md_path)
             
@@ -59,6 +127,8 @@ def pdf_to_documents(file_path: Path) -> List[Document]:
             docs: List[Document] = []
             with fitz.open(file_path) as pdf:
                 for page_idx, page in enumerate(pdf, start=1):
+                    if pages is not None and page_idx not in pages:
+                        continue
                     text = page.get_text("text")
                     markdown = f"# 第 {page_idx} 页\n\n{clean_text(text)}"
                     docs.append(
@@ -70,11 +140,13 @@ def pdf_to_documents(file_path: Path) -> List[Document]:
             return docs
 
 
-def pptx_to_documents(file_path: Path) -> List[Document]:
+def pptx_to_documents(file_path: Path, pages: Optional[Sequence[int]] = None) -> List[Document]:
     """将 PPTX 转为按页切分的 Document 列表，附带页码元数据。"""
     prs = Presentation(file_path)
     docs: List[Document] = []
     for slide_idx, slide in enumerate(prs.slides, start=1):
+        if pages is not None and slide_idx not in pages:
+            continue
         texts = []
         for shape in slide.shapes:
             if hasattr(shape, "text") and shape.text:
@@ -90,14 +162,20 @@ def pptx_to_documents(file_path: Path) -> List[Document]:
     return docs
 
 
-def file_to_documents(file_path: Path) -> List[Document]:
-    """根据扩展名调度解析器。"""
+def file_to_documents(file_path: Path, pages: Optional[Sequence[int]] = None) -> List[Document]:
+    """
+    根据扩展名调度解析器，并附加 file_hash/page_hash 元数据。
+    pages 指定时只解析这些页（1-based）。
+    """
     suffix = file_path.suffix.lower()
     if suffix == ".pdf":
-        return pdf_to_documents(file_path)
-    if suffix == ".pptx":
-        return pptx_to_documents(file_path)
-    raise ValueError(f"暂不支持的文件类型: {suffix}")
+        docs = pdf_to_documents(file_path, pages)
+    elif suffix == ".pptx":
+        docs = pptx_to_documents(file_path, pages)
+    else:
+        raise ValueError(f"暂不支持的文件类型: {suffix}")
+    _attach_hash_metadata(docs, file_path)
+    return docs
 
 
 if __name__ == "__main__":